@@ -0,0 +1,28 @@
+"""add sync_state table (ingestion watermarks)
+
+Revision ID: 20261019_1000
+Revises: 20250815_0901
+Create Date: 2026-10-19 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1000'
+down_revision = '20250815_0901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sync_state',
+        sa.Column('source', sa.String(length=100), primary_key=True),
+        sa.Column('watermark', sa.String(length=64)),
+        sa.Column('last_id', sa.String(length=100)),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()')),
+    )
+
+
+def downgrade():
+    op.drop_table('sync_state')
@@ -0,0 +1,28 @@
+"""add content_hash to humdata tables
+
+Revision ID: 20261019_1010
+Revises: 20261019_1000
+Create Date: 2026-10-19 10:10:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1010'
+down_revision = '20261019_1000'
+branch_labels = None
+depends_on = None
+
+TABLES = ('crises', 'job_postings', 'funding_records')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('content_hash')
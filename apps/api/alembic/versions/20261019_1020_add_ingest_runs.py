@@ -0,0 +1,36 @@
+"""add ingest_runs table (scheduler history)
+
+Revision ID: 20261019_1020
+Revises: 20261019_1010
+Create Date: 2026-10-19 10:20:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1020'
+down_revision = '20261019_1010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ingest_runs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('job', sa.String(length=100), nullable=False),
+        sa.Column('host', sa.String(length=255)),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime()),
+        sa.Column('duration_ms', sa.Integer()),
+        sa.Column('rows', sa.Text()),
+        sa.Column('error', sa.Text()),
+    )
+    op.create_index('ix_ingest_runs_job_started', 'ingest_runs', ['job', 'started_at'])
+
+
+def downgrade():
+    op.drop_index('ix_ingest_runs_job_started', table_name='ingest_runs')
+    op.drop_table('ingest_runs')
@@ -0,0 +1,40 @@
+"""add funding_rollups table and backfill it
+
+Revision ID: 20261019_1030
+Revises: 20261019_1020
+Create Date: 2026-10-19 10:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1030'
+down_revision = '20261019_1020'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'funding_rollups',
+        sa.Column('dimension', sa.String(length=20), primary_key=True),
+        sa.Column('key', sa.String(length=255), primary_key=True),
+        sa.Column('year', sa.Integer(), primary_key=True),
+        sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('flow_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_funding_rollups_dim_year_total', 'funding_rollups', ['dimension', 'year', 'total_amount'])
+
+    # Backfill depuis les flux existants (année NULL : clé "", comme RollupDelta)
+    for dim, col in (('year', "COALESCE(CAST(year AS VARCHAR(255)), '')"), ('country', "COALESCE(country, '')"),
+                     ('cluster', "COALESCE(cluster, '')"), ('donor', "COALESCE(donor, '')")):
+        op.execute(
+            f"INSERT INTO funding_rollups (dimension, key, year, total_amount, flow_count) "
+            f"SELECT '{dim}', {col}, COALESCE(year, 0), COALESCE(SUM(amount), 0), COUNT(*) "
+            f"FROM funding_records GROUP BY {col}, COALESCE(year, 0)"
+        )
+
+
+def downgrade():
+    op.drop_index('ix_funding_rollups_dim_year_total', table_name='funding_rollups')
+    op.drop_table('funding_rollups')
@@ -0,0 +1,48 @@
+"""store raw payload columns as compressed binary
+
+Revision ID: 20261019_1040
+Revises: 20261019_1030
+Create Date: 2026-10-19 10:40:00.000000
+
+Les valeurs existantes sont conservées telles quelles (texte UTF-8 brut);
+app.models.CompressedText sait les relire et compresse les nouvelles écritures.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1040'
+down_revision = '20261019_1030'
+branch_labels = None
+depends_on = None
+
+TABLES = ('crises', 'job_postings', 'funding_records', 'oauth_tokens')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite : typage dynamique, les BLOB cohabitent avec l'ancien texte
+        return
+    for table in TABLES:
+        op.alter_column(
+            table, 'raw',
+            type_=sa.LargeBinary(),
+            existing_type=sa.Text(),
+            postgresql_using="convert_to(raw, 'UTF8')",
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    # les lignes déjà compressées ne sont pas décompressables en SQL : elles sont vidées
+    for table in TABLES:
+        op.execute(f"UPDATE {table} SET raw = NULL WHERE position('\\x00'::bytea in raw) = 1")
+        op.alter_column(
+            table, 'raw',
+            type_=sa.Text(),
+            existing_type=sa.LargeBinary(),
+            postgresql_using="convert_from(raw, 'UTF8')",
+        )
@@ -0,0 +1,27 @@
+"""add data_versions table (ETag counters)
+
+Revision ID: 20261019_1050
+Revises: 20261019_1040
+Create Date: 2026-10-19 10:50:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1050'
+down_revision = '20261019_1040'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'data_versions',
+        sa.Column('name', sa.String(length=50), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()')),
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
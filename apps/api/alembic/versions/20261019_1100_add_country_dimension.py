@@ -0,0 +1,45 @@
+"""add countries dimension and crisis/job link tables
+
+Revision ID: 20261019_1100
+Revises: 20261019_1050
+Create Date: 2026-10-19 11:00:00.000000
+
+Les liaisons existantes se remplissent avec `python -m app.jobs.backfill_countries`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1100'
+down_revision = '20261019_1050'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'countries',
+        sa.Column('iso3', sa.String(length=3), primary_key=True),
+        sa.Column('name', sa.String(length=200), nullable=False),
+    )
+    op.create_table(
+        'crisis_countries',
+        sa.Column('crisis_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('crises.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('iso3', sa.String(length=3), sa.ForeignKey('countries.iso3'), primary_key=True),
+    )
+    op.create_index('ix_crisis_countries_iso3', 'crisis_countries', ['iso3', 'crisis_id'])
+    op.create_table(
+        'job_countries',
+        sa.Column('job_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('job_postings.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('iso3', sa.String(length=3), sa.ForeignKey('countries.iso3'), primary_key=True),
+    )
+    op.create_index('ix_job_countries_iso3', 'job_countries', ['iso3', 'job_id'])
+
+
+def downgrade():
+    op.drop_index('ix_job_countries_iso3', table_name='job_countries')
+    op.drop_table('job_countries')
+    op.drop_index('ix_crisis_countries_iso3', table_name='crisis_countries')
+    op.drop_table('crisis_countries')
+    op.drop_table('countries')
@@ -0,0 +1,42 @@
+"""add cross-source dedup clusters (cluster_id, minhash, dedup_buckets)
+
+Revision ID: 20261019_1110
+Revises: 20261019_1100
+Create Date: 2026-10-19 11:10:00.000000
+
+Les lignes existantes sont regroupées avec `python -m app.jobs.rebuild_clusters`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1110'
+down_revision = '20261019_1100'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('crises', 'job_postings'):
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column('cluster_id', postgresql.UUID(as_uuid=True)))
+            batch.add_column(sa.Column('minhash', sa.LargeBinary()))
+        op.create_index(f'ix_{table}_cluster_id', table, ['cluster_id'])
+    op.create_table(
+        'dedup_buckets',
+        sa.Column('table_name', sa.String(length=50), primary_key=True),
+        sa.Column('bucket', sa.String(length=32), primary_key=True),
+        sa.Column('row_id', postgresql.UUID(as_uuid=True), primary_key=True),
+    )
+    op.create_index('ix_dedup_buckets_row', 'dedup_buckets', ['table_name', 'row_id'])
+
+
+def downgrade():
+    op.drop_index('ix_dedup_buckets_row', table_name='dedup_buckets')
+    op.drop_table('dedup_buckets')
+    for table in ('crises', 'job_postings'):
+        op.drop_index(f'ix_{table}_cluster_id', table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('minhash')
+            batch.drop_column('cluster_id')
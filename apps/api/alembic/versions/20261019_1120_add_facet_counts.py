@@ -0,0 +1,37 @@
+"""add facet_counts table (humdata facets)
+
+Revision ID: 20261019_1120
+Revises: 20261019_1110
+Create Date: 2026-10-19 11:20:00.000000
+
+Compteurs remplis par `python -m app.jobs.rebuild_clusters` (ou à l'ingestion).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1120'
+down_revision = '20261019_1110'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'facet_counts',
+        sa.Column('table_name', sa.String(length=50), primary_key=True),
+        sa.Column('dimension', sa.String(length=20), primary_key=True),
+        sa.Column('value', sa.String(length=255), primary_key=True),
+        sa.Column('given_dimension', sa.String(length=20), primary_key=True),
+        sa.Column('given_value', sa.String(length=255), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'ix_facet_counts_lookup', 'facet_counts',
+        ['table_name', 'given_dimension', 'given_value', 'dimension', 'count'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_facet_counts_lookup', table_name='facet_counts')
+    op.drop_table('facet_counts')
@@ -0,0 +1,26 @@
+"""add partial index on job_postings (deadline, id) for /jobs/closing
+
+Revision ID: 20261019_1130
+Revises: 20261019_1120
+Create Date: 2026-10-19 11:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1130'
+down_revision = '20261019_1120'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_job_postings_open_deadline', 'job_postings', ['deadline', 'id'],
+        postgresql_where=sa.text('deadline IS NOT NULL'),
+        sqlite_where=sa.text('deadline IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_job_postings_open_deadline', table_name='job_postings')
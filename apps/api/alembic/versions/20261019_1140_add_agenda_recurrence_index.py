@@ -0,0 +1,56 @@
+"""add agenda recurrence index (recurrence_until) and agenda_occurrences
+
+Revision ID: 20261019_1140
+Revises: 20261019_1130
+Create Date: 2026-10-19 11:40:00.000000
+
+agenda_events est créée par init_db() (create_all) : on ne la modifie que si
+elle existe déjà.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1140'
+down_revision = '20261019_1130'
+branch_labels = None
+depends_on = None
+
+
+def _has_agenda() -> bool:
+    return sa.inspect(op.get_bind()).has_table('agenda_events')
+
+
+def upgrade():
+    if not _has_agenda():
+        return
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.alter_column('recurrence_pattern', type_=sa.String(length=255), existing_type=sa.String(length=50))
+        batch.add_column(sa.Column('recurrence_until', sa.DateTime()))
+        batch.add_column(sa.Column('occurrences_from', sa.DateTime()))
+        batch.add_column(sa.Column('occurrences_until', sa.DateTime()))
+    # séries existantes : motifs simples, bornées par recurrence_end_date (ou infinies)
+    op.execute("UPDATE agenda_events SET recurrence_until = start_datetime WHERE is_recurring IS NOT TRUE")
+    op.execute("UPDATE agenda_events SET recurrence_until = recurrence_end_date WHERE is_recurring IS TRUE")
+    op.create_index('ix_agenda_events_series', 'agenda_events', ['is_recurring', 'recurrence_until'])
+    op.create_table(
+        'agenda_occurrences',
+        sa.Column('event_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('agenda_events.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('occurrence_start', sa.DateTime(), primary_key=True),
+        sa.Column('occurrence_end', sa.DateTime()),
+    )
+    op.create_index('ix_agenda_occurrences_start', 'agenda_occurrences', ['occurrence_start'])
+
+
+def downgrade():
+    if not _has_agenda():
+        return
+    op.drop_index('ix_agenda_occurrences_start', table_name='agenda_occurrences')
+    op.drop_table('agenda_occurrences')
+    op.drop_index('ix_agenda_events_series', table_name='agenda_events')
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('occurrences_until')
+        batch.drop_column('occurrences_from')
+        batch.drop_column('recurrence_until')
+        batch.alter_column('recurrence_pattern', type_=sa.String(length=50), existing_type=sa.String(length=255))
@@ -0,0 +1,35 @@
+"""add agenda_events.reminder_sent_until (reminder dispatcher)
+
+Revision ID: 20261019_1150
+Revises: 20261019_1140
+Create Date: 2026-10-19 11:50:00.000000
+
+agenda_events est créée par init_db() (create_all) : on ne la modifie que si
+elle existe déjà.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1150'
+down_revision = '20261019_1140'
+branch_labels = None
+depends_on = None
+
+
+def _has_agenda() -> bool:
+    return sa.inspect(op.get_bind()).has_table('agenda_events')
+
+
+def upgrade():
+    if not _has_agenda():
+        return
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.add_column(sa.Column('reminder_sent_until', sa.DateTime()))
+
+
+def downgrade():
+    if not _has_agenda():
+        return
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('reminder_sent_until')
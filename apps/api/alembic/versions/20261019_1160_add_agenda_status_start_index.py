@@ -0,0 +1,33 @@
+"""add agenda_events (status, start_datetime) index
+
+Revision ID: 20261019_1160
+Revises: 20261019_1150
+Create Date: 2026-10-19 12:00:00.000000
+
+agenda_events est créée par init_db() (create_all) : on ne la modifie que si
+elle existe déjà.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1160'
+down_revision = '20261019_1150'
+branch_labels = None
+depends_on = None
+
+
+def _has_agenda() -> bool:
+    return sa.inspect(op.get_bind()).has_table('agenda_events')
+
+
+def upgrade():
+    if not _has_agenda():
+        return
+    op.create_index('ix_agenda_events_status_start', 'agenda_events', ['status', 'start_datetime'])
+
+
+def downgrade():
+    if not _has_agenda():
+        return
+    op.drop_index('ix_agenda_events_status_start', table_name='agenda_events')
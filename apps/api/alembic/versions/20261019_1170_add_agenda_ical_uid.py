@@ -0,0 +1,37 @@
+"""add agenda_events.ical_uid (import / export iCalendar)
+
+Revision ID: 20261019_1170
+Revises: 20261019_1160
+Create Date: 2026-10-19 12:10:00.000000
+
+agenda_events est créée par init_db() (create_all) : on ne la modifie que si
+elle existe déjà.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1170'
+down_revision = '20261019_1160'
+branch_labels = None
+depends_on = None
+
+
+def _has_agenda() -> bool:
+    return sa.inspect(op.get_bind()).has_table('agenda_events')
+
+
+def upgrade():
+    if not _has_agenda():
+        return
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.add_column(sa.Column('ical_uid', sa.String(length=255)))
+    op.create_index('ix_agenda_events_ical_uid', 'agenda_events', ['ical_uid'], unique=True)
+
+
+def downgrade():
+    if not _has_agenda():
+        return
+    op.drop_index('ix_agenda_events_ical_uid', table_name='agenda_events')
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('ical_uid')
@@ -0,0 +1,60 @@
+"""add conversations.message_count / last_message_at / last_message_preview
+
+Revision ID: 20261019_1180
+Revises: 20261019_1170
+Create Date: 2026-10-19 12:20:00.000000
+
+Compteurs dénormalisés des listes de conversations (tenus à jour par
+ConversationService.add_message), remplis ici en une requête pour les
+conversations existantes, et index (is_archived, updated_at) de la liste.
+
+conversations / messages sont créées par init_db() (create_all) : on ne les
+modifie que si elles existent déjà.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1180'
+down_revision = '20261019_1170'
+branch_labels = None
+depends_on = None
+
+
+def _has_conversations() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table('conversations') and inspector.has_table('messages')
+
+
+def upgrade():
+    if not _has_conversations():
+        return
+    with op.batch_alter_table('conversations') as batch:
+        batch.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+        batch.add_column(sa.Column('last_message_at', sa.DateTime()))
+        batch.add_column(sa.Column('last_message_preview', sa.String(200)))
+    # backfill ensembliste (PostgreSQL et SQLite); l'aperçu n'est pas normalisé comme à l'écriture
+    op.execute(
+        """
+        UPDATE conversations SET
+            message_count = (SELECT count(*) FROM messages m WHERE m.conversation_id = conversations.id),
+            last_message_at = (SELECT max(m.created_at) FROM messages m WHERE m.conversation_id = conversations.id),
+            last_message_preview = (
+                SELECT substr(m.content, 1, 200) FROM messages m
+                WHERE m.conversation_id = conversations.id
+                ORDER BY m.created_at DESC LIMIT 1
+            )
+        WHERE EXISTS (SELECT 1 FROM messages m WHERE m.conversation_id = conversations.id)
+        """
+    )
+    op.create_index('ix_conversations_archived_updated', 'conversations', ['is_archived', 'updated_at'])
+
+
+def downgrade():
+    if not _has_conversations():
+        return
+    op.drop_index('ix_conversations_archived_updated', table_name='conversations')
+    with op.batch_alter_table('conversations') as batch:
+        batch.drop_column('last_message_preview')
+        batch.drop_column('last_message_at')
+        batch.drop_column('message_count')
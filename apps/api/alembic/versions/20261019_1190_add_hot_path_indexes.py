@@ -0,0 +1,61 @@
+"""add indexes for hot query paths (messages, memories, oauth_tokens, agenda_events)
+
+Revision ID: 20261019_1190
+Revises: 20261019_1180
+Create Date: 2026-10-19 12:30:00.000000
+
+Sous PostgreSQL les index sont construits en CREATE INDEX CONCURRENTLY, hors
+transaction (autocommit_block) : pas de verrou bloquant les écritures sur des
+tables déjà volumineuses. IF NOT EXISTS rend la migration rejouable après un
+échec partiel (un index resté INVALID doit être supprimé à la main).
+
+L'index conversations (is_archived, updated_at) est posé par 20261019_1180.
+Tables créées par init_db() (create_all) : ignorées si absentes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1190'
+down_revision = '20261019_1180'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at']),
+    ('ix_memories_category_importance_accessed', 'memories', ['category', 'importance', 'last_accessed']),
+    ('ix_oauth_tokens_provider_user_created', 'oauth_tokens', ['provider', 'user_id', 'created_at']),
+    ('ix_agenda_events_category_priority', 'agenda_events', ['category', 'priority']),
+]
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _existing_tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    tables = _existing_tables()
+    todo = [i for i in INDEXES if i[1] in tables]
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for name, table, columns in todo:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in todo:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    tables = _existing_tables()
+    todo = [i for i in INDEXES if i[1] in tables]
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for name, table, _ in todo:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in todo:
+            op.drop_index(name, table_name=table, if_exists=True)
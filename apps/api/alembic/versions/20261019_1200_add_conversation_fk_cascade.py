@@ -0,0 +1,71 @@
+"""messages / memories -> conversations: ON DELETE CASCADE / SET NULL
+
+Revision ID: 20261019_1200
+Revises: 20261019_1190
+Create Date: 2026-10-19 12:40:00.000000
+
+La suppression d'une conversation est faite par la base (relation en
+passive_deletes) : messages supprimés, memories.related_conversation_id remis
+à NULL.
+
+Sous PostgreSQL la contrainte est recréée sous le même nom en NOT VALID (pas
+de parcours de la table sous verrou), puis validée hors transaction
+(VALIDATE CONSTRAINT ne bloque pas les écritures). Sous SQLite la table est
+reconstruite (batch) : les contraintes sans nom y reçoivent celui de
+NAMING_CONVENTION.
+
+Tables créées par init_db() (create_all) : ignorées si absentes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1200'
+down_revision = '20261019_1190'
+branch_labels = None
+depends_on = None
+
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+FOREIGN_KEYS = [
+    ('messages', 'conversation_id', 'CASCADE'),
+    ('memories', 'related_conversation_id', 'SET NULL'),
+]
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _replace_foreign_keys(ondelete_for) -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('conversations'):
+        return
+    to_validate = []
+    for table, column, ondelete in FOREIGN_KEYS:
+        if not inspector.has_table(table):
+            continue
+        current = next(
+            (fk for fk in inspector.get_foreign_keys(table)
+             if fk['referred_table'] == 'conversations' and fk['constrained_columns'] == [column]),
+            None,
+        )
+        name = (current or {}).get('name') or f'fk_{table}_{column}_conversations'
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            if current is not None:
+                batch.drop_constraint(name, type_='foreignkey')
+            batch.create_foreign_key(name, 'conversations', [column], ['id'], ondelete=ondelete_for(ondelete),
+                                     postgresql_not_valid=True)
+        to_validate.append((table, name))
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for table, name in to_validate:
+                op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def upgrade():
+    _replace_foreign_keys(lambda ondelete: ondelete)
+
+
+def downgrade():
+    _replace_foreign_keys(lambda ondelete: None)
@@ -0,0 +1,37 @@
+"""funding_rollups: NULL years keyed "" in the year dimension
+
+Revision ID: 20261019_1210
+Revises: 20261019_1200
+Create Date: 2026-10-19 12:50:00.000000
+
+Le backfill de 20261019_1030 rangeait les flux sans année sous la clé "0",
+alors que les deltas d'ingestion (RollupDelta) et rebuild() utilisent "".
+La dimension year est recalculée depuis funding_records avec la bonne clé;
+les autres dimensions ne sont pas touchées.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_1210'
+down_revision = '20261019_1200'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not (inspector.has_table('funding_rollups') and inspector.has_table('funding_records')):
+        return
+    op.execute("DELETE FROM funding_rollups WHERE dimension = 'year'")
+    op.execute(
+        "INSERT INTO funding_rollups (dimension, key, year, total_amount, flow_count) "
+        "SELECT 'year', COALESCE(CAST(year AS VARCHAR(255)), ''), COALESCE(year, 0), "
+        "COALESCE(SUM(amount), 0), COUNT(*) "
+        "FROM funding_records GROUP BY year"
+    )
+
+
+def downgrade():
+    # la clé "0" était une incohérence : rien à restaurer
+    pass
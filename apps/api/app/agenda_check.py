@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Write-path check for the agenda with materialized occurrences.
+
+Runs the agenda router against a scratch SQLite database (foreign keys on,
+as in the SQLite profile) with AGENDA_MATERIALIZE_DAYS > 0, creates a
+recurring event (alone, then in a non-atomic batch next to an invalid
+operation) and asserts that its occurrences were written and that the
+invalid operation is reported in the batch results.
+
+    python -m app.agenda_check
+
+Exit code 1 if a check fails.
+"""
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+
+def run() -> int:
+    # imported here: the engine is built from DATABASE_URL at import time
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+
+    from app.config import settings
+    from app.db import SessionLocal, engine
+    from app.models import AgendaOccurrence, Base
+    from app.routers import agenda
+
+    settings.AGENDA_MATERIALIZE_DAYS = 30
+    Base.metadata.create_all(engine)
+    app = FastAPI()
+    app.include_router(agenda.router, prefix="/api/agenda")
+    event = {"title": "daily", "start_datetime": datetime.utcnow().isoformat(),
+             "is_recurring": True, "recurrence_pattern": "daily"}
+
+    def occurrences(event_id) -> int:
+        with SessionLocal() as db:
+            return db.query(func.count()).filter(AgendaOccurrence.event_id == event_id).scalar()
+
+    failures = 0
+    with TestClient(app, raise_server_exceptions=False) as client:
+        response = client.post("/api/agenda/events", json=event)
+        ok = response.status_code == 200 and occurrences(uuid.UUID(response.json()["id"])) > 0
+        failures += not ok
+        print(f"[{'OK' if ok else 'FAIL'}] create recurring event: HTTP {response.status_code}")
+
+        response = client.post("/api/agenda/events/batch", json={"atomic": False, "operations": [
+            {"op": "create", "data": event},
+            {"op": "create", "data": {"title": ""}},
+        ]})
+        results = response.json().get("results", []) if response.status_code == 200 else []
+        ok = ([r["status"] for r in results] == ["ok", "error"]
+              and occurrences(uuid.UUID(results[0]["id"])) > 0)
+        failures += not ok
+        print(f"[{'OK' if ok else 'FAIL'}] batch create recurring event: HTTP {response.status_code}")
+    engine.dispose()
+    print(f"[agenda_check] {failures} failure(s)")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "agenda_check.db")
+        return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
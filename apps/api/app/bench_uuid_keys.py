@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: random (UUIDv4) vs time-ordered (UUIDv7) primary keys.
+
+Inserts the same rows (shaped like `messages`: id, conversation_id,
+created_at, short content) into one table per key kind, in committed batches,
+then reports insert throughput (overall and over the last 10% of rows, where
+the index no longer fits in cache) and primary-key index / table sizes
+(SQLite: file size, plus per-object sizes when built with dbstat).
+
+    python -m app.bench_uuid_keys                          # 10M rows, temporary SQLite files
+    python -m app.bench_uuid_keys --rows 1000000 --url postgresql+psycopg://.../scratch
+
+On PostgreSQL the bench tables are dropped at the end unless --keep is given.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, insert, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.models import uuid7
+
+KINDS: Dict[str, Callable[[], uuid.UUID]] = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+def _table(metadata: MetaData, kind: str) -> Table:
+    return Table(
+        f"bench_uuid_{kind}", metadata,
+        Column("id", UUID(as_uuid=True), primary_key=True),
+        Column("conversation_id", UUID(as_uuid=True), nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("content", String(64)),
+    )
+
+
+def _sizes(conn, table: Table) -> dict:
+    if conn.dialect.name == "postgresql":
+        row = conn.execute(text(
+            "SELECT pg_relation_size(i.indexrelid), pg_relation_size(i.indrelid), pg_total_relation_size(i.indrelid) "
+            "FROM pg_index i WHERE i.indrelid = CAST(:t AS regclass) AND i.indisprimary"
+        ), {"t": table.name}).one()
+        return {"pk_index_mb": row[0] / 2**20, "table_mb": row[1] / 2**20, "total_mb": row[2] / 2**20}
+    # SQLite : un fichier par variante, la taille du fichier est le total
+    pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+    page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+    sizes = {"pk_index_mb": None, "table_mb": None, "total_mb": pages * page_size / 2**20}
+    try:
+        # dbstat : taille par objet, si SQLite est compilé avec
+        by_name = dict(conn.exec_driver_sql(
+            "SELECT name, sum(pgsize) FROM dbstat WHERE tbl_name = ? GROUP BY name", (table.name,)
+        ).all())
+        sizes["pk_index_mb"] = sum(v for k, v in by_name.items() if k != table.name) / 2**20
+        sizes["table_mb"] = by_name.get(table.name, 0) / 2**20
+    except Exception:
+        pass
+    return sizes
+
+
+def bench(url: str, kind: str, rows: int, batch: int, keep: bool) -> dict:
+    engine = create_engine(url)
+    metadata = MetaData()
+    table = _table(metadata, kind)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    new_id = KINDS[kind]
+    conversations = [uuid.uuid4() for _ in range(1000)]
+    start_time = datetime.utcnow()
+    tail_from = rows - rows // 10
+    tail_started = None
+    started = time.perf_counter()
+    done = 0
+    try:
+        while done < rows:
+            n = min(batch, rows - done)
+            values = [
+                {"id": new_id(), "conversation_id": conversations[(done + i) % 1000],
+                 "created_at": start_time + timedelta(milliseconds=done + i), "content": "x" * 40}
+                for i in range(n)
+            ]
+            with engine.begin() as conn:
+                conn.execute(insert(table), values)
+            done += n
+            if tail_started is None and done >= tail_from:
+                tail_started, tail_done = time.perf_counter(), done
+        elapsed = time.perf_counter() - started
+        tail_elapsed = time.perf_counter() - tail_started
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.exec_driver_sql(f"ANALYZE {table.name}")
+            sizes = _sizes(conn, table)
+        return {
+            "kind": kind,
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_s": rows / elapsed,
+            "tail_rows_per_s": (rows - tail_done) / tail_elapsed if rows > tail_done else None,
+            **sizes,
+        }
+    finally:
+        if not keep and engine.dialect.name != "sqlite":
+            metadata.drop_all(engine)
+        engine.dispose()
+
+
+def _fmt(v) -> str:
+    if v is None:
+        return "-"
+    return f"{v:,.1f}" if isinstance(v, float) else str(v)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--url", help="scratch database URL (default: one temporary SQLite file per key kind)")
+    parser.add_argument("--keep", action="store_true", help="keep the bench tables (PostgreSQL)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in KINDS:
+            url = args.url or "sqlite:///" + os.path.join(tmp, f"bench_{kind}.db")
+            print(f"[bench_uuid_keys] {kind}: inserting {args.rows:,} rows ...", flush=True)
+            results.append(bench(url, kind, args.rows, args.batch, args.keep))
+
+    columns = ("kind", "rows", "seconds", "rows_per_s", "tail_rows_per_s", "pk_index_mb", "table_mb", "total_mb")
+    print(" | ".join(columns))
+    for r in results:
+        print(" | ".join(_fmt(r[c]) for c in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,23 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:5173"
     OAUTH_ENCRYPTION_KEY: str = ""  # Fernet key base64, optional in dev
     ENABLE_DB_BOOTSTRAP: bool = False
+
+    # --- Pool de connexions (par moteur : sync et async, donc jusqu'à 2 x (size + overflow) par worker) ---
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0     # secondes d'attente d'une connexion avant erreur
+    DB_POOL_RECYCLE: int = 1800       # secondes; -1 = jamais (connexions coupées par un proxy / pgbouncer)
+    DB_POOL_PRE_PING: bool = True     # vérifie la connexion avant usage (reconnexion après redémarrage de la base)
+
+    # --- Profil SQLite (DATABASE_URL sqlite://, déploiement mono-nœud) ---
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000      # attente d'un verrou avant « database is locked »
+    SQLITE_CACHE_SIZE_KB: int = 65536       # cache de pages par connexion
+    SQLITE_MMAP_SIZE: int = 268435456       # octets lus via mmap (0 = désactivé)
+    SQLITE_SERIALIZE_WRITES: bool = True    # un seul écrivain par moteur dans le processus
+    SQLITE_FOREIGN_KEYS: bool = True        # ON DELETE CASCADE / SET NULL appliqués par SQLite
+
     # --- Frontend URLs ---
     WEB_APP_URL: str = "http://127.0.0.1:5173"
     PUBLIC_FRONTEND_URL: str = ""
@@ -19,4 +36,40 @@ class Settings(BaseSettings):
     MS_CLIENT_SECRET: str = ""
     MS_TENANT: str = "common"
     MS_REDIRECT_URI: str = "http://127.0.0.1:8000/api/integrations/onedrive/callback"
+
+    # --- Ingestion ReliefWeb ---
+    RELIEFWEB_BASE_URL: str = "https://api.reliefweb.int/v1"
+    RELIEFWEB_APPNAME: str = "romain"
+    RELIEFWEB_PAGE_SIZE: int = 500  # max 1000 côté API
+    RELIEFWEB_CONCURRENCY: int = 4  # connexions HTTP du client (page suivante demandée pendant l'écriture)
+
+    # --- Ingestion FTS ---
+    FTS_CONCURRENCY: int = 3      # années téléchargées en parallèle
+    FTS_QUEUE_SIZE: int = 2000    # lignes en attente d'écriture (borne mémoire)
+    FTS_WRITE_BATCH: int = 500    # lignes par commit
+
+    # --- Planificateur d'ingestion ---
+    ENABLE_INGEST_SCHEDULER: bool = False
+    INGEST_LOCK_BACKEND: str = "auto"       # auto | postgres | redis | local
+    INGEST_LOCK_TTL: int = 900              # secondes, renouvelé pendant le job
+    INGEST_JITTER_SECONDS: int = 120
+    INGEST_RELIEFWEB_INTERVAL: int = 3600   # secondes
+    INGEST_FTS_INTERVAL: int = 86400
+
+    # --- Cache HTTP (ETag) ---
+    HTTP_CACHE_VERSION_TTL: float = 2.0   # secondes pendant lesquelles un numéro de version est réutilisé
+    HTTP_CACHE_MAX_ENTRIES: int = 512
+
+    # --- Dédoublonnage inter-sources ---
+    DEDUP_THRESHOLD: float = 0.8  # similarité de Jaccard estimée (MinHash) des titres
+
+    # --- Agenda ---
+    AGENDA_MATERIALIZE_DAYS: int = 0  # >0 : occurrences des séries matérialisées sur N jours
+    FREEBUSY_HORIZON_DAYS: int = 62         # fenêtre couverte par l'index d'occupation en cache
+    AGENDA_SUMMARY_CACHE_SECONDS: int = 30  # cache du résumé (invalidé par les écritures); 0 = désactivé
+    ENABLE_REMINDER_DISPATCHER: bool = False
+    REMINDER_SINK: str = "log"                 # log | webhook | module:fonction
+    REMINDER_WEBHOOK_URL: str = ""
+    REMINDER_LOOKAHEAD_SECONDS: int = 3600     # rappels chargés en mémoire à l'avance
+    REMINDER_GRACE_SECONDS: int = 300          # rappels en retard encore envoyés (redémarrage)
 settings = Settings(_env_file=".env", _env_file_encoding="utf-8")
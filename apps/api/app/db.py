@@ -1,60 +1,143 @@
 # -*- coding: utf-8 -*-
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine.url import make_url
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import importlib.util
 import psycopg
 import os
+from typing import Tuple
 
 from app.config import settings
 from app.models import Base
+from app.services import pool_metrics, sqlite_profile
 
+sync_pool_metrics = pool_metrics.metrics_for("sync")
+async_pool_metrics = pool_metrics.metrics_for("async")
 
-def _build_sync_engine_from_url(db_url: str):
-    """Return a synchronous SQLAlchemy engine from possibly async URL.
 
-    - Converts postgresql+asyncpg -> postgresql+psycopg (or psycopg2 fallback)
-    - Keeps SQLite as-is and sets proper connect args
-    - Falls back to local SQLite file if driver missing
+def _pool_options(db_url: str, is_async: bool = False) -> dict:
+    """Pool settings from Settings (DB_POOL_*), with wait-time instrumentation.
+
+    In-memory SQLite keeps its single-connection pool (nothing to size).
+    """
+    url = make_url(db_url)
+    if url.drivername.startswith("sqlite") and (url.database or ":memory:") == ":memory:":
+        return {}
+    if is_async:
+        poolclass = pool_metrics.timed_pool(AsyncAdaptedQueuePool, async_pool_metrics)
+    else:
+        poolclass = pool_metrics.timed_pool(QueuePool, sync_pool_metrics)
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _sqlite_engine(db_url, is_async: bool = False):
+    """SQLite engine with the single-node profile (WAL, pragmas, serialized writer)."""
+    if is_async:
+        engine = create_async_engine(db_url, echo=False, connect_args=sqlite_profile.connect_args(),
+                                     **_pool_options(db_url, is_async=True))
+        sqlite_profile.apply(engine.sync_engine, is_async=True)
+    else:
+        engine = create_engine(db_url, echo=False, future=True, connect_args=sqlite_profile.connect_args(),
+                               **_pool_options(db_url))
+        sqlite_profile.apply(engine)
+    return engine
+
+
+FALLBACK_SQLITE_URL = "sqlite:///./romain.db"
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def _engine_urls(db_url: str) -> Tuple[URL, URL]:
+    """Return the (sync, async) URLs of the database both engines connect to.
+
+    Decided once for both engines, so they never point at different databases:
+    - SQLite -> as-is for sync, sqlite+aiosqlite for async (single-node profile, see app.services.sqlite_profile)
+    - PostgreSQL -> postgresql+psycopg (or psycopg2) for sync, postgresql+asyncpg for async
+    - Malformed URL, or a PostgreSQL driver missing on either side -> local SQLite file, with a loud warning
     """
     try:
         url = make_url(db_url)
     except Exception:
-        # Fallback to SQLite file if URL is malformed
-        return create_engine("sqlite:///./romain.db", echo=False, future=True, connect_args={"check_same_thread": False})
+        print(f"[WARN] Malformed DATABASE_URL. Falling back to SQLite {FALLBACK_SQLITE_URL}")
+        url = make_url(FALLBACK_SQLITE_URL)
 
     driver = url.drivername or ""
+    if driver.startswith("postgresql"):
+        sync_driver = next((d for d in ("psycopg", "psycopg2") if _has_module(d)), None)
+        if sync_driver and _has_module("asyncpg"):
+            return url.set(drivername=f"postgresql+{sync_driver}"), url.set(drivername="postgresql+asyncpg")
+        missing = "asyncpg" if sync_driver else "psycopg/psycopg2"
+        print(f"[WARN] {missing} not installed. Falling back to SQLite {FALLBACK_SQLITE_URL}")
+        url = make_url(FALLBACK_SQLITE_URL)
+        driver = url.drivername
 
-    # SQLite
     if driver.startswith("sqlite"):
-        return create_engine(db_url, echo=False, future=True, connect_args={"check_same_thread": False})
+        return url, url.set(drivername="sqlite+aiosqlite")
+    return url, url
 
-    # Postgres: coerce async driver to sync
-    sync_url = db_url
-    if "+asyncpg" in driver:
-        sync_url = db_url.replace("+asyncpg", "+psycopg")
 
-    # Try psycopg (v3)
-    try:
-        return create_engine(sync_url, echo=False, future=True)
-    except ModuleNotFoundError:
-        # Try psycopg2
-        try:
-            sync_url_psycopg2 = sync_url.replace("+psycopg", "+psycopg2")
-            return create_engine(sync_url_psycopg2, echo=False, future=True)
-        except ModuleNotFoundError:
-            # Final fallback to SQLite file with a loud warning
-            print("[WARN] psycopg/psycopg2 not installed. Falling back to SQLite ./romain.db")
-            return create_engine("sqlite:///./romain.db", echo=False, future=True, connect_args={"check_same_thread": False})
+def _build_sync_engine(url: URL):
+    """Synchronous engine for a URL from _engine_urls."""
+    if url.drivername.startswith("sqlite"):
+        return _sqlite_engine(url)
+    return create_engine(url, echo=False, future=True, **_pool_options(url))
+
 
+def _build_async_engine(url: URL):
+    """AsyncEngine for a URL from _engine_urls (sslmode query arg mapped to asyncpg's ssl)."""
+    if url.drivername.startswith("sqlite"):
+        return _sqlite_engine(url, is_async=True)
+    connect_args = {}
+    if url.drivername == "postgresql+asyncpg":
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        url = url.set(query=query)
+    return create_async_engine(url, echo=False, connect_args=connect_args, **_pool_options(url, is_async=True))
 
-# Create synchronous SQLAlchemy engine (compatible with current routers/services)
-engine = _build_sync_engine_from_url(settings.DATABASE_URL)
+
+sync_url, async_url = _engine_urls(settings.DATABASE_URL)
+
+# Synchronous engine: scripts, jobs, migrations and streamed exports
+engine = _build_sync_engine(sync_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+pool_metrics.instrument(engine, sync_pool_metrics)
+
+# Async engine: request handlers (DB I/O runs on the event loop, not in the threadpool)
+async_engine = _build_async_engine(async_url)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+pool_metrics.instrument(async_engine.sync_engine, async_pool_metrics)
+
+
+async def get_db():
+    """FastAPI dependency that yields an AsyncSession and ensures proper close.
+
+    Handlers reuse the sync ORM code through `await db.run_sync(fn)`: `fn`
+    receives a regular Session whose queries are awaited on the async driver.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
-def get_db():
-    """FastAPI dependency that yields a DB session and ensures proper close."""
+def get_sync_db():
+    """Sync session for handlers bound by blocking SDK calls (kept in the threadpool)."""
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Query-plan regression check for the hot query paths.
+
+Seeds a scratch database, runs the real service queries (conversations,
+messages, memories, OAuth tokens, agenda), captures the SQL they emit and
+asserts with EXPLAIN that each one is served by its index.
+
+    python -m app.explain_check                 # temporary SQLite file
+    python -m app.explain_check --url postgresql+psycopg://.../scratch
+
+On PostgreSQL everything runs in one transaction that is rolled back, with
+enable_seqscan off so that the check does not depend on table sizes.
+Exit code 1 if a plan does not use the expected index.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from app.models import AgendaEvent, Base, Conversation, Memory, Message, OAuthToken
+from app.services.conversation_service import ConversationService, MemoryService
+from app.services.oauth_tokens import get_oauth_token
+
+CONVERSATIONS = 200
+MESSAGES_PER_CONVERSATION = 50
+MEMORY_CATEGORIES = 20
+AGENDA_CATEGORIES = 10
+PRIORITIES = ("low", "medium", "high", "urgent")
+
+
+def _seed(db: Session) -> dict:
+    now = datetime.utcnow()
+    conversations = [
+        {"id": uuid.uuid4(), "title": f"c{i}", "created_at": now, "updated_at": now - timedelta(minutes=i),
+         "is_archived": i % 10 == 0, "message_count": MESSAGES_PER_CONVERSATION}
+        for i in range(CONVERSATIONS)
+    ]
+    db.execute(insert(Conversation), conversations)
+    db.execute(insert(Message), [
+        {"id": uuid.uuid4(), "conversation_id": c["id"], "role": "user", "content": "x",
+         "created_at": now + timedelta(seconds=j)}
+        for c in conversations for j in range(MESSAGES_PER_CONVERSATION)
+    ])
+    db.execute(insert(Memory), [
+        {"id": uuid.uuid4(), "content": "m", "category": f"cat{i % MEMORY_CATEGORIES}",
+         "importance": (i % 100) / 100, "last_accessed": now - timedelta(hours=i), "access_count": 0}
+        for i in range(5000)
+    ])
+    user_ids = [uuid.uuid4() for _ in range(100)]
+    db.execute(insert(OAuthToken), [
+        {"id": uuid.uuid4(), "provider": ("google", "onedrive")[i % 2], "user_id": user_ids[i % 100],
+         "access_token": "t", "created_at": now - timedelta(minutes=i)}
+        for i in range(2000)
+    ])
+    db.execute(insert(AgendaEvent), [
+        {"id": uuid.uuid4(), "title": "e", "start_datetime": now + timedelta(hours=i), "status": "scheduled",
+         "category": f"cat{i % AGENDA_CATEGORIES}", "priority": PRIORITIES[i % len(PRIORITIES)],
+         "is_recurring": False}
+        for i in range(5000)
+    ])
+    return {"conversation_id": conversations[1]["id"], "user_id": user_ids[7]}
+
+
+def _checks(seed: dict) -> List[Tuple[str, str, Callable[[Session], object]]]:
+    """(name, expected index, call issuing the hot query)."""
+    return [
+        ("conversation messages", "ix_messages_conversation_created",
+         lambda db: ConversationService(db).get_conversation_messages(seed["conversation_id"])),
+        ("conversation list", "ix_conversations_archived_updated",
+         lambda db: ConversationService(db).get_conversations()),
+        ("memories by category", "ix_memories_category_importance_accessed",
+         lambda db: MemoryService(db).get_relevant_memories(category="cat3")),
+        ("latest oauth token", "ix_oauth_tokens_provider_user_created",
+         lambda db: get_oauth_token(db, "google", seed["user_id"])),
+        ("agenda by category/priority", "ix_agenda_events_category_priority",
+         lambda db: db.query(AgendaEvent).filter(
+             AgendaEvent.status == "scheduled", AgendaEvent.category == "cat2", AgendaEvent.priority == "high",
+         ).all()),
+    ]
+
+
+def _capture(db: Session, call: Callable[[Session], object]) -> List[tuple]:
+    """SELECT statements (sql, parameters) emitted by `call`."""
+    captured = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return captured
+
+
+def _plan(db: Session, statement: str, parameters) -> str:
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        return "\n".join(str(r[-1]) for r in rows)
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).fetchall()
+    return "\n".join(str(r[0]) for r in rows)
+
+
+def run(url: str) -> int:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    failures = 0
+    with Session(engine) as db:
+        try:
+            if engine.dialect.name == "postgresql":
+                db.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+            seed = _seed(db)
+            db.connection().exec_driver_sql("ANALYZE")
+            for name, index, call in _checks(seed):
+                statements = _capture(db, call)
+                plans = [_plan(db, sql, params) for sql, params in statements]
+                ok = any(index in plan for plan in plans)
+                failures += not ok
+                print(f"[{'OK' if ok else 'FAIL'}] {name}: expects {index}")
+                if not ok:
+                    for plan in plans:
+                        print("    " + plan.replace("\n", "\n    "))
+        finally:
+            db.rollback()
+    engine.dispose()
+    print(f"[explain_check] {failures} failure(s)")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="scratch database URL (default: temporary SQLite file)")
+    args = parser.parse_args()
+    if args.url:
+        return run(args.url)
+    with tempfile.TemporaryDirectory() as tmp:
+        return run("sqlite:///" + os.path.join(tmp, "explain_check.db"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Remplit la dimension pays pour les crises et offres déjà ingérées.
+
+Le code ISO3 est relu dans le payload ReliefWeb stocké (`raw`); à défaut, les
+noms de la colonne texte (`country` / `location`) sont rapprochés des pays
+connus. Traitement par lots, rejouable sans effet de bord.
+
+    python -m app.jobs.backfill_countries
+"""
+import json
+
+from sqlalchemy.orm import Session, undefer
+
+from app.db import SessionLocal
+from app.models import Crisis, JobPosting, CrisisCountry, JobCountry
+from app.services.countries import extract_countries, ensure_countries, codes_for_names, link_countries
+from app.services import facets
+from app.services.http_cache import bump_version
+
+CHUNK = 500
+
+
+def _codes(db: Session, raw, names) -> list:
+    try:
+        fields = json.loads(raw).get("fields", {}) if raw else {}
+    except (TypeError, ValueError):
+        fields = {}
+    codes = ensure_countries(db, extract_countries(fields.get("country")))
+    if not codes and names:
+        codes = codes_for_names(db, names.split(","))
+    return codes
+
+
+def backfill(db: Session, model, link_model, text_column: str, table: str) -> int:
+    """Recalcule les liaisons pays de `model`; retourne le nombre de lignes traitées."""
+    # identifiants d'abord : les commits par lot ne cassent pas l'itération
+    ids = [r.id for r in db.query(model.id).order_by(model.id)]
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        rows = db.query(model).options(undefer(model.raw)).filter(model.id.in_(chunk)).all()
+        for row in rows:
+            link_countries(row, link_model, _codes(db, row.raw, getattr(row, text_column)))
+        bump_version(db, table)
+        db.commit()
+        db.expunge_all()
+    return len(ids)
+
+
+def run() -> dict:
+    db = SessionLocal()
+    try:
+        result = {
+            "crises": backfill(db, Crisis, CrisisCountry, "country", "crises"),
+            "job_postings": backfill(db, JobPosting, JobCountry, "location", "job_postings"),
+        }
+        # pays / groupes modifiés : les facettes sont recalculées en bloc
+        for table in result:
+            facets.rebuild(db, table)
+        return result
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(run())
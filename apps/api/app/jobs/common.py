@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Outils partagés par les jobs d'ingestion."""
+import hashlib
+import json
+
+INSERTED = "inserted"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+
+def payload_hash(item) -> str:
+    """Empreinte sha256 stable (clés triées) d'un payload source."""
+    canonical = json.dumps(item, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def new_stats() -> dict:
+    return {INSERTED: 0, UPDATED: 0, UNCHANGED: 0}
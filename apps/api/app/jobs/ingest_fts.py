@@ -1,23 +1,64 @@
 # -*- coding: utf-8 -*-
+"""
+Ingestion FTS (flux de financement) en streaming.
+
+La réponse JSON est analysée au fil de l'eau (ijson) : chaque flux parsé est
+poussé dans une file bornée consommée par un unique écrivain qui commite par
+lots. Plusieurs années peuvent être rapatriées en parallèle (plafond
+FTS_CONCURRENCY); la mémoire reste bornée par la taille de la file, quelle que
+soit la taille des réponses.
+
+    python -m app.jobs.ingest_fts            # année courante
+    python -m app.jobs.ingest_fts 2015-2024  # backfill
+"""
 import asyncio
+import sys
 import httpx
 from sqlalchemy.orm import Session
 from datetime import datetime
+from app.config import settings
 from app.db import SessionLocal
 from app.models import FundingRecord
+from app.services.funding_rollups import RollupDelta
+from app.services.http_cache import bump_version
+from app.jobs.common import payload_hash, new_stats, INSERTED, UPDATED, UNCHANGED
 import json
 
+# ijson en option : sans lui, on retombe sur un chargement complet de la réponse
+HAS_IJSON = False
+try:
+    import ijson  # type: ignore
+    HAS_IJSON = True
+except Exception:
+    HAS_IJSON = False
+
 FTS_BASE = "https://api.hpc.tools/v1/public/fts/flow"
+_DONE = object()
 
 
-async def fetch_json(url: str, params=None):
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.get(url, params=params)
+async def stream_items(client: httpx.AsyncClient, url: str, params=None, prefix: str = "data.item"):
+    """Itère sur les éléments de `prefix` sans charger toute la réponse en mémoire."""
+    async with client.stream("GET", url, params=params) as r:
         r.raise_for_status()
-        return r.json()
+        if not HAS_IJSON:
+            data = json.loads(await r.aread())
+            for it in data.get("data", []):
+                yield it
+            return
+        events = ijson.sendable_list()
+        coro = ijson.items_coro(events, prefix, use_float=True)
+        async for chunk in r.aiter_bytes():
+            coro.send(chunk)
+            for it in events:
+                yield it
+            del events[:]
+        coro.close()
+        for it in events:
+            yield it
 
 
-def upsert_funding(db: Session, it: dict, year: int):
+def upsert_funding(db: Session, it: dict, year: int, rollups: RollupDelta | None = None) -> str:
+    """Insère ou met à jour un flux; retourne inserted | updated | unchanged."""
     # FTS returns flows; we compose a source_id from attributes
     donor = it.get("donor", {}).get("name")
     recipient = it.get("recipient", {}).get("name")
@@ -27,10 +68,17 @@ def upsert_funding(db: Session, it: dict, year: int):
     currency = "USD"
     key = json.dumps({"d":donor,"r":recipient,"c":cluster,"y":year,"cty":country}, sort_keys=True)
 
+    digest = payload_hash(it)
+
     row = db.query(FundingRecord).filter(FundingRecord.source=="fts", FundingRecord.source_id==key).first()
+    if row and row.content_hash == digest:
+        return UNCHANGED
+    outcome = UPDATED if row else INSERTED
     if not row:
         row = FundingRecord(source="fts", source_id=key)
         db.add(row)
+    elif rollups is not None:
+        rollups.remove(RollupDelta.snapshot(row))
     row.year = year
     row.country = country
     row.cluster = cluster
@@ -39,25 +87,96 @@ def upsert_funding(db: Session, it: dict, year: int):
     row.amount = float(amount) if amount is not None else None
     row.currency = currency
     row.raw = json.dumps(it)
+    row.content_hash = digest
+    if rollups is not None:
+        rollups.add(RollupDelta.snapshot(row))
+    return outcome
+
+
+def _write_batch(db: Session, batch: list, counts: dict) -> None:
+    rollups = RollupDelta()
+    changed = False
+    for year, it in batch:
+        outcome = upsert_funding(db, it, year, rollups)
+        counts.setdefault(year, new_stats())[outcome] += 1
+        changed = changed or outcome != UNCHANGED
+    # agrégats et version mis à jour dans la même transaction que les flux
+    rollups.apply(db)
+    if changed:
+        bump_version(db, "funding_records")
+    db.commit()
+
 
+async def _writer(db: Session, queue: asyncio.Queue, counts: dict) -> None:
+    """Unique consommateur de la file : écrit par lots hors de la boucle d'événements."""
+    batch_size = max(1, settings.FTS_WRITE_BATCH)
+    batch = []
+    while True:
+        entry = await queue.get()
+        if entry is _DONE:
+            break
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            await asyncio.to_thread(_write_batch, db, batch, counts)
+            batch = []
+    if batch:
+        await asyncio.to_thread(_write_batch, db, batch, counts)
 
-async def run(year: int | None = None):
-    year = year or datetime.utcnow().year
+
+async def run(year: int | None = None, years: list[int] | None = None,
+              transport: httpx.AsyncBaseTransport | None = None) -> dict:
+    """Ingestion d'une ou plusieurs années; retourne les compteurs inserted/updated/unchanged par année."""
+    years = list(years or [year or datetime.utcnow().year])
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.FTS_QUEUE_SIZE))
+    sem = asyncio.Semaphore(max(1, settings.FTS_CONCURRENCY))
+    counts: dict = {}
     db = SessionLocal()
-    try:
+
+    async def produce(client: httpx.AsyncClient, y: int):
         # Basic query: top-level flows aggregated by donor/recipient/location/cluster
         params = {
-            "year": year,
+            "year": y,
             "groupby": "donor,recipient,location,cluster",
             "size": 5000,
         }
-        data = await fetch_json(FTS_BASE, params=params)
-        for it in data.get("data", []):
-            upsert_funding(db, it, year)
-        db.commit()
+        async with sem:
+            async for it in stream_items(client, FTS_BASE, params=params):
+                await queue.put((y, it))
+
+    try:
+        async with httpx.AsyncClient(timeout=120, transport=transport) as client:
+            writer = asyncio.create_task(_writer(db, queue, counts))
+            producers = asyncio.gather(*(produce(client, y) for y in years))
+            await asyncio.wait({writer, producers}, return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                # l'écrivain ne s'arrête qu'en cas d'erreur : débloquer les producteurs
+                producers.cancel()
+                writer.result()
+            try:
+                await producers
+            except BaseException:
+                writer.cancel()
+                raise
+            await queue.put(_DONE)
+            await writer
+        return counts
+    except BaseException:
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
+def _parse_years(args: list[str]) -> list[int]:
+    years = []
+    for a in args:
+        if "-" in a:
+            start, end = a.split("-", 1)
+            years.extend(range(int(start), int(end) + 1))
+        else:
+            years.append(int(a))
+    return years
+
+
 if __name__ == "__main__":
-    asyncio.run(run())
+    print(asyncio.run(run(years=_parse_years(sys.argv[1:]) or None)))
@@ -1,23 +1,55 @@
 # -*- coding: utf-8 -*-
+"""
+Synchronisation incrémentale ReliefWeb (disasters + jobs).
+
+Chaque ressource garde un high-water mark (dernier `date.changed`/`id`) dans
+`sync_state` : on ne demande à l'API que les éléments modifiés depuis, triés
+par (`date.changed`, `id`) croissants.
+
+Pagination par clé : chaque page repart du dernier `date.changed` lu (filtre
+`from`), l'offset ne sert qu'à sauter les ex-aequo déjà lus. Un élément modifié
+pendant la synchro passe en fin de liste au lieu de décaler les pages
+suivantes, et le watermark avance page par page avec les lignes écrites. La
+page suivante est demandée pendant l'écriture de la courante.
+
+Hors ligne : `python -m app.jobs.ingest_reliefweb --fixture` utilise le serveur
+de fixtures `app.jobs.reliefweb_fixture` en mémoire à la place de l'API.
+"""
 import asyncio
+import sys
 import httpx
 from sqlalchemy.orm import Session
 from datetime import datetime
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from app.config import settings
 from app.db import SessionLocal
-from app.models import Crisis, JobPosting
+from app.models import Crisis, JobPosting, SyncState, CrisisCountry, JobCountry
+from app.services.countries import extract_countries, ensure_countries, codes_for_names, link_countries
+from app.services.http_cache import bump_version
+from app.services import dedup
+from app.services.facets import FacetDelta, snapshot
+from app.jobs.common import payload_hash, new_stats, INSERTED, UPDATED, UNCHANGED
 import json
 
-RELIEFWEB_BASE = "https://api.reliefweb.int/v1"
+RELIEFWEB_BASE = settings.RELIEFWEB_BASE_URL.rstrip("/")
+TABLES = {"disasters": "crises", "jobs": "job_postings"}
+PAGE_OVERLAP = 20
 
 
-async def fetch_json(url: str, params=None):
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        return r.json()
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=10),
+    retry=retry_if_exception_type(httpx.TransportError),
+    reraise=True,
+)
+async def fetch_json(client: httpx.AsyncClient, url: str, params=None):
+    r = await client.get(url, params=params)
+    r.raise_for_status()
+    return r.json()
 
 
-def upsert_crisis(db: Session, item: dict):
+def upsert_crisis(db: Session, item: dict, facets: FacetDelta | None = None) -> str:
+    """Insère ou met à jour une crise; retourne inserted | updated | unchanged."""
     sid = str(item.get("id"))
     fields = item.get("fields", {})
     title = fields.get("name") or fields.get("title") or ""
@@ -27,18 +59,33 @@ def upsert_crisis(db: Session, item: dict):
     pub = fields.get("date", {}).get("created") or fields.get("date", {}).get("original")
     published_at = datetime.fromisoformat(pub.replace("Z", "+00:00")) if pub else None
 
+    digest = payload_hash(item)
+
     row = db.query(Crisis).filter(Crisis.source=="reliefweb", Crisis.source_id==sid).first()
+    if row and row.content_hash == digest:
+        return UNCHANGED
+    outcome = UPDATED if row else INSERTED
     if not row:
         row = Crisis(source="reliefweb", source_id=sid)
         db.add(row)
+    elif facets is not None:
+        facets.remove(snapshot("crises", row))
     row.title = title
     row.country = country
     row.url = url
     row.published_at = published_at
     row.raw = json.dumps(item)
+    row.content_hash = digest
+    codes = ensure_countries(db, extract_countries(countries))
+    link_countries(row, CrisisCountry, codes)
+    dedup.assign_cluster(db, Crisis, "crises", row, dedup.block_key(codes, published_at))
+    if facets is not None:
+        facets.add(snapshot("crises", row))
+    return outcome
 
 
-def upsert_job(db: Session, item: dict):
+def upsert_job(db: Session, item: dict, facets: FacetDelta | None = None) -> str:
+    """Insère ou met à jour une offre; retourne inserted | updated | unchanged."""
     sid = str(item.get("id"))
     fields = item.get("fields", {})
     title = fields.get("title") or ""
@@ -52,10 +99,17 @@ def upsert_job(db: Session, item: dict):
     published_at = datetime.fromisoformat(pub.replace("Z", "+00:00")) if pub else None
     deadline = datetime.fromisoformat(dl.replace("Z", "+00:00")) if dl else None
 
+    digest = payload_hash(item)
+
     row = db.query(JobPosting).filter(JobPosting.source=="reliefweb", JobPosting.source_id==sid).first()
+    if row and row.content_hash == digest:
+        return UNCHANGED
+    outcome = UPDATED if row else INSERTED
     if not row:
         row = JobPosting(source="reliefweb", source_id=sid)
         db.add(row)
+    elif facets is not None:
+        facets.remove(snapshot("job_postings", row))
     row.title = title
     row.org = org
     row.location = location
@@ -63,23 +117,135 @@ def upsert_job(db: Session, item: dict):
     row.published_at = published_at
     row.deadline = deadline
     row.raw = json.dumps(item)
+    row.content_hash = digest
+    codes = ensure_countries(db, extract_countries(fields.get("country", [])))
+    if not codes and locs:
+        codes = codes_for_names(db, [l.get("name") for l in locs])
+    link_countries(row, JobCountry, codes)
+    dedup.assign_cluster(db, JobPosting, "job_postings", row, dedup.block_key(codes, published_at, org))
+    if facets is not None:
+        facets.add(snapshot("job_postings", row))
+    return outcome
 
 
-async def run():
-    db = SessionLocal()
+def _sort_key(item: dict) -> tuple:
+    """Clé (date.changed, id) servant de high-water mark."""
+    changed = item.get("fields", {}).get("date", {}).get("changed") or ""
+    try:
+        return (changed, int(item.get("id")))
+    except (TypeError, ValueError):
+        return (changed, 0)
+
+
+def _query_params(changed_from: str, offset: int, limit: int) -> list:
+    params = [
+        ("appname", settings.RELIEFWEB_APPNAME),
+        ("profile", "full"),
+        ("limit", limit),
+        ("offset", offset),
+        ("sort[]", "date.changed:asc"),
+        ("sort[]", "id:asc"),
+    ]
+    if changed_from:
+        # borne inclusive : les ex-aequo déjà lus sont sautés (offset) ou écartés par clé
+        params += [
+            ("filter[field]", "date.changed"),
+            ("filter[value][from]", changed_from),
+        ]
+    return params
+
+
+async def sync_resource(client: httpx.AsyncClient, db: Session, resource: str, upsert, *,
+                        page_size: int | None = None) -> dict:
+    """Synchronise une ressource ReliefWeb depuis son watermark; retourne les compteurs inserted/updated/unchanged."""
+    page_size = page_size or settings.RELIEFWEB_PAGE_SIZE
+    # ex-aequo relus en tête de page : si l'un d'eux est modifié entre deux pages, rien n'est sauté
+    overlap = min(PAGE_OVERLAP, page_size // 2)
+    key = f"reliefweb:{resource}"
+    table = TABLES[resource]
+
+    state = db.get(SyncState, key)
+    if not state:
+        state = SyncState(source=key)
+        db.add(state)
     try:
-        # Crises
-        crises = await fetch_json(f"{RELIEFWEB_BASE}/disasters", params={"appname":"romain","profile":"full","limit":50})
-        for it in crises.get("data", []):
-            upsert_crisis(db, it)
-        # Jobs
-        jobs = await fetch_json(f"{RELIEFWEB_BASE}/jobs", params={"appname":"romain","profile":"full","limit":50})
-        for it in jobs.get("data", []):
-            upsert_job(db, it)
+        seen = (state.watermark or "", int(state.last_id or 0))
+    except ValueError:
+        seen = (state.watermark or "", 0)
+    stats = new_stats()
+
+    def handle(items: list, high: tuple):
+        changed = False
+        facets = FacetDelta(table)
+        for it in items:
+            outcome = upsert(db, it, facets)
+            stats[outcome] += 1
+            changed = changed or outcome != UNCHANGED
+        # facettes et version mises à jour dans la même transaction que les lignes
+        facets.apply(db)
+        if changed:
+            bump_version(db, table)
+        # le watermark avance avec la page : une reprise après échec repart de là
+        if high > seen:
+            state.watermark, state.last_id = high[0], str(high[1])
         db.commit()
+
+    url = f"{RELIEFWEB_BASE}/{resource}"
+    cursor = (seen[0], -1)  # dernière clé lue; rien encore à date.changed == watermark
+    ties = 0  # éléments lus avec date.changed == cursor[0] : en tête de la requête suivante
+    pending = asyncio.ensure_future(fetch_json(client, url, params=_query_params(cursor[0], 0, page_size)))
+    while pending is not None:
+        page = (await pending).get("data", [])
+        before, fresh = cursor, []
+        for it in page:
+            k = _sort_key(it)
+            if k <= cursor:
+                continue  # relu (chevauchement)
+            ties = ties + 1 if k[0] == cursor[0] else 1
+            cursor = k
+            if k <= seen:
+                stats[UNCHANGED] += 1  # déjà traité lors d'une synchro précédente
+            else:
+                fresh.append(it)
+        pending = None
+        if len(page) >= page_size and cursor > before:
+            offset = max(0, ties - overlap)
+            pending = asyncio.ensure_future(
+                fetch_json(client, url, params=_query_params(cursor[0], offset, page_size))
+            )
+        # écriture (ORM, dédoublonnage, facettes, commit) hors de la boucle d'événements de l'API
+        write = asyncio.ensure_future(asyncio.to_thread(handle, fresh, cursor))
+        try:
+            await asyncio.shield(write)
+        except BaseException:
+            if pending is not None:
+                pending.cancel()
+            # job annulé (bail perdu) : la page en cours se termine avant la fermeture de la session
+            await asyncio.wait({write})
+            raise
+    return stats
+
+
+async def run(transport: httpx.AsyncBaseTransport | None = None) -> dict:
+    """Synchronise disasters puis jobs. `transport` permet d'injecter un serveur de fixtures."""
+    concurrency = max(1, settings.RELIEFWEB_CONCURRENCY)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    db = SessionLocal()
+    try:
+        async with httpx.AsyncClient(timeout=60, limits=limits, transport=transport) as client:
+            crises = await sync_resource(client, db, "disasters", upsert_crisis)
+            jobs = await sync_resource(client, db, "jobs", upsert_job)
+        return {"disasters": crises, "jobs": jobs}
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    transport = None
+    if "--fixture" in sys.argv:
+        from app.jobs.reliefweb_fixture import app as fixture_app
+        transport = httpx.ASGITransport(app=fixture_app)
+    print(asyncio.run(run(transport=transport)))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Verrous à bail (lease) pour qu'un seul réplica exécute un job à la fois.
+
+- postgres : pg_try_advisory_lock sur une connexion dédiée, libéré à la fin
+  du job ou automatiquement si le process meurt (fermeture de la connexion).
+- redis : SET NX PX avec jeton, prolongé pendant l'exécution, libéré par
+  compare-and-delete.
+- local : équivalent en mémoire (dev, SQLite, réplica unique).
+
+INGEST_LOCK_BACKEND=auto choisit postgres si la base est PostgreSQL, sinon local.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.config import settings
+from app.db import engine
+
+
+def _advisory_key(name: str) -> int:
+    """Clé bigint signée stable dérivée du nom du verrou."""
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class Lease:
+    """Bail détenu sur un verrou nommé."""
+
+    def __init__(self, name: str, release, renew=None):
+        self.name = name
+        self._release = release
+        self._renew = renew
+
+    def renew(self) -> bool:
+        return self._renew() if self._renew else True
+
+    def release(self) -> None:
+        self._release()
+
+
+class LocalLock:
+    """Verrou en mémoire (un seul process)."""
+
+    name = "local"
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._held: dict = {}  # name -> (token, expires_at)
+
+    def acquire(self, name: str, ttl: int) -> Optional[Lease]:
+        token = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._mutex:
+            current = self._held.get(name)
+            if current and current[1] > now:
+                return None
+            self._held[name] = (token, now + ttl)
+
+        def renew() -> bool:
+            with self._mutex:
+                if self._held.get(name, (None,))[0] != token:
+                    return False
+                self._held[name] = (token, time.monotonic() + ttl)
+                return True
+
+        def release() -> None:
+            with self._mutex:
+                if self._held.get(name, (None,))[0] == token:
+                    del self._held[name]
+
+        return Lease(name, release, renew)
+
+
+class PostgresAdvisoryLock:
+    """Verrou consultatif PostgreSQL de niveau session."""
+
+    name = "postgres"
+
+    def acquire(self, name: str, ttl: int) -> Optional[Lease]:
+        key = _advisory_key(name)
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (key,))
+            acquired = bool(cur.fetchone()[0])
+            cur.close()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return None
+
+        def release() -> None:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT pg_advisory_unlock(%s)", (key,))
+                cur.close()
+                conn.commit()
+            except Exception:
+                # ne jamais rendre au pool une connexion qui détient encore le verrou
+                conn.invalidate()
+            finally:
+                conn.close()
+
+        # le verrou vit aussi longtemps que la connexion : pas de renouvellement
+        return Lease(name, release)
+
+
+_REDIS_RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+_REDIS_RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+
+
+class RedisLock:
+    """Verrou Redis à expiration (SET NX PX)."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis  # lazy import: only needed for this backend
+
+        self._redis = redis.Redis.from_url(url)
+
+    def acquire(self, name: str, ttl: int) -> Optional[Lease]:
+        key = f"romain:lock:{name}"
+        token = uuid.uuid4().hex
+        ttl_ms = int(ttl * 1000)
+        if not self._redis.set(key, token, nx=True, px=ttl_ms):
+            return None
+
+        def renew() -> bool:
+            return bool(self._redis.eval(_REDIS_RENEW, 1, key, token, ttl_ms))
+
+        def release() -> None:
+            self._redis.eval(_REDIS_RELEASE, 1, key, token)
+
+        return Lease(name, release, renew)
+
+
+def get_lock_backend():
+    """Instancie le backend de verrou selon INGEST_LOCK_BACKEND."""
+    choice = (settings.INGEST_LOCK_BACKEND or "auto").lower()
+    if choice == "auto":
+        choice = "postgres" if engine.dialect.name == "postgresql" else "local"
+    if choice == "postgres":
+        return PostgresAdvisoryLock()
+    if choice == "redis":
+        return RedisLock(settings.REDIS_URL)
+    return LocalLock()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Fait glisser l'horizon des occurrences matérialisées (AGENDA_MATERIALIZE_DAYS).
+
+Les écritures de l'agenda rafraîchissent déjà la série modifiée; ce job, lancé
+une fois par jour (cron), avance l'horizon de toutes les séries actives.
+
+    python -m app.jobs.materialize_occurrences
+"""
+from datetime import date, datetime
+
+from sqlalchemy import or_
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import AgendaEvent
+from app.services import recurrence
+from app.services.http_cache import bump_version
+
+CHUNK = 200
+
+
+def run() -> dict:
+    if settings.AGENDA_MATERIALIZE_DAYS <= 0:
+        return {"series": 0, "disabled": True}
+    today = datetime.combine(date.today(), datetime.min.time())
+    db = SessionLocal()
+    try:
+        ids = [
+            r.id for r in db.query(AgendaEvent.id).filter(
+                AgendaEvent.is_recurring.is_(True),
+                AgendaEvent.status == "scheduled",
+                or_(AgendaEvent.recurrence_until.is_(None), AgendaEvent.recurrence_until >= today),
+            )
+        ]
+        for start in range(0, len(ids), CHUNK):
+            for event in db.query(AgendaEvent).filter(AgendaEvent.id.in_(ids[start:start + CHUNK])):
+                recurrence.refresh_series(db, event)
+            bump_version(db, "agenda_events")
+            db.commit()
+        return {"series": len(ids)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(run())
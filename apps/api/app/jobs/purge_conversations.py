@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Purge des conversations en masse, par lots.
+
+Les conversations ciblées (voir conversation_filters) sont traitées par
+CONVERSATION_CHUNK : leurs messages sont supprimés par tranches de
+MESSAGE_CHUNK lignes, une transaction par tranche, puis les conversations
+elles-mêmes (ON DELETE CASCADE ne trouve plus rien à supprimer). Aucune ligne
+n'est chargée en mémoire et aucune transaction ne reste longtemps ouverte :
+les requêtes de l'API passent entre deux tranches.
+
+Lancé en tâche de fond par POST /api/conversations/bulk-delete, ou par cron :
+
+    python -m app.jobs.purge_conversations --older-than-days 90 --archived
+"""
+import argparse
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from app.db import SessionLocal
+from app.models import Conversation, Message
+from app.services.conversation_service import conversation_filters
+
+logger = logging.getLogger("app")
+
+CONVERSATION_CHUNK = 100
+MESSAGE_CHUNK = 5000
+
+
+def run(older_than_days: Optional[int] = None, archived: Optional[bool] = None) -> dict:
+    # date limite figée au lancement : les conversations qui vieillissent pendant la purge attendent la suivante
+    clauses = conversation_filters(older_than_days, archived)
+    if not clauses:
+        raise ValueError("au moins un critère (older_than_days, archived) est requis")
+    start = time.perf_counter()
+    conversations = messages = 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = [r.id for r in db.query(Conversation.id).filter(*clauses).limit(CONVERSATION_CHUNK)]
+            if not ids:
+                break
+            while True:
+                chunk = select(Message.id).where(Message.conversation_id.in_(ids)).limit(MESSAGE_CHUNK)
+                deleted = db.execute(
+                    delete(Message).where(Message.id.in_(chunk)).execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                messages += deleted
+                if deleted < MESSAGE_CHUNK:
+                    break
+            conversations += db.execute(
+                delete(Conversation).where(Conversation.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        result = {"conversations": conversations, "messages": messages}
+        logger.info({"event": "conversations_purged", "older_than_days": older_than_days, "archived": archived,
+                     "duration_ms": int((time.perf_counter() - start) * 1000), **result})
+        return result
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purge des conversations par lots")
+    parser.add_argument("--older-than-days", type=int, help="inactives (updated_at) depuis N jours")
+    parser.add_argument("--archived", action="store_true", help="uniquement les conversations archivées")
+    args = parser.parse_args()
+    print(run(args.older_than_days, True if args.archived else None))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Recalcule les signatures MinHash et les groupes de doublons inter-sources.
+
+À lancer après la migration (lignes existantes sans signature) ou après un
+changement de DEDUP_THRESHOLD. Les lignes sont rejouées dans l'ordre
+d'ingestion : la première vue de chaque groupe reste la canonique.
+
+    python -m app.jobs.rebuild_clusters
+"""
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session, selectinload
+
+from app.db import SessionLocal
+from app.models import Crisis, JobPosting, DedupBucket
+from app.services import dedup, facets
+from app.services.http_cache import bump_version
+
+CHUNK = 500
+
+
+def rebuild(db: Session, model, table: str) -> int:
+    db.execute(delete(DedupBucket).where(DedupBucket.table_name == table))
+    db.execute(update(model).values(cluster_id=None))
+    db.commit()
+    ids = [r.id for r in db.query(model.id).order_by(model.created_at, model.id)]
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        rows = {
+            r.id: r
+            for r in db.query(model).options(selectinload(model.country_links)).filter(model.id.in_(chunk))
+        }
+        for row_id in chunk:
+            row = rows[row_id]
+            codes = [link.iso3 for link in row.country_links]
+            org = getattr(row, "org", None)
+            dedup.assign_cluster(db, model, table, row, dedup.block_key(codes, row.published_at, org))
+            # les suivants du lot doivent voir cette ligne comme candidate
+            db.flush()
+        bump_version(db, table)
+        db.commit()
+        db.expunge_all()
+    return len(ids)
+
+
+def run() -> dict:
+    db = SessionLocal()
+    try:
+        result = {
+            "crises": rebuild(db, Crisis, "crises"),
+            "job_postings": rebuild(db, JobPosting, "job_postings"),
+        }
+        # pays / groupes modifiés : les facettes sont recalculées en bloc
+        for table in result:
+            facets.rebuild(db, table)
+        return result
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Serveur de fixtures imitant l'API ReliefWeb v1 (disasters, jobs) pour tester
+la synchronisation hors ligne.
+
+Données déterministes, filtre `date.changed` (from), tri `date.changed,id`
+croissant, pagination `offset`/`limit` et `totalCount` comme l'API réelle.
+
+    uvicorn app.jobs.reliefweb_fixture:app --port 8800
+    RELIEFWEB_BASE_URL=http://127.0.0.1:8800/v1 python -m app.jobs.ingest_reliefweb
+
+ou en mémoire : `python -m app.jobs.ingest_reliefweb --fixture`.
+"""
+import os
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Request
+
+FIXTURE_SIZE = int(os.getenv("RELIEFWEB_FIXTURE_SIZE", "1200"))
+_EPOCH = datetime(2024, 1, 1)
+
+COUNTRIES = [
+    ("AFG", "Afghanistan"), ("COD", "Democratic Republic of the Congo"), ("GIN", "Guinea"),
+    ("GNQ", "Equatorial Guinea"), ("HTI", "Haiti"), ("SDN", "Sudan"), ("SSD", "South Sudan"),
+    ("SYR", "Syrian Arab Republic"), ("UKR", "Ukraine"), ("YEM", "Yemen"),
+]
+ORGS = ["UNICEF", "World Food Programme", "Médecins Sans Frontières", "OCHA", "IOM"]
+
+app = FastAPI(title="ReliefWeb fixture")
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def _disaster(i: int) -> dict:
+    iso3, name = COUNTRIES[i % len(COUNTRIES)]
+    created = _EPOCH + timedelta(hours=i)
+    return {
+        "id": 50000 + i,
+        "fields": {
+            "name": f"{name}: Floods - {created:%b %Y} #{i}",
+            "country": [{"iso3": iso3.lower(), "name": name}],
+            "url": f"https://reliefweb.int/disaster/fl-{i}",
+            "date": {"created": _iso(created), "changed": _iso(created + timedelta(minutes=i % 7))},
+        },
+    }
+
+
+def _job(i: int) -> dict:
+    iso3, name = COUNTRIES[(i * 3) % len(COUNTRIES)]
+    posted = _EPOCH + timedelta(hours=i)
+    return {
+        "id": 90000 + i,
+        "fields": {
+            "title": f"Programme Officer ({name}) #{i}",
+            "source": [{"name": ORGS[i % len(ORGS)]}],
+            "country": [{"iso3": iso3.lower(), "name": name}],
+            "location": [{"name": name}],
+            "url": f"https://reliefweb.int/job/{90000 + i}",
+            "date": {
+                "posted": _iso(posted),
+                "closing": _iso(posted + timedelta(days=30)),
+                "changed": _iso(posted + timedelta(minutes=i % 5)),
+            },
+        },
+    }
+
+
+_DATA = {
+    "disasters": [_disaster(i) for i in range(FIXTURE_SIZE)],
+    "jobs": [_job(i) for i in range(FIXTURE_SIZE)],
+}
+
+
+def _changed(item: dict) -> str:
+    return item["fields"]["date"]["changed"]
+
+
+@app.get("/v1/{resource}")
+def list_resource(resource: str, request: Request):
+    items = _DATA.get(resource, [])
+    qp = request.query_params
+    if qp.get("filter[field]") == "date.changed" and qp.get("filter[value][from]"):
+        start = qp["filter[value][from]"]
+        items = [it for it in items if _changed(it) >= start]
+    items = sorted(items, key=lambda it: (_changed(it), it["id"]))
+    offset = int(qp.get("offset", 0))
+    limit = min(int(qp.get("limit", 10)), 1000)
+    page = items[offset: offset + limit]
+    return {"totalCount": len(items), "count": len(page), "data": page}
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Envoi des rappels de l'agenda.
+
+Le dispatcher charge les rappels dus dans les REMINDER_LOOKAHEAD_SECONDS à
+venir (occurrences des séries comprises, voir app.services.recurrence) dans un
+tas trié par échéance, puis dort jusqu'au prochain rappel : aucune
+interrogation périodique de la table. Le routeur agenda le réveille après
+chaque écriture (`notify`) pour recharger uniquement les événements touchés;
+les entrées devenues obsolètes restent dans le tas mais sont ignorées grâce à
+un numéro de génération par événement.
+
+Les rappels échus sont livrés par lot au sink configuré (REMINDER_SINK : log,
+webhook ou « module:fonction »), puis marqués envoyés en une seule requête.
+Livraison « au moins une fois » : un rappel livré mais non marqué (arrêt
+brutal) peut repartir au redémarrage s'il est encore dans la marge
+REMINDER_GRACE_SECONDS.
+
+Activé par ENABLE_REMINDER_DISPATCHER=true (démarré dans app.main), sur un seul
+réplica.
+"""
+import asyncio
+import heapq
+import importlib
+import itertools
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import bindparam, func, or_, update
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import AgendaEvent
+from app.services import recurrence
+from app.services.http_cache import bump_version
+
+logger = logging.getLogger("app")
+
+RETRY_SECONDS = 30  # attente après un échec (sink ou base indisponible)
+AGENDA_VERSION = "agenda_events"  # compteur incrémenté par app.routers.agenda
+
+
+def log_sink(reminders: List[dict]) -> None:
+    for r in reminders:
+        logger.info({"event": "agenda_reminder", **r})
+
+
+def webhook_sink(reminders: List[dict]) -> None:
+    import httpx  # lazy import: only needed for this sink
+
+    r = httpx.post(settings.REMINDER_WEBHOOK_URL, json={"reminders": reminders}, timeout=10)
+    r.raise_for_status()
+
+
+def get_sink() -> Callable[[List[dict]], None]:
+    """Instancie le sink selon REMINDER_SINK."""
+    choice = (settings.REMINDER_SINK or "log").strip()
+    if choice == "log":
+        return log_sink
+    if choice == "webhook":
+        return webhook_sink
+    module, _, attr = choice.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _payload(event: AgendaEvent, start: datetime) -> dict:
+    return {
+        "event_id": str(event.id),
+        "title": event.title,
+        "start_datetime": start.isoformat(),
+        "location": event.location,
+        "reminder_minutes": event.reminder_minutes,
+    }
+
+
+class ReminderDispatcher:
+    def __init__(self, sink: Optional[Callable[[List[dict]], None]] = None):
+        self.sink = sink
+        self._heap: list = []  # (échéance, n°, event_id, génération, payload, début d'occurrence)
+        self._seq = itertools.count()
+        self._gen: dict = {}
+        self._changed: set = set()
+        self._full_reload = True
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded_until: Optional[datetime] = None
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task:
+            return
+        if self.sink is None:
+            self.sink = get_sink()
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="agenda:reminders")
+        logger.info({"event": "reminder_dispatcher_started", "sink": getattr(self.sink, "__name__", str(self.sink))})
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def notify(self, *event_ids: uuid.UUID) -> None:
+        """Signale des événements créés / modifiés / supprimés (appelable depuis un thread du pool).
+
+        Sans identifiant (import en masse), tout est rechargé.
+        """
+        if not self._loop or not self._task:
+            return
+        self._loop.call_soon_threadsafe(self._on_change, event_ids)
+
+    def _on_change(self, event_ids: Iterable[uuid.UUID]) -> None:
+        if event_ids:
+            self._changed.update(event_ids)
+        else:
+            self._full_reload = True
+        self._wake.set()
+
+    # --- chargement ---
+
+    def _load(self, now: datetime, event_ids: Optional[set] = None) -> list:
+        """Rappels (échéance, event_id, payload, occurrence) dus dans [now - marge, now + horizon]."""
+        since = now - timedelta(seconds=settings.REMINDER_GRACE_SECONDS)
+        until = now + timedelta(seconds=settings.REMINDER_LOOKAHEAD_SECONDS)
+        db = SessionLocal()
+        try:
+            query = db.query(AgendaEvent).filter(
+                AgendaEvent.status == "scheduled",
+                AgendaEvent.reminder_minutes > 0,
+                or_(AgendaEvent.is_recurring.is_(True), AgendaEvent.is_reminder_sent.isnot(True)),
+            )
+            if event_ids is not None:
+                query = query.filter(AgendaEvent.id.in_(list(event_ids)))
+            max_minutes = query.with_entities(func.max(AgendaEvent.reminder_minutes)).scalar() or 0
+            out = []
+            for event, start in recurrence.occurrences(db, query, since, until + timedelta(minutes=max_minutes)):
+                due = start - timedelta(minutes=event.reminder_minutes)
+                if not since <= due <= until:
+                    continue
+                if event.reminder_sent_until and start <= event.reminder_sent_until:
+                    continue
+                out.append((due, event.id, _payload(event, start), start))
+            return out
+        finally:
+            db.close()
+
+    def _push(self, entries: list) -> None:
+        for due, event_id, payload, start in entries:
+            heapq.heappush(self._heap, (due, next(self._seq), event_id, self._gen.get(event_id, 0), payload, start))
+
+    async def _reload(self, now: datetime) -> None:
+        if self._full_reload:
+            entries = await asyncio.to_thread(self._load, now)
+            self._heap, self._gen = [], {}
+            self._push(entries)
+            self._full_reload = False
+            self._loaded_until = now + timedelta(seconds=settings.REMINDER_LOOKAHEAD_SECONDS)
+            self._changed.clear()
+            return
+        if self._changed:
+            ids, self._changed = self._changed, set()
+            for event_id in ids:
+                self._gen[event_id] = self._gen.get(event_id, 0) + 1
+            self._push(await asyncio.to_thread(self._load, now, ids))
+
+    # --- envoi ---
+
+    def _pop_due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, event_id, gen, payload, start = heapq.heappop(self._heap)
+            if gen == self._gen.get(event_id, 0):
+                due.append((event_id, payload, start))
+        return due
+
+    def _mark_sent(self, due: list) -> None:
+        db = SessionLocal()
+        try:
+            stmt = (
+                update(AgendaEvent)
+                .where(AgendaEvent.id == bindparam("eid"))
+                .values(is_reminder_sent=True, reminder_sent_until=bindparam("occurrence"))
+            )
+            db.connection().execute(stmt, [{"eid": event_id, "occurrence": start} for event_id, _, start in due])
+            # état des rappels visible dans les lectures agenda : invalide leurs ETag
+            bump_version(db, AGENDA_VERSION)
+            db.commit()
+        finally:
+            db.close()
+
+    async def dispatch_due(self, now: Optional[datetime] = None) -> int:
+        """Livre et marque les rappels échus; retourne leur nombre."""
+        due = self._pop_due(now or datetime.now())
+        if not due:
+            return 0
+        await asyncio.to_thread(self.sink, [payload for _, payload, _ in due])
+        await asyncio.to_thread(self._mark_sent, due)
+        logger.info({"event": "agenda_reminders_sent", "count": len(due)})
+        return len(due)
+
+    def _reload_at(self, now: datetime) -> datetime:
+        # rechargement complet à mi-horizon, pour que la fenêtre chargée ait toujours de l'avance
+        if self._loaded_until is None:
+            return now
+        return self._loaded_until - timedelta(seconds=settings.REMINDER_LOOKAHEAD_SECONDS / 2)
+
+    async def _run(self) -> None:
+        while True:
+            now = datetime.now()
+            try:
+                if now >= self._reload_at(now):
+                    self._full_reload = True
+                await self._reload(now)
+                await self.dispatch_due(now)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("reminder dispatch failed")
+                self._full_reload = True
+                await asyncio.sleep(RETRY_SECONDS)
+                continue
+            # sommeil jusqu'au prochain rappel, au prochain rechargement ou à une écriture
+            self._wake.clear()
+            if self._changed:
+                continue
+            now = datetime.now()
+            wake_at = self._reload_at(now)
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            timeout = (wake_at - now).total_seconds()
+            if timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+dispatcher = ReminderDispatcher()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Planificateur d'ingestion en process.
+
+Chaque job tourne à intervalle fixe (+/- INGEST_JITTER_SECONDS pour éviter que
+tous les réplicas se réveillent en même temps). Avant chaque exécution on prend
+un bail sur le verrou du job (voir app.jobs.locks) : un seul réplica ingère, les
+autres sautent leur tour. Chaque exécution est historisée dans `ingest_runs`.
+
+Activé par ENABLE_INGEST_SCHEDULER=true (démarré dans app.main).
+"""
+import asyncio
+import json
+import logging
+import random
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import IngestRun
+from app.jobs.locks import get_lock_backend
+
+logger = logging.getLogger("app")
+
+
+@dataclass
+class JobSpec:
+    name: str
+    func: Callable[[], Awaitable[dict]]
+    interval: int  # secondes
+    jitter: int = 0
+    next_run_at: Optional[datetime] = field(default=None, compare=False)
+    running: bool = field(default=False, compare=False)
+
+
+def _record_start(job: str) -> IngestRun:
+    db = SessionLocal()
+    try:
+        run = IngestRun(job=job, host=socket.gethostname(), status="running", started_at=datetime.utcnow())
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        db.expunge(run)
+        return run
+    finally:
+        db.close()
+
+
+def _record_end(run: IngestRun, status: str, duration_ms: int, rows: Optional[dict], error: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(IngestRun, run.id)
+        row.status = status
+        row.finished_at = datetime.utcnow()
+        row.duration_ms = duration_ms
+        row.rows = json.dumps(rows, default=str) if rows is not None else None
+        row.error = error
+        db.commit()
+    finally:
+        db.close()
+
+
+class IngestScheduler:
+    def __init__(self, jobs: list[JobSpec]):
+        self.jobs = {j.name: j for j in jobs}
+        self._backend = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_lock_backend()
+        return self._backend
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for spec in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(spec), name=f"ingest:{spec.name}"))
+        logger.info({"event": "ingest_scheduler_started", "jobs": list(self.jobs), "lock": self.backend.name})
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _delay(self, spec: JobSpec, base: float) -> float:
+        return max(1.0, base + random.uniform(-spec.jitter, spec.jitter))
+
+    async def _loop(self, spec: JobSpec) -> None:
+        # premier passage décalé aléatoirement pour étaler les réplicas
+        delay = random.uniform(0, max(1, spec.jitter))
+        while True:
+            spec.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            try:
+                await self.run_once(spec.name)
+            except Exception:
+                logger.exception("ingest job %s failed", spec.name)
+            delay = self._delay(spec, spec.interval)
+
+    async def run_once(self, name: str) -> Optional[dict]:
+        """Exécute un job sous bail; retourne ses compteurs, ou None si un autre réplica le détient."""
+        spec = self.jobs[name]
+        if spec.running:
+            return None
+        ttl = max(30, settings.INGEST_LOCK_TTL)
+        lease = await asyncio.to_thread(self.backend.acquire, f"ingest:{name}", ttl)
+        if not lease:
+            logger.info({"event": "ingest_skipped", "job": name, "reason": "locked"})
+            return None
+
+        job: Optional[asyncio.Future] = None
+        lost = False
+
+        async def keep_alive():
+            nonlocal lost
+            while True:
+                await asyncio.sleep(ttl / 3)
+                if not await asyncio.to_thread(lease.renew):
+                    # un autre réplica peut maintenant lancer le job : celui-ci cesse d'écrire
+                    logger.warning({"event": "ingest_lease_lost", "job": name})
+                    lost = True
+                    if job is not None:
+                        job.cancel()
+                    return
+
+        # tout ce qui suit l'acquisition est couvert par le finally : bail rendu même si l'historique échoue
+        spec.running = True
+        renewer = None
+        try:
+            renewer = asyncio.create_task(keep_alive())
+            run = await asyncio.to_thread(_record_start, name)
+            start = time.perf_counter()
+            job = asyncio.ensure_future(spec.func())
+            if lost:
+                job.cancel()
+            try:
+                rows = await job
+            except asyncio.CancelledError:
+                if not lost:
+                    raise  # arrêt du planificateur
+                duration_ms = int((time.perf_counter() - start) * 1000)
+                await asyncio.to_thread(_record_end, run, "error", duration_ms, None, "bail perdu : job interrompu")
+                return None
+            except Exception as e:
+                duration_ms = int((time.perf_counter() - start) * 1000)
+                await asyncio.to_thread(_record_end, run, "error", duration_ms, None, f"{type(e).__name__}: {e}")
+                raise
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            await asyncio.to_thread(_record_end, run, "success", duration_ms, rows, None)
+            logger.info({"event": "ingest_done", "job": name, "duration_ms": duration_ms, "rows": rows})
+            return rows
+        finally:
+            spec.running = False
+            if renewer is not None:
+                renewer.cancel()
+            await asyncio.to_thread(lease.release)
+
+
+def latest_runs(db, jobs) -> dict:
+    """Dernière exécution connue de chaque job (tous réplicas confondus)."""
+    result = {}
+    for job in jobs:
+        row = db.query(IngestRun).filter(IngestRun.job == job).order_by(IngestRun.started_at.desc()).first()
+        if not row:
+            result[job] = None
+            continue
+        result[job] = {
+            "status": row.status,
+            "host": row.host,
+            "started_at": row.started_at,
+            "finished_at": row.finished_at,
+            "duration_ms": row.duration_ms,
+            "rows": json.loads(row.rows) if row.rows else None,
+            "error": row.error,
+        }
+    return result
+
+
+async def _reliefweb_job() -> dict:
+    from app.jobs import ingest_reliefweb
+    return await ingest_reliefweb.run()
+
+
+async def _fts_job() -> dict:
+    from app.jobs import ingest_fts
+    return await ingest_fts.run()
+
+
+scheduler = IngestScheduler([
+    JobSpec("reliefweb", _reliefweb_job, settings.INGEST_RELIEFWEB_INTERVAL, settings.INGEST_JITTER_SECONDS),
+    JobSpec("fts", _fts_job, settings.INGEST_FTS_INTERVAL, settings.INGEST_JITTER_SECONDS),
+])
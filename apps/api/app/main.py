@@ -10,8 +10,12 @@ from starlette.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from pydantic import BaseModel, constr
-from app.routers import chat, docs, conversations, agenda, gdrive, onedrive, humdata
-from app.db import init_db, ensure_database_and_extensions
+from app.routers import chat, docs, conversations, agenda, gdrive, onedrive, humdata, metrics
+from app.db import init_db, ensure_database_and_extensions, async_engine
+from app.config import settings
+from app.services import pool_metrics
+from app.jobs.scheduler import scheduler as ingest_scheduler
+from app.jobs.reminders import dispatcher as reminder_dispatcher
 
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger("app")
@@ -47,6 +51,7 @@ app.include_router(agenda.router, prefix="/api/agenda", tags=["agenda"])
 app.include_router(gdrive.router, prefix="/api/integrations/google", tags=["integrations:google"])
 app.include_router(onedrive.router, prefix="/api/integrations/onedrive", tags=["integrations:onedrive"])
 app.include_router(humdata.router, prefix="/api", tags=["humdata"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 
 router = APIRouter()
@@ -58,6 +63,36 @@ def on_startup():
     ensure_database_and_extensions()
     init_db()
 
+
+@app.on_event("startup")
+async def start_ingest_scheduler():
+    """Start periodic ingestion jobs when enabled (one replica runs each job at a time)."""
+    if settings.ENABLE_INGEST_SCHEDULER:
+        ingest_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_ingest_scheduler():
+    await ingest_scheduler.stop()
+
+
+@app.on_event("startup")
+async def start_reminder_dispatcher():
+    """Start the agenda reminder dispatcher when enabled (run it on a single replica)."""
+    if settings.ENABLE_REMINDER_DISPATCHER:
+        reminder_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_reminder_dispatcher():
+    await reminder_dispatcher.stop()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    """Close the request-side connection pool."""
+    await async_engine.dispose()
+
 # Serve static files if present (Docker copies web dist into /app/static)
 STATIC_DIR_ENV = os.getenv("STATIC_DIR", "static").strip() or "static"
 
@@ -127,10 +162,14 @@ def list_items(limit: int = 20, offset: int = 0):
 class RequestLoggerMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         start = time.time()
+        response = None
+        # connexions du pool attribuées à la route de cette requête
+        token = pool_metrics.bind_request(request.scope)
         try:
             response = await call_next(request)
             return response
         finally:
+            pool_metrics.unbind_request(token)
             duration_ms = int((time.time() - start) * 1000)
             logger.info({
                 "method": request.method,
@@ -2,48 +2,154 @@
 """
 Modèles de base de données pour l'assistant Romain
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, Index, LargeBinary, text
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
+import os
+import threading
+import time
 import uuid
+import zlib
+
+# zstd en option (meilleur ratio/vitesse), zlib sinon
+HAS_ZSTD = False
+try:
+    import zstandard  # type: ignore
+    HAS_ZSTD = True
+except Exception:
+    HAS_ZSTD = False
 
 Base = declarative_base()
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """UUID version 7 (RFC 9562) : horodatage milliseconde en tête, puis compteur et aléa.
+
+    Clé primaire par défaut : les insertions se suivent dans l'index au lieu
+    de s'éparpiller (moins de découpes de pages, pages chaudes en cache) et
+    l'ordre des id suit l'ordre de création. Strictement croissant dans le
+    processus (compteur de 12 bits dans la même milliseconde, méthode 1 de la
+    RFC). Même type UUID que les lignes existantes en v4, qui restent valides.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+    ms = time.time_ns() // 1_000_000
+    with _uuid7_lock:
+        if ms > _uuid7_last_ms:
+            _uuid7_counter = int.from_bytes(os.urandom(2), "big") & 0x3FF  # marge avant débordement
+        else:
+            ms = _uuid7_last_ms  # horloge revenue en arrière ou même milliseconde
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                ms += 1
+                _uuid7_counter = 0
+        _uuid7_last_ms = ms
+        counter = _uuid7_counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b)
+
+
+class _Bytes(LargeBinary):
+    """LargeBinary sans conversion en lecture (les anciennes lignes peuvent contenir du texte)."""
+    cache_ok = True
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+
+class CompressedText(TypeDecorator):
+    """Texte stocké compressé (binaire préfixé par son codec).
+
+    Les valeurs écrites avant la compression (texte brut) restent lisibles.
+    """
+    impl = _Bytes
+    cache_ok = True
+
+    MIN_SIZE = 256  # en dessous, la compression ne rapporte rien
+    ZLIB, ZSTD = b"\x00z", b"\x00s"
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode("utf-8")
+        if len(data) < self.MIN_SIZE:
+            return data
+        if HAS_ZSTD:
+            return self.ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+        return self.ZLIB + zlib.compress(data, 6)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        data = bytes(value)
+        if data.startswith(self.ZSTD):
+            data = zstandard.ZstdDecompressor().decompress(data[2:])
+        elif data.startswith(self.ZLIB):
+            data = zlib.decompress(data[2:])
+        return data.decode("utf-8")
+
 class Conversation(Base):
     """Modèle pour les conversations"""
     __tablename__ = "conversations"
+    # liste des conversations : filtre is_archived, tri updated_at
+    __table_args__ = (Index("ix_conversations_archived_updated", "is_archived", "updated_at"),)
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     title = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_archived = Column(Boolean, default=False)
 
-    # Relations
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    # dénormalisé, tenu à jour par ConversationService.add_message (listes sans lire les messages)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime)
+    last_message_preview = Column(String(200))
+
+    # Relations (suppression des messages par la base : ON DELETE CASCADE, rien n'est chargé)
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan",
+                            passive_deletes=True)
 
 
 class Crisis(Base):
     __tablename__ = "crises"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     source = Column(String(50), nullable=False, index=True)
     source_id = Column(String(100), nullable=False, index=True, unique=True)
     title = Column(String(500), nullable=False)
     country = Column(String(200))
     url = Column(Text)
     published_at = Column(DateTime)
-    raw = Column(Text)
+    raw = deferred(Column(CompressedText))  # payload source complet, chargé à la demande
+    content_hash = Column(String(64))  # sha256 du payload source, pour sauter les lignes inchangées
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    cluster_id = Column(UUID(as_uuid=True), index=True)  # id de la ligne canonique du groupe de doublons
+    minhash = deferred(Column(LargeBinary))  # signature MinHash du titre (voir app.services.dedup)
+
+    # Pays normalisés (ISO3), remplis à l'ingestion
+    country_links = relationship("CrisisCountry", cascade="all, delete-orphan", passive_deletes=True)
+
 
 class JobPosting(Base):
     __tablename__ = "job_postings"
+    __table_args__ = (
+        # offres triées par échéance (/jobs/closing) : index partiel, sans les offres sans échéance
+        Index(
+            "ix_job_postings_open_deadline", "deadline", "id",
+            postgresql_where=text("deadline IS NOT NULL"),
+            sqlite_where=text("deadline IS NOT NULL"),
+        ),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     source = Column(String(50), nullable=False, index=True)
     source_id = Column(String(100), nullable=False, index=True, unique=True)
     title = Column(String(500), nullable=False)
@@ -52,15 +158,46 @@ class JobPosting(Base):
     url = Column(Text)
     published_at = Column(DateTime)
     deadline = Column(DateTime)
-    raw = Column(Text)
+    raw = deferred(Column(CompressedText))  # payload source complet, chargé à la demande
+    content_hash = Column(String(64))  # sha256 du payload source, pour sauter les lignes inchangées
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    cluster_id = Column(UUID(as_uuid=True), index=True)  # id de la ligne canonique du groupe de doublons
+    minhash = deferred(Column(LargeBinary))  # signature MinHash du titre (voir app.services.dedup)
+
+    # Pays normalisés (ISO3), remplis à l'ingestion
+    country_links = relationship("JobCountry", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class Country(Base):
+    """Dimension pays normalisée (code ISO 3166-1 alpha-3)."""
+    __tablename__ = "countries"
+
+    iso3 = Column(String(3), primary_key=True)
+    name = Column(String(200), nullable=False)
+
+
+class CrisisCountry(Base):
+    __tablename__ = "crisis_countries"
+    __table_args__ = (Index("ix_crisis_countries_iso3", "iso3", "crisis_id"),)
+
+    crisis_id = Column(UUID(as_uuid=True), ForeignKey("crises.id", ondelete="CASCADE"), primary_key=True)
+    iso3 = Column(String(3), ForeignKey("countries.iso3"), primary_key=True)
+
+
+class JobCountry(Base):
+    __tablename__ = "job_countries"
+    __table_args__ = (Index("ix_job_countries_iso3", "iso3", "job_id"),)
+
+    job_id = Column(UUID(as_uuid=True), ForeignKey("job_postings.id", ondelete="CASCADE"), primary_key=True)
+    iso3 = Column(String(3), ForeignKey("countries.iso3"), primary_key=True)
+
 
 class FundingRecord(Base):
     __tablename__ = "funding_records"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     source = Column(String(50), nullable=False, index=True)
     source_id = Column(String(100), nullable=False, index=True)
     year = Column(Integer, index=True)
@@ -70,16 +207,89 @@ class FundingRecord(Base):
     recipient = Column(String(255))
     amount = Column(Float)
     currency = Column(String(10))
-    raw = Column(Text)
+    raw = deferred(Column(CompressedText))  # payload source complet, chargé à la demande
+    content_hash = Column(String(64))  # sha256 du payload source, pour sauter les lignes inchangées
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class FundingRollup(Base):
+    """Totaux de financement pré-agrégés par dimension et par année (maintenus à l'ingestion)."""
+    __tablename__ = "funding_rollups"
+    __table_args__ = (Index("ix_funding_rollups_dim_year_total", "dimension", "year", "total_amount"),)
+
+    dimension = Column(String(20), primary_key=True)  # 'year' | 'country' | 'cluster' | 'donor'
+    key = Column(String(255), primary_key=True)       # valeur de la dimension ('' si inconnue)
+    year = Column(Integer, primary_key=True)          # 0 si inconnue
+    total_amount = Column(Float, nullable=False, default=0.0)
+    flow_count = Column(Integer, nullable=False, default=0)
+
+
+class FacetCount(Base):
+    """Compte de lignes par valeur de facette, global ou sachant une autre facette."""
+    __tablename__ = "facet_counts"
+    __table_args__ = (
+        Index("ix_facet_counts_lookup", "table_name", "given_dimension", "given_value", "dimension", "count"),
+    )
+
+    table_name = Column(String(50), primary_key=True)       # 'crises' | 'job_postings'
+    dimension = Column(String(20), primary_key=True)        # source | country | org | deadline
+    value = Column(String(255), primary_key=True)           # '' = non renseigné
+    given_dimension = Column(String(20), primary_key=True)  # '' = sans filtre
+    given_value = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Compteur de version par table, incrémenté à chaque écriture (ETag des lectures)."""
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)  # nom de table, ex. 'crises'
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DedupBucket(Base):
+    """Seau LSH (bloc + bande MinHash) -> lignes candidates au dédoublonnage."""
+    __tablename__ = "dedup_buckets"
+    __table_args__ = (Index("ix_dedup_buckets_row", "table_name", "row_id"),)
+
+    table_name = Column(String(50), primary_key=True)  # 'crises' | 'job_postings'
+    bucket = Column(String(32), primary_key=True)
+    row_id = Column(UUID(as_uuid=True), primary_key=True)
+
+
+class SyncState(Base):
+    """Point de reprise (high-water mark) d'une source d'ingestion."""
+    __tablename__ = "sync_state"
+
+    source = Column(String(100), primary_key=True)  # ex. 'reliefweb:disasters'
+    watermark = Column(String(64))  # dernier date.changed vu (ISO 8601)
+    last_id = Column(String(100))   # dernier id vu pour ce date.changed
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IngestRun(Base):
+    """Historique d'exécution des jobs d'ingestion planifiés."""
+    __tablename__ = "ingest_runs"
+    __table_args__ = (Index("ix_ingest_runs_job_started", "job", "started_at"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    job = Column(String(100), nullable=False)
+    host = Column(String(255))
+    status = Column(String(20), nullable=False)  # 'running', 'success', 'error'
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    rows = Column(Text)  # JSON des compteurs retournés par le job
+    error = Column(Text)
+
+
 class User(Base):
     """Utilisateur applicatif (simple)."""
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     email = Column(String(255))
     name = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -89,8 +299,10 @@ class User(Base):
 class OAuthToken(Base):
     """Tokens OAuth par fournisseur et par utilisateur."""
     __tablename__ = "oauth_tokens"
+    # dernier token d'un fournisseur (et d'un utilisateur)
+    __table_args__ = (Index("ix_oauth_tokens_provider_user_created", "provider", "user_id", "created_at"),)
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
     provider = Column(String(50), nullable=False, index=True)  # 'google' | 'onedrive'
     subject = Column(String(255))  # identifiant utilisateur distant (optionnel)
@@ -100,7 +312,7 @@ class OAuthToken(Base):
     scope = Column(Text)
     token_type = Column(String(50))
     expires_at = Column(DateTime)  # UTC
-    raw = Column(Text)  # JSON complet chiffré (optionnel)
+    raw = deferred(Column(CompressedText))  # JSON complet chiffré (optionnel), chargé à la demande
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_archived = Column(Boolean, default=False)
@@ -110,9 +322,11 @@ class OAuthToken(Base):
 class Message(Base):
     """Modèle pour les messages dans les conversations"""
     __tablename__ = "messages"
+    # messages d'une conversation dans l'ordre chronologique
+    __table_args__ = (Index("ix_messages_conversation_created", "conversation_id", "created_at"),)
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user', 'assistant', 'system'
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -127,7 +341,7 @@ class Document(Base):
     """Modèle pour les documents gérés par l'assistant"""
     __tablename__ = "documents"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     filename = Column(String(255), nullable=False)
     original_filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
@@ -150,8 +364,19 @@ class Document(Base):
 class AgendaEvent(Base):
     """Modèle pour les événements de l'agenda"""
     __tablename__ = "agenda_events"
+    __table_args__ = (
+        # séries recouvrant une fenêtre : is_recurring AND (recurrence_until IS NULL OR >= début)
+        Index("ix_agenda_events_series", "is_recurring", "recurrence_until"),
+        # listes et résumé : status = ? AND start_datetime dans une plage
+        Index("ix_agenda_events_status_start", "status", "start_datetime"),
+        # import iCalendar : un UID = un événement (réimportation idempotente)
+        Index("ix_agenda_events_ical_uid", "ical_uid", unique=True),
+        # listes filtrées par catégorie / priorité
+        Index("ix_agenda_events_category_priority", "category", "priority"),
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    ical_uid = Column(String(255))  # UID iCalendar des événements importés
     title = Column(String(255), nullable=False)
     description = Column(Text)
     
@@ -166,11 +391,15 @@ class AgendaEvent(Base):
     # Rappels
     reminder_minutes = Column(Integer, default=15)  # Rappel X minutes avant
     is_reminder_sent = Column(Boolean, default=False)
+    reminder_sent_until = Column(DateTime)  # début de la dernière occurrence rappelée
     
     # Récurrence
     is_recurring = Column(Boolean, default=False)
-    recurrence_pattern = Column(String(50))  # 'daily', 'weekly', 'monthly', 'yearly'
+    recurrence_pattern = Column(String(255))  # 'daily', 'weekly', 'monthly', 'yearly' ou RRULE
     recurrence_end_date = Column(DateTime)
+    recurrence_until = Column(DateTime)  # dernier début d'occurrence possible (NULL = série infinie)
+    occurrences_from = Column(DateTime)   # plage matérialisée dans agenda_occurrences
+    occurrences_until = Column(DateTime)
     
     # Métadonnées
     priority = Column(String(20), default='medium')  # 'low', 'medium', 'high', 'urgent'
@@ -183,11 +412,23 @@ class AgendaEvent(Base):
     # Statut
     status = Column(String(20), default='scheduled')  # 'scheduled', 'completed', 'cancelled'
 
+class AgendaOccurrence(Base):
+    """Occurrence matérialisée d'un événement récurrent (horizon AGENDA_MATERIALIZE_DAYS)."""
+    __tablename__ = "agenda_occurrences"
+    __table_args__ = (Index("ix_agenda_occurrences_start", "occurrence_start"),)
+
+    event_id = Column(UUID(as_uuid=True), ForeignKey("agenda_events.id", ondelete="CASCADE"), primary_key=True)
+    occurrence_start = Column(DateTime, primary_key=True)
+    occurrence_end = Column(DateTime)
+
+
 class Memory(Base):
     """Modèle pour la mémoire à long terme de l'assistant"""
     __tablename__ = "memories"
+    # mémoires d'une catégorie, triées par importance puis dernier accès
+    __table_args__ = (Index("ix_memories_category_importance_accessed", "category", "importance", "last_accessed"),)
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     content = Column(Text, nullable=False)
     context = Column(Text)  # Contexte dans lequel cette information a été apprise
     
@@ -205,14 +446,14 @@ class Memory(Base):
     access_count = Column(Integer, default=0)
     
     # Relations optionnelles
-    related_conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"))
+    related_conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="SET NULL"))
     related_document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"))
 
 class UserPreference(Base):
     """Modèle pour les préférences utilisateur"""
     __tablename__ = "user_preferences"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     key = Column(String(100), nullable=False, unique=True)
     value = Column(Text, nullable=False)
     description = Column(Text)
@@ -2,18 +2,32 @@
 """
 API endpoints pour la gestion de l'agenda
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, func, or_, delete as sql_delete, update as sql_update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from datetime import datetime, date, timedelta
 import uuid
 
-from app.db import get_db
-from app.models import AgendaEvent
+from app.config import settings
+from app.db import get_db, get_sync_db
+from app.models import AgendaEvent, AgendaOccurrence, uuid7
+from app.services import export, freebusy, ics, recurrence
+from app.jobs.reminders import dispatcher as reminder_dispatcher
+from app.services.http_cache import bump_version, conditional_response
 
 router = APIRouter()
 
+# Compteur de version des lectures agenda (ETag), incrémenté par chaque écriture
+AGENDA_VERSION = "agenda_events"
+BATCH_MAX_OPERATIONS = 1000
+# champs dont la modification fait repartir les rappels
+REMINDER_TIMING_FIELDS = ('start_datetime', 'reminder_minutes', 'is_recurring', 'recurrence_pattern')
+
 # Modèles Pydantic
 class AgendaEventCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
@@ -24,7 +38,7 @@ class AgendaEventCreate(BaseModel):
     location: Optional[str] = None
     reminder_minutes: int = 15
     is_recurring: bool = False
-    recurrence_pattern: Optional[str] = None  # 'daily', 'weekly', 'monthly', 'yearly'
+    recurrence_pattern: Optional[str] = None  # 'daily', 'weekly', 'monthly', 'yearly' ou RRULE ('FREQ=WEEKLY;BYDAY=MO')
     recurrence_end_date: Optional[datetime] = None
     priority: str = Field(default='medium', pattern='^(low|medium|high|urgent)$')
     category: Optional[str] = None
@@ -37,10 +51,20 @@ class AgendaEventUpdate(BaseModel):
     is_all_day: Optional[bool] = None
     location: Optional[str] = None
     reminder_minutes: Optional[int] = None
+    is_recurring: Optional[bool] = None
+    recurrence_pattern: Optional[str] = None
+    recurrence_end_date: Optional[datetime] = None
     priority: Optional[str] = None
     category: Optional[str] = None
     status: Optional[str] = None
 
+class AgendaConflict(BaseModel):
+    event_id: uuid.UUID
+    title: str
+    start_datetime: datetime
+    end_datetime: datetime
+    occurrence_start: datetime  # occurrence de l'événement écrit qui chevauche
+
 class AgendaEventResponse(BaseModel):
     id: uuid.UUID
     title: str
@@ -59,22 +83,48 @@ class AgendaEventResponse(BaseModel):
     status: str
     created_at: datetime
     updated_at: datetime
+    series_start_datetime: Optional[datetime] = None  # occurrence d'une série : début de la série
+    conflicts: Optional[List[AgendaConflict]] = None  # création / modification : chevauchements détectés
 
-@router.post("/events", response_model=AgendaEventResponse)
-def create_event(
-    event_data: AgendaEventCreate,
-    db: Session = Depends(get_db)
-):
-    """Crée un nouvel événement dans l'agenda"""
-    
+
+class AgendaBatchOperation(BaseModel):
+    op: str = Field(..., pattern='^(create|update|complete|delete)$')
+    id: Optional[uuid.UUID] = None  # update / complete / delete
+    data: Optional[dict] = None     # create (AgendaEventCreate) / update (AgendaEventUpdate)
+
+class AgendaBatchRequest(BaseModel):
+    operations: List[AgendaBatchOperation] = Field(..., min_length=1, max_length=BATCH_MAX_OPERATIONS)
+    atomic: bool = False  # true : au moindre échec, rien n'est appliqué
+
+def _validate_recurrence(event: AgendaEvent) -> None:
+    if not event.is_recurring:
+        return
+    try:
+        recurrence.validate(event.start_datetime, event.recurrence_pattern)
+    except recurrence.InvalidPattern as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _occurrence_response(event: AgendaEvent, start: datetime) -> AgendaEventResponse:
+    data = dict(event.__dict__)
+    if event.is_recurring:
+        data.update(
+            start_datetime=start,
+            end_datetime=recurrence.occurrence_end(event, start),
+            series_start_datetime=event.start_datetime,
+        )
+    return AgendaEventResponse(**data)
+
+def _new_event(event_data: AgendaEventCreate) -> AgendaEvent:
+    """Événement validé, pas encore ajouté à la session."""
     # Validation des dates
     if event_data.end_datetime and event_data.end_datetime <= event_data.start_datetime:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="La date de fin doit être postérieure à la date de début"
         )
-    
+
     event = AgendaEvent(
+        id=uuid7(),
         title=event_data.title,
         description=event_data.description,
         start_datetime=event_data.start_datetime,
@@ -86,204 +136,441 @@ def create_event(
         recurrence_pattern=event_data.recurrence_pattern,
         recurrence_end_date=event_data.recurrence_end_date,
         priority=event_data.priority,
-        category=event_data.category
+        category=event_data.category,
+        status="scheduled",
     )
-    
-    db.add(event)
-    db.commit()
-    db.refresh(event)
-    
-    return AgendaEventResponse(**event.__dict__)
+    _validate_recurrence(event)
+    return event
+
+def _apply_update(event: AgendaEvent, event_data: AgendaEventUpdate) -> set:
+    """Applique les champs fournis à `event`; retourne les noms des champs modifiés."""
+    update_data = event_data.dict(exclude_unset=True)
+
+    # Validation des dates si modifiées
+    if 'start_datetime' in update_data or 'end_datetime' in update_data:
+        start_dt = update_data.get('start_datetime', event.start_datetime)
+        end_dt = update_data.get('end_datetime', event.end_datetime)
+
+        if end_dt and end_dt <= start_dt:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La date de fin doit être postérieure à la date de début"
+            )
+
+    before = {field: getattr(event, field) for field in REMINDER_TIMING_FIELDS}
+    for field, value in update_data.items():
+        setattr(event, field, value)
+    _validate_recurrence(event)
+
+    # horaire ou rappel réellement modifié : les rappels repartent, sauf pour les
+    # occurrences déjà commencées à l'édition (horloge locale du dispatcher)
+    if any(getattr(event, field) != value for field, value in before.items()):
+        event.is_reminder_sent = False
+        event.reminder_sent_until = datetime.now()
+
+    event.updated_at = datetime.utcnow()
+    return set(update_data)
+
+@router.post("/events", response_model=AgendaEventResponse)
+async def create_event(
+    event_data: AgendaEventCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Crée un nouvel événement dans l'agenda"""
+    def run(db: Session):
+        event = _new_event(event_data)
+        # chevauchements signalés, pas bloquants
+        conflicts = freebusy.conflicts(db, event)
+
+        db.add(event)
+        recurrence.refresh_series(db, event)
+        bump_version(db, AGENDA_VERSION)
+        db.commit()
+        db.refresh(event)
+        reminder_dispatcher.notify(event.id)
+
+        return AgendaEventResponse(**event.__dict__, conflicts=conflicts)
+
+    return await db.run_sync(run)
+
+@router.post("/events/batch")
+async def batch_events(
+    batch: AgendaBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Applique un lot de créations / modifications / clôtures / suppressions en une transaction"""
+    def run(db: Session):
+        ops = batch.operations
+        ids = {op.id for op in ops if op.id is not None}
+        # une seule lecture pour toutes les modifications
+        events = {e.id: e for e in db.query(AgendaEvent).filter(AgendaEvent.id.in_(ids))} if ids else {}
+        results = []
+        written, completed, deleted, seen = [], [], [], set()
+
+        for index, op in enumerate(ops):
+            result = {"index": index, "op": op.op, "id": op.id, "status": "ok"}
+            results.append(result)
+            event = None
+            try:
+                if op.op != "create":
+                    if op.id is None:
+                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Identifiant manquant")
+                    if op.id in seen:
+                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Événement déjà présent dans le lot")
+                    event = events.get(op.id)
+                    if event is None:
+                        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Événement non trouvé")
+                if op.op == "create":
+                    event = _new_event(AgendaEventCreate(**(op.data or {})))
+                    db.add(event)
+                    written.append(event)
+                    result["id"] = event.id
+                elif op.op == "update":
+                    _apply_update(event, AgendaEventUpdate(**(op.data or {})))
+                    written.append(event)
+                elif op.op == "complete":
+                    completed.append(op.id)
+                else:
+                    deleted.append(op.id)
+                if op.id is not None:
+                    seen.add(op.id)
+            except ValidationError as e:
+                result.update(status="error", detail="; ".join(
+                    f"{'.'.join(str(x) for x in err['loc'])} : {err['msg']}" for err in e.errors()))
+            except HTTPException as e:
+                result.update(status="error", detail=e.detail)
+            if result["status"] == "error" and event is not None and op.op == "update":
+                db.expire(event)  # annule les champs déjà appliqués
+
+        failed = sum(1 for r in results if r["status"] == "error")
+        if batch.atomic and failed:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "Lot rejeté : aucune opération appliquée", "results": jsonable_encoder(results)}
+            )
+
+        # créations en base avant leurs occurrences matérialisées (sessions sans autoflush)
+        db.flush()
+        for event in written:
+            recurrence.refresh_series(db, event)
+        db.flush()
+        now = datetime.utcnow()
+        # clôtures et suppressions : une requête ensembliste chacune
+        if completed or deleted:
+            db.execute(sql_delete(AgendaOccurrence).where(AgendaOccurrence.event_id.in_(completed + deleted)))
+        if completed:
+            db.execute(
+                sql_update(AgendaEvent).where(AgendaEvent.id.in_(completed))
+                .values(status="completed", updated_at=now, occurrences_from=None, occurrences_until=None),
+                execution_options={"synchronize_session": False},
+            )
+        if deleted:
+            db.execute(
+                sql_delete(AgendaEvent).where(AgendaEvent.id.in_(deleted)),
+                execution_options={"synchronize_session": False},
+            )
+        bump_version(db, AGENDA_VERSION)
+        db.commit()
+        reminder_dispatcher.notify(*[e.id for e in written], *completed, *deleted)
+
+        return {"applied": len(results) - failed, "failed": failed, "results": results}
+
+    return await db.run_sync(run)
 
 @router.get("/events", response_model=List[AgendaEventResponse])
 def get_events(
+    request: Request,
     start_date: Optional[date] = Query(None, description="Date de début (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Date de fin (YYYY-MM-DD)"),
     category: Optional[str] = Query(None, description="Filtrer par catégorie"),
     priority: Optional[str] = Query(None, description="Filtrer par priorité"),
     status: str = Query("scheduled", description="Statut des événements"),
     limit: int = Query(100, le=500, description="Nombre maximum d'événements"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_sync_db)
 ):
     """Récupère les événements de l'agenda avec filtres optionnels"""
-    
-    query = db.query(AgendaEvent).filter(AgendaEvent.status == status)
-    
-    # Filtres de date
-    if start_date:
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        query = query.filter(AgendaEvent.start_datetime >= start_datetime)
-    
-    if end_date:
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-        query = query.filter(AgendaEvent.start_datetime <= end_datetime)
-    
-    # Autres filtres
-    if category:
-        query = query.filter(AgendaEvent.category == category)
-    
-    if priority:
-        query = query.filter(AgendaEvent.priority == priority)
-    
-    events = query.order_by(AgendaEvent.start_datetime).limit(limit).all()
-    
-    return [AgendaEventResponse(**event.__dict__) for event in events]
+    # handler synchrone (pool de threads) : développement des séries hors de la boucle d'événements
+    def build():
+        query = db.query(AgendaEvent).filter(AgendaEvent.status == status)
+
+        # Autres filtres
+        if category:
+            query = query.filter(AgendaEvent.category == category)
+
+        if priority:
+            query = query.filter(AgendaEvent.priority == priority)
+
+        # Filtres de date : les séries récurrentes sont développées dans la fenêtre
+        start_datetime = datetime.combine(start_date, datetime.min.time()) if start_date else None
+        end_datetime = datetime.combine(end_date, datetime.max.time()) if end_date else None
+
+        pairs = recurrence.occurrences(db, query, start_datetime, end_datetime, limit=limit)
+        return [_occurrence_response(event, start) for event, start in pairs]
+
+    return conditional_response(request, db, (AGENDA_VERSION,), build, extra=date.today().isoformat())
 
 @router.get("/events/today", response_model=List[AgendaEventResponse])
-def get_today_events(db: Session = Depends(get_db)):
+async def get_today_events(request: Request, db: AsyncSession = Depends(get_db)):
     """Récupère les événements d'aujourd'hui"""
-    today = date.today()
-    start_datetime = datetime.combine(today, datetime.min.time())
-    end_datetime = datetime.combine(today, datetime.max.time())
-    
-    events = db.query(AgendaEvent).filter(
-        AgendaEvent.start_datetime >= start_datetime,
-        AgendaEvent.start_datetime <= end_datetime,
-        AgendaEvent.status == "scheduled"
-    ).order_by(AgendaEvent.start_datetime).all()
-    
-    return [AgendaEventResponse(**event.__dict__) for event in events]
+    def run(db: Session):
+        today = date.today()
+        start_datetime = datetime.combine(today, datetime.min.time())
+        end_datetime = datetime.combine(today, datetime.max.time())
+
+        def build():
+            query = db.query(AgendaEvent).filter(AgendaEvent.status == "scheduled")
+            pairs = recurrence.occurrences(db, query, start_datetime, end_datetime)
+            return [_occurrence_response(event, start) for event, start in pairs]
+
+        return conditional_response(request, db, (AGENDA_VERSION,), build, extra=today.isoformat())
+
+    return await db.run_sync(run)
 
 @router.get("/events/upcoming", response_model=List[AgendaEventResponse])
-def get_upcoming_events(
+async def get_upcoming_events(
+    request: Request,
     days: int = Query(7, ge=1, le=30, description="Nombre de jours à venir"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupère les événements à venir"""
-    start_datetime = datetime.now()
-    end_datetime = start_datetime + timedelta(days=days)
-    
-    events = db.query(AgendaEvent).filter(
-        AgendaEvent.start_datetime >= start_datetime,
-        AgendaEvent.start_datetime <= end_datetime,
-        AgendaEvent.status == "scheduled"
-    ).order_by(AgendaEvent.start_datetime).limit(20).all()
-    
-    return [AgendaEventResponse(**event.__dict__) for event in events]
+    def run(db: Session):
+        # fenêtre arrondie à la minute pour que la réponse reste cacheable
+        start_datetime = datetime.now().replace(second=0, microsecond=0)
+        end_datetime = start_datetime + timedelta(days=days)
+
+        def build():
+            query = db.query(AgendaEvent).filter(AgendaEvent.status == "scheduled")
+            pairs = recurrence.occurrences(db, query, start_datetime, end_datetime, limit=20)
+            return [_occurrence_response(event, start) for event, start in pairs]
+
+        return conditional_response(request, db, (AGENDA_VERSION,), build, extra=start_datetime.isoformat())
+
+    return await db.run_sync(run)
+
+@router.post("/import")
+def import_ics(
+    file: UploadFile = File(..., description="Calendrier iCalendar (.ics)"),
+    db: Session = Depends(get_sync_db)
+):
+    """Importe un calendrier .ics (Outlook, Google...) par lots; les UID déjà connus sont mis à jour"""
+    # handler synchrone (pool de threads) : lecture du fichier et analyse hors de la boucle d'événements
+    stats = ics.import_events(db, file.file)
+    if stats["created"] or stats["updated"]:
+        reminder_dispatcher.notify()
+    return stats
+
+@router.get("/export.ics")
+def export_ics(
+    start_date: Optional[date] = Query(None, description="Date de début"),
+    end_date: Optional[date] = Query(None, description="Date de fin"),
+    category: Optional[str] = Query(None, description="Catégorie"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Statut"),
+):
+    """Exporte l'agenda au format .ics, en flux (séries exportées avec leur RRULE)"""
+    def build_query(db: Session):
+        query = db.query(*ics.EXPORT_COLUMNS)
+        if status_filter:
+            query = query.filter(AgendaEvent.status == status_filter)
+        if category:
+            query = query.filter(AgendaEvent.category == category)
+        if start_date:
+            # une série commencée avant la fenêtre peut encore y avoir des occurrences
+            start_datetime = datetime.combine(start_date, datetime.min.time())
+            query = query.filter(or_(
+                AgendaEvent.start_datetime >= start_datetime,
+                and_(AgendaEvent.is_recurring.is_(True),
+                     or_(AgendaEvent.recurrence_until.is_(None), AgendaEvent.recurrence_until >= start_datetime)),
+            ))
+        if end_date:
+            query = query.filter(AgendaEvent.start_datetime <= datetime.combine(end_date, datetime.max.time()))
+        return query.order_by(AgendaEvent.start_datetime)
+
+    return StreamingResponse(
+        ics.stream(export.batches(build_query)),
+        media_type="text/calendar; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="agenda.ics"'},
+    )
+
+@router.get("/freebusy")
+def get_freebusy(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Début de la fenêtre (défaut : maintenant)"),
+    end: Optional[datetime] = Query(None, description="Fin de la fenêtre (défaut : début + 7 jours)"),
+    category: Optional[str] = Query(None, description="Calendrier (catégorie); tout l'agenda par défaut"),
+    duration_minutes: int = Query(30, ge=5, le=1440, description="Durée minimale d'un créneau libre"),
+    slots: int = Query(5, ge=1, le=50, description="Nombre de créneaux libres retournés"),
+    db: Session = Depends(get_sync_db)
+):
+    """Plages occupées et prochains créneaux libres sur une fenêtre"""
+    # défaut arrondi à la minute pour que la réponse reste cacheable
+    start = (start or datetime.now().replace(second=0, microsecond=0)).replace(tzinfo=None)
+    end = (end.replace(tzinfo=None) if end else start + timedelta(days=7))
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La date de fin doit être postérieure à la date de début"
+        )
+    if end - start > timedelta(days=93):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Fenêtre limitée à 93 jours"
+        )
+
+    # handler synchrone (pool de threads) : construction de l'index d'occupation hors de la boucle d'événements
+    def build():
+        index = freebusy.get_index(db, category, window=(start, end))
+        busy = freebusy.busy_blocks(index, start, end)
+        free = freebusy.free_slots(busy, start, end, timedelta(minutes=duration_minutes), slots)
+        return {
+            "start": start,
+            "end": end,
+            "busy": [{"start": b, "end": e} for b, e in busy],
+            "free_slots": [{"start": b, "end": e} for b, e in free],
+        }
+
+    return conditional_response(request, db, (AGENDA_VERSION,), build, extra=f"{start.isoformat()}|{end.isoformat()}")
 
 @router.get("/events/{event_id}", response_model=AgendaEventResponse)
-def get_event(
+async def get_event(
     event_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupère un événement spécifique"""
-    event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
-    
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Événement non trouvé"
-        )
-    
-    return AgendaEventResponse(**event.__dict__)
+    def run(db: Session):
+        def build():
+            event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
+
+            if not event:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Événement non trouvé"
+                )
+
+            return AgendaEventResponse(**event.__dict__)
+
+        return conditional_response(request, db, (AGENDA_VERSION,), build)
+
+    return await db.run_sync(run)
 
 @router.put("/events/{event_id}", response_model=AgendaEventResponse)
-def update_event(
+async def update_event(
     event_id: uuid.UUID,
     event_data: AgendaEventUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Met à jour un événement"""
-    event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
-    
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Événement non trouvé"
-        )
-    
-    # Mettre à jour les champs modifiés
-    update_data = event_data.dict(exclude_unset=True)
-    
-    # Validation des dates si modifiées
-    if 'start_datetime' in update_data or 'end_datetime' in update_data:
-        start_dt = update_data.get('start_datetime', event.start_datetime)
-        end_dt = update_data.get('end_datetime', event.end_datetime)
-        
-        if end_dt and end_dt <= start_dt:
+    def run(db: Session):
+        event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
+
+        if not event:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="La date de fin doit être postérieure à la date de début"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Événement non trouvé"
             )
-    
-    for field, value in update_data.items():
-        setattr(event, field, value)
-    
-    event.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(event)
-    
-    return AgendaEventResponse(**event.__dict__)
+
+        # Mettre à jour les champs modifiés
+        changed = _apply_update(event, event_data)
+
+        conflicts = None
+        if changed & {'start_datetime', 'end_datetime', 'is_all_day', 'is_recurring',
+                      'recurrence_pattern', 'recurrence_end_date', 'status'}:
+            conflicts = freebusy.conflicts(db, event)
+
+        recurrence.refresh_series(db, event)
+        bump_version(db, AGENDA_VERSION)
+        db.commit()
+        db.refresh(event)
+        reminder_dispatcher.notify(event.id)
+
+        return AgendaEventResponse(**event.__dict__, conflicts=conflicts)
+
+    return await db.run_sync(run)
 
 @router.delete("/events/{event_id}")
-def delete_event(
+async def delete_event(
     event_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprime un événement"""
-    event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
-    
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Événement non trouvé"
-        )
-    
-    db.delete(event)
-    db.commit()
-    
-    return {"message": "Événement supprimé avec succès"}
+    def run(db: Session):
+        event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
+
+        if not event:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Événement non trouvé"
+            )
+
+        db.delete(event)
+        bump_version(db, AGENDA_VERSION)
+        db.commit()
+        reminder_dispatcher.notify(event_id)
+
+        return {"message": "Événement supprimé avec succès"}
+
+    return await db.run_sync(run)
 
 @router.put("/events/{event_id}/complete")
-def complete_event(
+async def complete_event(
     event_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Marque un événement comme terminé"""
-    event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
-    
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Événement non trouvé"
-        )
-    
-    event.status = "completed"
-    event.updated_at = datetime.utcnow()
-    db.commit()
-    
-    return {"message": "Événement marqué comme terminé"}
+    def run(db: Session):
+        event = db.query(AgendaEvent).filter(AgendaEvent.id == event_id).first()
+
+        if not event:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Événement non trouvé"
+            )
+
+        event.status = "completed"
+        event.updated_at = datetime.utcnow()
+        recurrence.refresh_series(db, event)
+        bump_version(db, AGENDA_VERSION)
+        db.commit()
+        reminder_dispatcher.notify(event_id)
+
+        return {"message": "Événement marqué comme terminé"}
+
+    return await db.run_sync(run)
 
 @router.get("/stats/summary")
-def get_agenda_summary(db: Session = Depends(get_db)):
+def get_agenda_summary(request: Request, db: Session = Depends(get_sync_db)):
     """Récupère un résumé statistique de l'agenda"""
-    today = datetime.now().date()
+    # handler synchrone (pool de threads) : agrégats calculés hors de la boucle d'événements
+    now = datetime.now()
+    today = now.date()
     week_start = today - timedelta(days=today.weekday())
     week_end = week_start + timedelta(days=6)
-    
-    # Événements d'aujourd'hui
-    today_events = db.query(AgendaEvent).filter(
-        AgendaEvent.start_datetime >= datetime.combine(today, datetime.min.time()),
-        AgendaEvent.start_datetime <= datetime.combine(today, datetime.max.time()),
-        AgendaEvent.status == "scheduled"
-    ).count()
-    
-    # Événements de la semaine
-    week_events = db.query(AgendaEvent).filter(
-        AgendaEvent.start_datetime >= datetime.combine(week_start, datetime.min.time()),
-        AgendaEvent.start_datetime <= datetime.combine(week_end, datetime.max.time()),
-        AgendaEvent.status == "scheduled"
-    ).count()
-    
-    # Événements en retard (passés mais non terminés)
-    overdue_events = db.query(AgendaEvent).filter(
-        AgendaEvent.start_datetime < datetime.now(),
-        AgendaEvent.status == "scheduled"
-    ).count()
-    
-    return {
-        "today_events": today_events,
-        "week_events": week_events,
-        "overdue_events": overdue_events,
-        "summary_date": today.isoformat()
-    }
+    day_start = datetime.combine(today, datetime.min.time())
+    day_end = datetime.combine(today, datetime.max.time())
+    week_from = datetime.combine(week_start, datetime.min.time())
+    week_to = datetime.combine(week_end, datetime.max.time())
+
+    def build():
+        # une seule requête : agrégats conditionnels sur l'index (status, start_datetime)
+        start = AgendaEvent.start_datetime
+        row = db.query(
+            func.count(case((and_(start >= day_start, start <= day_end), 1))),
+            func.count(case((start >= week_from, 1))),
+            func.count(case((start < now, 1))),
+        ).filter(
+            AgendaEvent.status == "scheduled",
+            start <= week_to,  # la semaine se termine après maintenant : couvre aussi les retards
+        ).one()
+        return {
+            "today_events": row[0],
+            "week_events": row[1],
+            "overdue_events": row[2],
+            "summary_date": today.isoformat()
+        }
+
+    ttl = settings.AGENDA_SUMMARY_CACHE_SECONDS
+    if ttl <= 0:
+        return build()
+    # « en retard » dépend de l'heure : la clé de cache change toutes les `ttl` secondes
+    return conditional_response(request, db, (AGENDA_VERSION,), build, extra=str(int(now.timestamp() // ttl)))
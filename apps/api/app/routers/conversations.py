@@ -2,16 +2,19 @@
 """
 API endpoints pour la gestion des conversations
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import asyncio
 import io
 from pydantic import BaseModel, Field
 from datetime import datetime
 import uuid
 
 from app.db import get_db
+from app.jobs import purge_conversations
 from app.services.conversation_service import ConversationService, MemoryService
 from app.models import Conversation, Message
 from app.config import settings
@@ -31,6 +34,12 @@ class ConversationResponse(BaseModel):
     updated_at: datetime
     is_archived: bool
     message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
+
+class ConversationBulkFilter(BaseModel):
+    older_than_days: Optional[int] = Field(None, ge=0)  # sans activité (updated_at) depuis N jours
+    archived: Optional[bool] = None
 
 class MessageCreate(BaseModel):
     content: str
@@ -52,193 +61,183 @@ class ChatResponse(BaseModel):
     assistant_response: MessageResponse
     conversation_id: uuid.UUID
 
-@router.post("/conversations", response_model=ConversationResponse)
-def create_conversation(
-    conversation_data: ConversationCreate,
-    db: Session = Depends(get_db)
-):
-    """Crée une nouvelle conversation"""
-    service = ConversationService(db)
-    conversation = service.create_conversation(conversation_data.title)
-    
+def _conversation_response(conversation: Conversation) -> ConversationResponse:
+    # compteurs dénormalisés : aucun message n'est chargé
     return ConversationResponse(
         id=conversation.id,
         title=conversation.title,
         created_at=conversation.created_at,
         updated_at=conversation.updated_at,
         is_archived=conversation.is_archived,
-        message_count=0
+        message_count=conversation.message_count or 0,
+        last_message_at=conversation.last_message_at,
+        last_message_preview=conversation.last_message_preview
     )
 
+@router.post("/conversations", response_model=ConversationResponse)
+async def create_conversation(
+    conversation_data: ConversationCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Crée une nouvelle conversation"""
+    def run(db: Session):
+        service = ConversationService(db)
+        conversation = service.create_conversation(conversation_data.title)
+        return _conversation_response(conversation)
+
+    return await db.run_sync(run)
+
 @router.get("/conversations", response_model=List[ConversationResponse])
-def get_conversations(
+async def get_conversations(
     limit: int = 50,
     archived: bool = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupère la liste des conversations"""
-    service = ConversationService(db)
-    conversations = service.get_conversations(limit, archived)
-    
-    result = []
-    for conv in conversations:
-        result.append(ConversationResponse(
-            id=conv.id,
-            title=conv.title,
-            created_at=conv.created_at,
-            updated_at=conv.updated_at,
-            is_archived=conv.is_archived,
-            message_count=len(conv.messages)
-        ))
-    
-    return result
+    def run(db: Session):
+        service = ConversationService(db)
+        conversations = service.get_conversations(limit, archived)
+        return [_conversation_response(conv) for conv in conversations]
+
+    return await db.run_sync(run)
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
-def get_conversation(
+async def get_conversation(
     conversation_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupère une conversation spécifique"""
-    service = ConversationService(db)
-    conversation = service.get_conversation(conversation_id)
-    
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation non trouvée"
-        )
-    
-    return ConversationResponse(
-        id=conversation.id,
-        title=conversation.title,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        is_archived=conversation.is_archived,
-        message_count=len(conversation.messages)
-    )
+    def run(db: Session):
+        service = ConversationService(db)
+        conversation = service.get_conversation(conversation_id)
+
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation non trouvée"
+            )
+
+        return _conversation_response(conversation)
+
+    return await db.run_sync(run)
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: uuid.UUID,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupère les messages d'une conversation"""
-    service = ConversationService(db)
-    messages = service.get_conversation_messages(conversation_id, limit)
-    
-    return [
-        MessageResponse(
-            id=msg.id,
-            role=msg.role,
-            content=msg.content,
-            created_at=msg.created_at
-        )
-        for msg in messages
-    ]
+    def run(db: Session):
+        service = ConversationService(db)
+        messages = service.get_conversation_messages(conversation_id, limit)
+
+        return [
+            MessageResponse(
+                id=msg.id,
+                role=msg.role,
+                content=msg.content,
+                created_at=msg.created_at
+            )
+            for msg in messages
+        ]
+
+    return await db.run_sync(run)
 
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
-def add_message(
+async def add_message(
     conversation_id: uuid.UUID,
     message_data: MessageCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Ajoute un message à une conversation"""
-    service = ConversationService(db)
-    
-    # Vérifier que la conversation existe
-    conversation = service.get_conversation(conversation_id)
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation non trouvée"
-        )
-    
-    message = service.add_message(conversation_id, message_data.role, message_data.content)
-    
-    return MessageResponse(
-        id=message.id,
-        role=message.role,
-        content=message.content,
-        created_at=message.created_at
-    )
+    def run(db: Session):
+        service = ConversationService(db)
 
-@router.post("/chat", response_model=ChatResponse)
-def chat_with_assistant(
-    chat_request: ChatRequest,
-    db: Session = Depends(get_db)
-):
-    """Chat avec l'assistant avec mémoire contextuelle"""
-    service = ConversationService(db)
-    memory_service = MemoryService(db)
-    
-    # Créer une nouvelle conversation si nécessaire
-    if not chat_request.conversation_id:
-        conversation = service.create_conversation()
-        conversation_id = conversation.id
-    else:
-        conversation_id = chat_request.conversation_id
+        # Vérifier que la conversation existe
         conversation = service.get_conversation(conversation_id)
         if not conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Conversation non trouvée"
             )
-    
-    # Ajouter le message de l'utilisateur
-    user_message = service.add_message(conversation_id, "user", chat_request.message)
-    
-    # Récupérer le contexte de la conversation
-    context = service.get_conversation_context(conversation_id)
-    
-    # Récupérer les mémoires pertinentes si demandé
-    relevant_memories = []
-    if chat_request.use_memory:
-        relevant_memories = memory_service.get_relevant_memories(
-            query=chat_request.message,
-            limit=5
+
+        message = service.add_message(conversation_id, message_data.role, message_data.content)
+
+        return MessageResponse(
+            id=message.id,
+            role=message.role,
+            content=message.content,
+            created_at=message.created_at
         )
-    
-    # Construire le prompt avec la mémoire
-    system_prompt = "Tu es l'assistant de Romain. Écris en français."
-    
-    if relevant_memories:
-        memory_context = "\n".join([
-            f"Mémoire: {memory.content}" for memory in relevant_memories
-        ])
-        system_prompt += f"\n\nInformations pertinentes de ta mémoire:\n{memory_context}"
-    
-    # Préparer les messages pour OpenAI
-    messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(context)
-    
-    try:
-        # Fallback local si pas de clé: simuler une réponse simple pour la démo
-        if not settings.OPENAI_API_KEY:
-            assistant_content = f"[LOCAL MODE] Pong: {chat_request.message}"
+
+    return await db.run_sync(run)
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_assistant(
+    chat_request: ChatRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Chat avec l'assistant avec mémoire contextuelle"""
+    def prepare(db: Session):
+        service = ConversationService(db)
+        memory_service = MemoryService(db)
+
+        # Créer une nouvelle conversation si nécessaire
+        if not chat_request.conversation_id:
+            conversation = service.create_conversation()
+            conversation_id = conversation.id
         else:
-            # Appel à OpenAI
-            response = client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=messages,
-                temperature=0.3,
-                max_tokens=1000
+            conversation_id = chat_request.conversation_id
+            conversation = service.get_conversation(conversation_id)
+            if not conversation:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Conversation non trouvée"
+                )
+
+        # Ajouter le message de l'utilisateur
+        user_message = service.add_message(conversation_id, "user", chat_request.message)
+
+        # Récupérer le contexte de la conversation
+        context = service.get_conversation_context(conversation_id)
+
+        # Récupérer les mémoires pertinentes si demandé
+        relevant_memories = []
+        if chat_request.use_memory:
+            relevant_memories = memory_service.get_relevant_memories(
+                query=chat_request.message,
+                limit=5
             )
-            assistant_content = response.choices[0].message.content
-        
+
+        # Construire le prompt avec la mémoire
+        system_prompt = "Tu es l'assistant de Romain. Écris en français."
+
+        if relevant_memories:
+            memory_context = "\n".join([
+                f"Mémoire: {memory.content}" for memory in relevant_memories
+            ])
+            system_prompt += f"\n\nInformations pertinentes de ta mémoire:\n{memory_context}"
+
+        # Préparer les messages pour OpenAI
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(context)
+        return conversation_id, user_message, messages
+
+    def reply(db: Session, content: str, remember: bool) -> ChatResponse:
         # Ajouter la réponse de l'assistant
-        assistant_message = service.add_message(conversation_id, "assistant", assistant_content)
-        
+        assistant_message = ConversationService(db).add_message(conversation_id, "assistant", content)
+
         # Analyser si de nouvelles informations doivent être mémorisées
         # (Cette logique peut être améliorée avec un modèle spécialisé)
-        if any(keyword in chat_request.message.lower() for keyword in ['rappelle', 'retiens', 'important', 'note']):
-            memory_service.store_memory(
+        if remember and any(keyword in chat_request.message.lower() for keyword in ['rappelle', 'retiens', 'important', 'note']):
+            MemoryService(db).store_memory(
                 content=chat_request.message,
                 context=f"Conversation du {datetime.now().strftime('%d/%m/%Y')}",
                 category="user_request",
                 conversation_id=conversation_id
             )
-        
+
         return ChatResponse(
             message=MessageResponse(
                 id=user_message.id,
@@ -254,107 +253,163 @@ def chat_with_assistant(
             ),
             conversation_id=conversation_id
         )
-        
+
+    conversation_id, user_message, messages = await db.run_sync(prepare)
+
+    try:
+        # Fallback local si pas de clé: simuler une réponse simple pour la démo
+        if not settings.OPENAI_API_KEY:
+            assistant_content = f"[LOCAL MODE] Pong: {chat_request.message}"
+        else:
+            # Appel à OpenAI (SDK bloquant : hors de la boucle d'événements)
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=1000
+            )
+            assistant_content = response.choices[0].message.content
+
+        return await db.run_sync(reply, assistant_content, True)
+
     except Exception as e:
         # En absence de clé, on ne devrait pas arriver ici, mais par sécurité
         if not settings.OPENAI_API_KEY:
-            assistant_message = service.add_message(conversation_id, "assistant", f"[LOCAL MODE][ERROR] {type(e).__name__}")
-            return ChatResponse(
-                message=MessageResponse(
-                    id=user_message.id,
-                    role=user_message.role,
-                    content=user_message.content,
-                    created_at=user_message.created_at
-                ),
-                assistant_response=MessageResponse(
-                    id=assistant_message.id,
-                    role=assistant_message.role,
-                    content=assistant_message.content,
-                    created_at=assistant_message.created_at
-                ),
-                conversation_id=conversation_id
-            )
+            await db.rollback()
+            return await db.run_sync(reply, f"[LOCAL MODE][ERROR] {type(e).__name__}", False)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de l'appel à OpenAI: {str(e)}"
         )
 
 @router.put("/conversations/{conversation_id}/title")
-def update_conversation_title(
+async def update_conversation_title(
     conversation_id: uuid.UUID,
     title: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Met à jour le titre d'une conversation"""
-    service = ConversationService(db)
-    success = service.update_conversation_title(conversation_id, title)
-    
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation non trouvée"
-        )
-    
-    return {"message": "Titre mis à jour avec succès"}
+    def run(db: Session):
+        service = ConversationService(db)
+        success = service.update_conversation_title(conversation_id, title)
+
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation non trouvée"
+            )
+
+        return {"message": "Titre mis à jour avec succès"}
+
+    return await db.run_sync(run)
 
 @router.put("/conversations/{conversation_id}/archive")
-def archive_conversation(
+async def archive_conversation(
     conversation_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Archive une conversation"""
-    service = ConversationService(db)
-    success = service.archive_conversation(conversation_id)
-    
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation non trouvée"
-        )
-    
-    return {"message": "Conversation archivée avec succès"}
+    def run(db: Session):
+        service = ConversationService(db)
+        success = service.archive_conversation(conversation_id)
+
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation non trouvée"
+            )
+
+        return {"message": "Conversation archivée avec succès"}
+
+    return await db.run_sync(run)
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: uuid.UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprime une conversation"""
-    service = ConversationService(db)
-    success = service.delete_conversation(conversation_id)
-    
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation non trouvée"
-        )
-    
-    return {"message": "Conversation supprimée avec succès"}
+    def run(db: Session):
+        service = ConversationService(db)
+        success = service.delete_conversation(conversation_id)
+
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation non trouvée"
+            )
+
+        return {"message": "Conversation supprimée avec succès"}
+
+    return await db.run_sync(run)
+
+@router.post("/conversations/bulk-archive")
+async def bulk_archive_conversations(
+    filters: ConversationBulkFilter,
+    db: AsyncSession = Depends(get_db)
+):
+    """Archive en une requête les conversations inactives depuis `older_than_days` jours"""
+    if filters.older_than_days is None:
+        raise HTTPException(status_code=400, detail="older_than_days est requis")
+
+    def run(db: Session):
+        count = ConversationService(db).archive_conversations(filters.older_than_days)
+        return {"message": f"{count} conversation(s) archivée(s)", "archived": count}
+
+    return await db.run_sync(run)
+
+@router.post("/conversations/bulk-delete", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_delete_conversations(
+    filters: ConversationBulkFilter,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """Programme la suppression des conversations correspondant aux critères (purge par lots en tâche de fond)"""
+    if filters.older_than_days is None and filters.archived is None:
+        raise HTTPException(status_code=400, detail="Au moins un critère est requis (older_than_days, archived)")
+
+    def run(db: Session):
+        return ConversationService(db).count_conversations(filters.older_than_days, filters.archived)
+
+    matched = await db.run_sync(run)
+    if matched:
+        # exécutée après l'envoi de la réponse, dans le pool de threads
+        background_tasks.add_task(purge_conversations.run, filters.older_than_days, filters.archived)
+    return {"message": "Suppression programmée", "matched": matched}
 
 @router.get("/conversations/{conversation_id}/export")
-def export_conversation(
+async def export_conversation(
     conversation_id: uuid.UUID,
     format: str = "pdf",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Exporte la conversation au format demandé: pdf | docx | xlsx"""
-    service = ConversationService(db)
-    conversation = service.get_conversation(conversation_id)
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation non trouvée")
-
-    # Collecte des messages
-    rows = [
-        {
-            "date": m.created_at.strftime("%Y-%m-%d %H:%M"),
-            "role": m.role,
-            "content": m.content,
-        }
-        for m in conversation.messages
-    ]
+    def load(db: Session):
+        service = ConversationService(db)
+        conversation = service.get_conversation(conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation non trouvée")
+
+        # Collecte des messages
+        rows = [
+            {
+                "date": m.created_at.strftime("%Y-%m-%d %H:%M"),
+                "role": m.role,
+                "content": m.content,
+            }
+            for m in conversation.messages
+        ]
+        return conversation.title, rows
+
+    title, rows = await db.run_sync(load)
+    # génération du document (CPU / bibliothèques bloquantes) dans le pool de threads
+    return await asyncio.to_thread(_render_export, conversation_id, title, rows, format)
+
 
+def _render_export(conversation_id: uuid.UUID, title: Optional[str], rows: list, format: str):
     fmt = (format or "pdf").lower()
-    filename_base = f"conversation_{conversation.id}"
+    filename_base = f"conversation_{conversation_id}"
 
     if fmt == "pdf":
         # Construire un HTML simple et convertir en PDF via WeasyPrint
@@ -370,7 +425,7 @@ def export_conversation(
             ".role{font-weight:bold;margin-bottom:6px}",
             ".date{color:#64748b;font-size:10pt}",
             "</style></head><body>",
-            f"<h1>{conversation.title or 'Conversation'}</h1>",
+            f"<h1>{title or 'Conversation'}</h1>",
         ]
         for r in rows:
             content_html = (r['content'] or '').replace('\n', '<br/>')
@@ -393,7 +448,7 @@ def export_conversation(
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"python-docx indisponible: {e}")
         doc = Document()
-        doc.add_heading(conversation.title or "Conversation", level=1)
+        doc.add_heading(title or "Conversation", level=1)
         for r in rows:
             p = doc.add_paragraph()
             p.add_run(f"{r['role'].capitalize()} ").bold = True
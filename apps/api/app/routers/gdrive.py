@@ -2,7 +2,7 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.responses import RedirectResponse, JSONResponse
 from app.config import settings
-from app.db import get_db
+from app.db import get_sync_db
 from sqlalchemy.orm import Session
 from app.services.oauth_tokens import save_oauth_token, get_oauth_token, needs_refresh
 from app.services.session import get_or_create_current_user
@@ -18,6 +18,9 @@ from google.auth.transport.requests import Request as GoogleRequest
 
 router = APIRouter()
 
+# The Google client is blocking end to end: these handlers stay sync (threadpool)
+# with a sync session instead of the async get_db.
+
 # In dev, we keep a single-user token cache in memory
 _OAUTH_CACHE = {}
 
@@ -50,7 +53,7 @@ def _build_flow(state: Optional[str] = None) -> Flow:
 
 
 @router.get("/auth")
-def start_auth(request: Request, db: Session = Depends(get_db)):
+def start_auth(request: Request, db: Session = Depends(get_sync_db)):
     # Ensure a user exists; set cookie on redirect
     user = get_or_create_current_user(db, request)
     flow = _build_flow()
@@ -69,7 +72,7 @@ def start_auth(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/callback")
-def oauth_callback(request: Request, db: Session = Depends(get_db)):
+def oauth_callback(request: Request, db: Session = Depends(get_sync_db)):
     user = get_or_create_current_user(db, request)
     state = getattr(request.app.state, "g_state", None)
     flow = _build_flow(state=state)
@@ -121,7 +124,7 @@ def _get_creds(db: Session, request: Request | None = None) -> Credentials:
 
 
 @router.get("/list")
-def list_drive_files(q: Optional[str] = None, page_token: Optional[str] = None, db: Session = Depends(get_db), request: Request = None):
+def list_drive_files(q: Optional[str] = None, page_token: Optional[str] = None, db: Session = Depends(get_sync_db), request: Request = None):
     creds = _get_creds(db, request)
     service = build("drive", "v3", credentials=creds)
     resp = service.files().list(
@@ -134,7 +137,7 @@ def list_drive_files(q: Optional[str] = None, page_token: Optional[str] = None,
 
 
 @router.get("/download")
-def download_drive_file(id: str, db: Session = Depends(get_db), request: Request = None):
+def download_drive_file(id: str, db: Session = Depends(get_sync_db), request: Request = None):
     creds = _get_creds(db, request)
     service = build("drive", "v3", credentials=creds)
     try:
@@ -156,7 +159,7 @@ def download_drive_file(id: str, db: Session = Depends(get_db), request: Request
 
 
 @router.post("/import")
-def import_drive_file(id: str, db: Session = Depends(get_db), request: Request = None):
+def import_drive_file(id: str, db: Session = Depends(get_sync_db), request: Request = None):
     """Download a file from Drive and store it in local uploads directory."""
     import os, io
     from googleapiclient.http import MediaIoBaseDownload
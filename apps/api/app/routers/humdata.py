@@ -1,59 +1,74 @@
 # -*- coding: utf-8 -*-
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
 from app.db import get_db
-from app.models import Crisis, JobPosting, FundingRecord
+from app.models import Crisis, JobPosting, FundingRecord, CrisisCountry, JobCountry
+from app.jobs.scheduler import scheduler, latest_runs
+from app.services import dedup, export, facets, funding_rollups
+from app.services.countries import resolve_country
+from app.services.http_cache import conditional_response
 from typing import Optional, List
+from datetime import datetime, timedelta
+import base64
+import json
+import uuid
 
 router = APIRouter(prefix="/humdata", tags=["humdata"])
 
+# Colonnes projetées par les listes : jamais `raw` (voir les endpoints de détail)
+CRISIS_COLUMNS = (
+    Crisis.id, Crisis.source, Crisis.source_id, Crisis.title, Crisis.country, Crisis.url, Crisis.published_at,
+    Crisis.cluster_id,
+)
+JOB_COLUMNS = (
+    JobPosting.id, JobPosting.source, JobPosting.source_id, JobPosting.title, JobPosting.org,
+    JobPosting.location, JobPosting.url, JobPosting.published_at, JobPosting.deadline, JobPosting.cluster_id,
+)
+FUNDING_COLUMNS = (
+    FundingRecord.id, FundingRecord.year, FundingRecord.country, FundingRecord.cluster,
+    FundingRecord.donor, FundingRecord.recipient, FundingRecord.amount, FundingRecord.currency,
+)
 
-@router.get("/crises")
-def list_crises(
-    db: Session = Depends(get_db),
-    source: Optional[str] = Query(None),
-    q: Optional[str] = Query(None, description="search in title"),
-    country: Optional[str] = Query(None),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-):
-    qry = db.query(Crisis).order_by(Crisis.published_at.desc().nullslast())
+
+def _crises_query(db: Session, source: Optional[str], q: Optional[str], country: Optional[str], collapse: bool = True):
+    qry = db.query(*CRISIS_COLUMNS).order_by(Crisis.published_at.desc().nullslast())
     if source:
         qry = qry.filter(Crisis.source == source)
+    elif collapse:
+        # une ligne par groupe de doublons inter-sources (inutile pour une seule source)
+        qry = qry.filter(dedup.canonical_only(Crisis))
     if q:
         like = f"%{q}%"
         qry = qry.filter(Crisis.title.ilike(like))
     if country:
-        likec = f"%{country}%"
-        qry = qry.filter(Crisis.country.ilike(likec))
-    rows = qry.offset(offset).limit(limit).all()
-    return [
-        {
-            "id": str(r.id),
-            "source": r.source,
-            "source_id": r.source_id,
-            "title": r.title,
-            "country": r.country,
-            "url": r.url,
-            "published_at": r.published_at,
-        }
-        for r in rows
-    ]
+        iso3 = resolve_country(db, country)
+        qry = qry.filter(Crisis.id.in_(select(CrisisCountry.crisis_id).where(CrisisCountry.iso3 == iso3)))
+    return qry
 
 
-@router.get("/jobs")
-def list_jobs(
-    db: Session = Depends(get_db),
-    source: Optional[str] = Query(None),
-    q: Optional[str] = Query(None, description="search in title"),
-    org: Optional[str] = Query(None),
-    country: Optional[str] = Query(None, description="search in location"),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-):
-    qry = db.query(JobPosting).order_by(JobPosting.published_at.desc().nullslast())
+def _crisis_dict(r) -> dict:
+    return {
+        "id": str(r.id),
+        "source": r.source,
+        "source_id": r.source_id,
+        "title": r.title,
+        "country": r.country,
+        "url": r.url,
+        "published_at": r.published_at,
+        "cluster_id": str(r.cluster_id) if r.cluster_id else None,
+    }
+
+
+def _jobs_query(db: Session, source: Optional[str], q: Optional[str], org: Optional[str], country: Optional[str],
+                collapse: bool = True):
+    qry = db.query(*JOB_COLUMNS).order_by(JobPosting.published_at.desc().nullslast())
     if source:
         qry = qry.filter(JobPosting.source == source)
+    elif collapse:
+        qry = qry.filter(dedup.canonical_only(JobPosting))
     if q:
         like = f"%{q}%"
         qry = qry.filter(JobPosting.title.ilike(like))
@@ -61,53 +76,362 @@ def list_jobs(
         likeo = f"%{org}%"
         qry = qry.filter(JobPosting.org.ilike(likeo))
     if country:
-        likec = f"%{country}%"
-        qry = qry.filter(JobPosting.location.ilike(likec))
-    rows = qry.offset(offset).limit(limit).all()
-    return [
-        {
-            "id": str(r.id),
-            "source": r.source,
-            "source_id": r.source_id,
-            "title": r.title,
-            "org": r.org,
-            "location": r.location,
-            "url": r.url,
-            "published_at": r.published_at,
-            "deadline": r.deadline,
-        }
-        for r in rows
-    ]
+        iso3 = resolve_country(db, country)
+        qry = qry.filter(JobPosting.id.in_(select(JobCountry.job_id).where(JobCountry.iso3 == iso3)))
+    return qry
+
+
+def _job_dict(r) -> dict:
+    return {
+        "id": str(r.id),
+        "source": r.source,
+        "source_id": r.source_id,
+        "title": r.title,
+        "org": r.org,
+        "location": r.location,
+        "url": r.url,
+        "published_at": r.published_at,
+        "deadline": r.deadline,
+        "cluster_id": str(r.cluster_id) if r.cluster_id else None,
+    }
+
+
+def _funding_query(db: Session, year: Optional[int], country: Optional[str], cluster: Optional[str]):
+    q = db.query(*FUNDING_COLUMNS)
+    if year:
+        q = q.filter(FundingRecord.year == year)
+    if country:
+        q = q.filter(FundingRecord.country.ilike(f"%{country}%"))
+    if cluster:
+        q = q.filter(FundingRecord.cluster.ilike(f"%{cluster}%"))
+    return q.order_by(FundingRecord.amount.desc().nullslast())
+
+
+def _funding_dict(r) -> dict:
+    return {
+        "id": str(r.id),
+        "year": r.year,
+        "country": r.country,
+        "cluster": r.cluster,
+        "donor": r.donor,
+        "recipient": r.recipient,
+        "amount": r.amount,
+        "currency": r.currency,
+    }
+
+
+@router.get("/crises")
+async def list_crises(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    source: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="search in title"),
+    country: Optional[str] = Query(None, description="code ISO3 ou nom exact du pays"),
+    collapse: bool = Query(True, description="une seule ligne par groupe de doublons inter-sources"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    def run(db: Session):
+        def build():
+            rows = _crises_query(db, source, q, country, collapse).offset(offset).limit(limit).all()
+            return [_crisis_dict(r) for r in rows]
+
+        return conditional_response(request, db, ("crises",), build)
+
+    return await db.run_sync(run)
+
+
+@router.get("/jobs")
+async def list_jobs(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    source: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="search in title"),
+    org: Optional[str] = Query(None),
+    country: Optional[str] = Query(None, description="code ISO3 ou nom exact du pays"),
+    collapse: bool = Query(True, description="une seule ligne par groupe de doublons inter-sources"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    def run(db: Session):
+        def build():
+            rows = _jobs_query(db, source, q, org, country, collapse).offset(offset).limit(limit).all()
+            return [_job_dict(r) for r in rows]
+
+        return conditional_response(request, db, ("job_postings",), build)
+
+    return await db.run_sync(run)
+
+
+def _encode_cursor(deadline: datetime, job_id) -> str:
+    raw = f"{deadline.isoformat()}|{job_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        deadline, job_id = raw.split("|", 1)
+        return datetime.fromisoformat(deadline), uuid.UUID(job_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+
+@router.get("/jobs/closing")
+async def list_closing_jobs(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    source: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="search in title"),
+    org: Optional[str] = Query(None),
+    country: Optional[str] = Query(None, description="code ISO3 ou nom exact du pays"),
+    within_days: Optional[int] = Query(None, ge=1, le=365, description="échéance dans les N prochains jours"),
+    collapse: bool = Query(True, description="une seule ligne par groupe de doublons inter-sources"),
+    cursor: Optional[str] = Query(None, description="valeur `next_cursor` de la page précédente"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Offres encore ouvertes, de l'échéance la plus proche à la plus lointaine.
+
+    Pagination par curseur (deadline, id) : chaque page est une lecture de
+    l'index partiel ix_job_postings_open_deadline, sans OFFSET ni tri.
+    """
+    def run(db: Session):
+        # arrondi à la minute pour que la réponse reste cacheable
+        now = datetime.utcnow().replace(second=0, microsecond=0)
+        after = _decode_cursor(cursor) if cursor else None
+
+        def build():
+            qry = (
+                _jobs_query(db, source, q, org, country, collapse)
+                .filter(JobPosting.deadline.isnot(None), JobPosting.deadline >= now)
+                .order_by(None)
+                .order_by(JobPosting.deadline, JobPosting.id)
+            )
+            if within_days:
+                qry = qry.filter(JobPosting.deadline <= now + timedelta(days=within_days))
+            if after:
+                qry = qry.filter(tuple_(JobPosting.deadline, JobPosting.id) > tuple_(*after))
+            rows = qry.limit(limit + 1).all()
+            page = rows[:limit]
+            last = page[-1] if len(rows) > limit else None
+            return {
+                "items": [_job_dict(r) for r in page],
+                "next_cursor": _encode_cursor(last.deadline, last.id) if last else None,
+            }
+
+        return conditional_response(request, db, ("job_postings",), build, extra=now.isoformat())
+
+    return await db.run_sync(run)
+
+
+@router.get("/funding/aggregate")
+async def aggregate_funding(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    group_by: str = Query("country", pattern="^(year|country|cluster|donor)$"),
+    year: Optional[int] = Query(None),
+    top: int = Query(20, ge=1, le=500),
+):
+    """Totaux pré-agrégés (funding_rollups) par dimension, top-N par montant."""
+    def run(db: Session):
+        def build():
+            return {
+                "group_by": group_by,
+                "year": year,
+                "items": funding_rollups.aggregate(db, group_by, year=year, top=top),
+            }
+
+        return conditional_response(request, db, ("funding_records",), build)
+
+    return await db.run_sync(run)
 
 
 @router.get("/funding")
-def list_funding(
-    db: Session = Depends(get_db),
+async def list_funding(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     year: Optional[int] = Query(None),
     country: Optional[str] = Query(None),
     cluster: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=200),
     offset: int = Query(0, ge=0),
 ):
-    q = db.query(FundingRecord)
-    if year:
-        q = q.filter(FundingRecord.year == year)
-    if country:
-        q = q.filter(FundingRecord.country.ilike(f"%{country}%"))
-    if cluster:
-        q = q.filter(FundingRecord.cluster.ilike(f"%{cluster}%"))
-    q = q.order_by(FundingRecord.amount.desc().nullslast())
-    rows = q.offset(offset).limit(limit).all()
-    return [
-        {
-            "id": str(r.id),
-            "year": r.year,
-            "country": r.country,
-            "cluster": r.cluster,
-            "donor": r.donor,
-            "recipient": r.recipient,
-            "amount": r.amount,
-            "currency": r.currency,
+    def run(db: Session):
+        def build():
+            rows = _funding_query(db, year, country, cluster).offset(offset).limit(limit).all()
+            return [_funding_dict(r) for r in rows]
+
+        return conditional_response(request, db, ("funding_records",), build)
+
+    return await db.run_sync(run)
+
+
+@router.get("/{table}/export")
+def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    gzip: bool = Query(False, description="compresser le flux (fichier .gz)"),
+    source: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="search in title"),
+    org: Optional[str] = Query(None),
+    country: Optional[str] = Query(None),
+    collapse: bool = Query(True, description="une seule ligne par groupe de doublons inter-sources"),
+    year: Optional[int] = Query(None),
+    cluster: Optional[str] = Query(None),
+):
+    """Export complet d'une table (crises, jobs, funding) en flux, avec les filtres des listes."""
+    if table == "crises":
+        columns = CRISIS_COLUMNS
+        build = lambda db: _crises_query(db, source, q, country, collapse)
+    elif table == "jobs":
+        columns = JOB_COLUMNS
+        build = lambda db: _jobs_query(db, source, q, org, country, collapse)
+    elif table == "funding":
+        columns = FUNDING_COLUMNS
+        build = lambda db: _funding_query(db, year, country, cluster)
+    else:
+        raise HTTPException(status_code=404, detail="Table inconnue")
+    if format == "parquet" and not export.HAS_PYARROW:
+        raise HTTPException(status_code=501, detail="Export Parquet indisponible (pyarrow non installé)")
+
+    media_type, ext = export.FORMATS[format]
+    filename = f"{table}.{ext}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+    # pas de tri : l'export suit l'ordre physique, sans tri côté base
+    body = export.stream(format, columns, lambda db: build(db).order_by(None), gzip=gzip)
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+FACET_TABLES = {"crises": "crises", "jobs": "job_postings"}
+
+
+@router.get("/{table}/facets")
+async def get_facets(
+    table: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    source: Optional[str] = Query(None),
+    country: Optional[str] = Query(None, description="code ISO3 ou nom exact du pays"),
+    org: Optional[str] = Query(None, description="organisation (valeur exacte d'une facette)"),
+    deadline: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="mois d'échéance YYYY-MM"),
+    q: Optional[str] = Query(None, description="search in title"),
+    top: int = Query(20, ge=1, le=100),
+):
+    """Comptes par source / pays / organisation / mois d'échéance pour la liste filtrée.
+
+    Sans filtre ou avec un seul filtre, lecture directe des compteurs précalculés;
+    les combinaisons (ou `q`) sont calculées à la volée.
+    """
+    def run(db: Session):
+        name = FACET_TABLES.get(table)
+        if not name:
+            raise HTTPException(status_code=404, detail="Table inconnue")
+        filters = {"source": source, "org": org, "deadline": deadline}
+        # pays inconnu : aucune ligne, comme les listes (surtout pas les compteurs « sans pays », clé "")
+        unknown_country = False
+        if country:
+            filters["country"] = resolve_country(db, country)
+            unknown_country = filters["country"] is None
+        filters = {k: v for k, v in filters.items() if v is not None and k in facets.DIMENSIONS[name]}
+
+        def build():
+            if unknown_country:
+                items = {dim: [] for dim in facets.DIMENSIONS[name] if dim != "country"}
+            elif q or len(filters) > 1:
+                items = facets.live_counts(db, name, filters, q=q, top=top)
+            else:
+                items = facets.counts(db, name, next(iter(filters.items()), None), top=top)
+            return {"table": table, "filters": filters, "facets": items}
+
+        return conditional_response(request, db, (name,), build)
+
+    return await db.run_sync(run)
+
+
+@router.get("/ingest/status")
+async def ingest_status(db: AsyncSession = Depends(get_db)):
+    """Dernière exécution de chaque job d'ingestion et état du planificateur local."""
+    def run(db: Session):
+        runs = latest_runs(db, scheduler.jobs)
+        return {
+            "scheduler_enabled": scheduler.started,
+            "lock_backend": scheduler.backend.name if scheduler.started else None,
+            "jobs": [
+                {
+                    "name": spec.name,
+                    "interval_seconds": spec.interval,
+                    "running": spec.running,
+                    "next_run_at": spec.next_run_at if scheduler.started else None,
+                    "last_run": runs.get(spec.name),
+                }
+                for spec in scheduler.jobs.values()
+            ],
         }
-        for r in q.limit(limit).all()
-    ]
+
+    return await db.run_sync(run)
+
+
+def _detail(model, columns, object_id: uuid.UUID, include_raw: bool, db: Session, not_found: str) -> dict:
+    q = db.query(model)
+    if include_raw:
+        q = q.options(undefer(model.raw))
+    row = q.filter(model.id == object_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail=not_found)
+    data = {c.key: getattr(row, c.key) for c in columns}
+    data["id"] = str(row.id)
+    if include_raw:
+        data["raw"] = json.loads(row.raw) if row.raw else None
+    return data
+
+
+@router.get("/crises/{crisis_id}")
+async def get_crisis(
+    crisis_id: uuid.UUID,
+    request: Request,
+    include_raw: bool = Query(True, description="inclure le payload source complet"),
+    db: AsyncSession = Depends(get_db),
+):
+    def run(db: Session):
+        return conditional_response(
+            request, db, ("crises",),
+            lambda: _detail(Crisis, CRISIS_COLUMNS, crisis_id, include_raw, db, "Crise non trouvée"),
+        )
+
+    return await db.run_sync(run)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: uuid.UUID,
+    request: Request,
+    include_raw: bool = Query(True, description="inclure le payload source complet"),
+    db: AsyncSession = Depends(get_db),
+):
+    def run(db: Session):
+        return conditional_response(
+            request, db, ("job_postings",),
+            lambda: _detail(JobPosting, JOB_COLUMNS, job_id, include_raw, db, "Offre non trouvée"),
+        )
+
+    return await db.run_sync(run)
+
+
+@router.get("/funding/{record_id}")
+async def get_funding(
+    record_id: uuid.UUID,
+    request: Request,
+    include_raw: bool = Query(True, description="inclure le payload source complet"),
+    db: AsyncSession = Depends(get_db),
+):
+    def run(db: Session):
+        return conditional_response(
+            request, db, ("funding_records",),
+            lambda: _detail(FundingRecord, FUNDING_COLUMNS, record_id, include_raw, db, "Financement non trouvé"),
+        )
+
+    return await db.run_sync(run)
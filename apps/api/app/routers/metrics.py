@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from fastapi import APIRouter
+
+from app.services import pool_metrics
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics():
+    """Jauges et histogrammes des pools de connexions (attente, détention par route), depuis le démarrage du worker."""
+    return {"pools": pool_metrics.snapshot(), "buckets_seconds": list(pool_metrics.BUCKETS)}
@@ -2,8 +2,10 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.responses import RedirectResponse, JSONResponse
 import os, time, json
+import asyncio
 import httpx
 import msal
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.services.oauth_tokens import save_oauth_token, get_oauth_token, needs_refresh
@@ -28,8 +30,8 @@ AUTHORITY = f"https://login.microsoftonline.com/{MS_TENANT}"
 
 
 @router.get("/auth")
-def start_auth(request: Request, db: Session = Depends(get_db)):
-    user = get_or_create_current_user(db, request)
+async def start_auth(request: Request, db: AsyncSession = Depends(get_db)):
+    user = await db.run_sync(get_or_create_current_user, request)
     if not MS_CLIENT_ID or not MS_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="OneDrive OAuth not configured")
     app = msal.ConfidentialClientApplication(
@@ -42,20 +44,25 @@ def start_auth(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/callback")
-def callback(request: Request, db: Session = Depends(get_db)):
-    user = get_or_create_current_user(db, request)
+async def callback(request: Request, db: AsyncSession = Depends(get_db)):
+    user = await db.run_sync(get_or_create_current_user, request)
     code = request.query_params.get("code")
     if not code:
         raise HTTPException(status_code=400, detail="Missing code")
     app = msal.ConfidentialClientApplication(
         MS_CLIENT_ID, authority=AUTHORITY, client_credential=MS_CLIENT_SECRET
     )
-    token = app.acquire_token_by_authorization_code(code, scopes=SCOPES, redirect_uri=MS_REDIRECT_URI)
+    # msal is blocking: run the token exchange in the threadpool
+    token = await asyncio.to_thread(
+        app.acquire_token_by_authorization_code, code, scopes=SCOPES, redirect_uri=MS_REDIRECT_URI
+    )
     if "access_token" not in token:
         raise HTTPException(status_code=400, detail=str(token))
     _OD_CACHE[str(user.id)] = token
     _OD_CACHE["expiry"] = time.time() + token.get("expires_in", 3600)
-    save_oauth_token(db, provider="onedrive", subject=None, token=token, user_id=user.id)
+    await db.run_sync(
+        lambda s: save_oauth_token(s, provider="onedrive", subject=None, token=token, user_id=user.id)
+    )
 
     web_url = settings.WEB_APP_URL or "http://127.0.0.1:5173"
     return RedirectResponse(f"{web_url}#onedrive=connected")
@@ -88,8 +95,8 @@ GRAPH_BASE = "https://graph.microsoft.com/v1.0"
 
 
 @router.get("/list")
-async def list_root(request: Request, q: str | None = None, db: Session = Depends(get_db)):
-    token = _get_token(db, request)
+async def list_root(request: Request, q: str | None = None, db: AsyncSession = Depends(get_db)):
+    token = await db.run_sync(_get_token, request)
     headers = {"Authorization": f"Bearer {token}"}
     # Use server-side search if a query is provided, otherwise list root children
     if q and q.strip():
@@ -110,8 +117,8 @@ async def list_root(request: Request, q: str | None = None, db: Session = Depend
 
 
 @router.post("/import")
-async def import_item(request: Request, id: str, db: Session = Depends(get_db)):
-    token = _get_token(db, request)
+async def import_item(request: Request, id: str, db: AsyncSession = Depends(get_db)):
+    token = await db.run_sync(_get_token, request)
     headers = {"Authorization": f"Bearer {token}"}
     url = f"{GRAPH_BASE}/me/drive/items/{id}/content"
     async with httpx.AsyncClient(timeout=None) as client:
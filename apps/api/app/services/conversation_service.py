@@ -3,7 +3,7 @@
 Service pour la gestion des conversations et de la mémoire
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, func, update
 from app.models import Conversation, Message, Memory
 from app.db import get_db
 from typing import List, Optional, Dict
@@ -11,6 +11,24 @@ import json
 from datetime import datetime, timedelta
 import uuid
 
+PREVIEW_LENGTH = 200  # longueur de Conversation.last_message_preview
+
+
+def message_preview(content: str) -> str:
+    """Aperçu d'un message pour les listes : espaces normalisés, tronqué."""
+    return " ".join((content or "").split())[:PREVIEW_LENGTH]
+
+
+def conversation_filters(older_than_days: Optional[int] = None, archived: Optional[bool] = None) -> list:
+    """Critères des opérations en masse : inactives depuis N jours (updated_at), archivées ou non."""
+    clauses = []
+    if older_than_days is not None:
+        clauses.append(Conversation.updated_at < datetime.utcnow() - timedelta(days=older_than_days))
+    if archived is not None:
+        clauses.append(Conversation.is_archived == archived)
+    return clauses
+
+
 class ConversationService:
     """Service pour gérer les conversations et la mémoire contextuelle"""
     
@@ -42,17 +60,26 @@ class ConversationService:
     
     def add_message(self, conversation_id: uuid.UUID, role: str, content: str) -> Message:
         """Ajoute un message à une conversation"""
+        now = datetime.utcnow()
         message = Message(
             conversation_id=conversation_id,
             role=role,
-            content=content
+            content=content,
+            created_at=now
         )
         self.db.add(message)
         
-        # Mettre à jour la date de dernière modification de la conversation
-        conversation = self.get_conversation(conversation_id)
-        if conversation:
-            conversation.updated_at = datetime.utcnow()
+        # Compteur et aperçu de la conversation : incrément en base (pas de perte entre requêtes concurrentes)
+        self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                message_count=Conversation.message_count + 1,
+                last_message_at=now,
+                last_message_preview=message_preview(content),
+                updated_at=now,
+            )
+        )
         
         self.db.commit()
         self.db.refresh(message)
@@ -92,8 +119,26 @@ class ConversationService:
             return True
         return False
     
+    def archive_conversations(self, older_than_days: int) -> int:
+        """Archive en une requête les conversations inactives depuis `older_than_days` jours"""
+        result = self.db.execute(
+            update(Conversation)
+            .where(*conversation_filters(older_than_days, archived=False))
+            # updated_at inchangé : l'ancienneté reste celle de la dernière activité
+            .values(is_archived=True, updated_at=Conversation.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+
+    def count_conversations(self, older_than_days: Optional[int] = None, archived: Optional[bool] = None) -> int:
+        """Nombre de conversations correspondant aux critères"""
+        return self.db.query(func.count(Conversation.id)).filter(
+            *conversation_filters(older_than_days, archived)
+        ).scalar()
+
     def delete_conversation(self, conversation_id: uuid.UUID) -> bool:
-        """Supprime une conversation et tous ses messages"""
+        """Supprime une conversation et tous ses messages (ON DELETE CASCADE, messages non chargés)"""
         conversation = self.get_conversation(conversation_id)
         if conversation:
             self.db.delete(conversation)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Dimension pays (ISO3) des données humanitaires.
+
+ReliefWeb fournit pour chaque crise / offre une liste de pays avec leur code
+ISO3 : on alimente `countries` et les tables de liaison à l'ingestion, et les
+filtres par pays deviennent une égalité indexée sur le code ISO3 (plus de
+`ilike('%Guinea%')` qui attrape aussi « Equatorial Guinea »).
+"""
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.models import Country
+
+
+def extract_countries(entries) -> List[Tuple[str, str]]:
+    """(ISO3, nom) depuis une liste ReliefWeb `country` ([{iso3, name}, ...])."""
+    pairs = []
+    for c in entries or []:
+        iso3 = (c.get("iso3") or "").strip().upper()
+        if len(iso3) == 3:
+            pairs.append((iso3, c.get("name") or iso3))
+    return list(dict.fromkeys(pairs))
+
+
+def ensure_countries(db: Session, pairs: Iterable[Tuple[str, str]]) -> List[str]:
+    """Insère les pays inconnus; retourne les codes ISO3 dans l'ordre reçu."""
+    pairs = list(pairs)
+    codes = [iso3 for iso3, _ in pairs]
+    if not codes:
+        return []
+    existing = {r.iso3 for r in db.query(Country.iso3).filter(Country.iso3.in_(codes))}
+    missing = [{"iso3": iso3, "name": name} for iso3, name in pairs if iso3 not in existing]
+    if missing:
+        db.execute(insert(Country), missing)
+    return codes
+
+
+def link_countries(row, link_model, codes: Iterable[str]) -> None:
+    """Remplace les liaisons pays de `row` (relation `country_links`) en gardant celles qui restent."""
+    current = {link.iso3: link for link in row.country_links}
+    row.country_links = [current.get(code) or link_model(iso3=code) for code in dict.fromkeys(codes)]
+
+
+def codes_for_names(db: Session, names: Iterable[str]) -> List[str]:
+    """Codes ISO3 des noms de pays connus (correspondance exacte, insensible à la casse)."""
+    lowered = [n.strip().lower() for n in names if n and n.strip()]
+    if not lowered:
+        return []
+    return [r.iso3 for r in db.query(Country.iso3).filter(func.lower(Country.name).in_(lowered))]
+
+
+def resolve_country(db: Session, value: str) -> Optional[str]:
+    """Code ISO3 correspondant à un filtre `country` (code ISO3 ou nom exact)."""
+    value = (value or "").strip()
+    if len(value) == 3 and value.isalpha():
+        return value.upper()
+    codes = codes_for_names(db, [value])
+    return codes[0] if codes else None
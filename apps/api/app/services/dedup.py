@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Dédoublonnage inter-sources des crises et offres d'emploi.
+
+Une même catastrophe (ou offre) peut arriver par plusieurs flux. À l'ingestion,
+chaque ligne reçoit une signature MinHash de son titre (shingles de 5
+caractères) découpée en bandes LSH; chaque bande, préfixée par une clé de
+blocage normalisée (pays, semaine, organisation), donne un seau stocké dans
+`dedup_buckets`. Les candidats d'une ligne sont ceux qui partagent au moins un
+seau : quelques lectures indexées par ligne, donc un lot s'ingère en temps
+linéaire, sans comparaison deux à deux.
+
+Un candidat d'une autre source dont la similarité estimée dépasse
+DEDUP_THRESHOLD rattache la ligne à son groupe (`cluster_id` = id de la ligne
+canonique, la première vue); sinon la ligne est sa propre canonique. Les doublons
+d'une même source ne sont pas regroupés : la source les déclare distincts.
+"""
+import hashlib
+import re
+import unicodedata
+from array import array
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DedupBucket, uuid7
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE = 5
+
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+
+
+def _seeds() -> List[tuple]:
+    # coefficients (a, b) des permutations, dérivés de façon déterministe
+    out = []
+    for i in range(NUM_PERM):
+        d = hashlib.blake2b(f"minhash:{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(d[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(d[8:], "big") % _PRIME
+        out.append((a, b))
+    return out
+
+
+_PERMS = _seeds()
+
+
+def normalize(text: Optional[str]) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces réduits."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def shingles(text: str) -> set:
+    if len(text) <= SHINGLE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(title: Optional[str]) -> array:
+    """Signature MinHash (NUM_PERM entiers 32 bits) du titre normalisé."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles(normalize(title))
+    ]
+    if not hashes:
+        return array("I", [_MASK] * NUM_PERM)
+    return array("I", [min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in _PERMS])
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimation de la similarité de Jaccard entre deux signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _from_bytes(data: bytes) -> array:
+    sig = array("I")
+    sig.frombytes(data)
+    return sig
+
+
+def block_key(countries: Iterable[str], when: Optional[datetime], org: Optional[str] = None) -> str:
+    """Clé de blocage : pays ISO3 triés, semaine ISO de la date, organisation normalisée."""
+    week = "%d-W%02d" % when.isocalendar()[:2] if when else "-"
+    return "|".join([",".join(sorted(set(countries))) or "-", week, normalize(org)])
+
+
+def buckets(block: str, sig: array) -> List[str]:
+    out = []
+    for band in range(BANDS):
+        values = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        key = f"{block}|{band}|" + ",".join(map(str, values))
+        out.append(hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest())
+    return out
+
+
+def assign_cluster(db: Session, model, table: str, row, block: str) -> None:
+    """Calcule la signature de `row`, met à jour ses seaux et lui attribue un groupe.
+
+    Le groupe d'une ligne déjà rattachée n'est pas remis en cause (les autres
+    membres pointent peut-être sur elle); seuls sa signature et ses seaux sont
+    rafraîchis.
+    """
+    if row.id is None:
+        row.id = uuid7()
+    sig = signature(row.title)
+    keys = buckets(block, sig)
+    row.minhash = sig.tobytes()
+
+    if row.cluster_id is None:
+        candidates = (
+            db.query(model.id, model.cluster_id, model.minhash)
+            .filter(model.id.in_(
+                select(DedupBucket.row_id).where(DedupBucket.table_name == table, DedupBucket.bucket.in_(keys))
+            ))
+            .filter(model.id != row.id, model.source != row.source, model.cluster_id.isnot(None))
+            .all()
+        )
+        best, best_score = None, settings.DEDUP_THRESHOLD
+        for c in candidates:
+            if not c.minhash:
+                continue
+            score = similarity(sig, _from_bytes(c.minhash))
+            if score >= best_score:
+                best, best_score = c, score
+        row.cluster_id = best.cluster_id if best else row.id
+
+    db.execute(delete(DedupBucket).where(DedupBucket.table_name == table, DedupBucket.row_id == row.id))
+    db.execute(insert(DedupBucket), [{"table_name": table, "bucket": k, "row_id": row.id} for k in dict.fromkeys(keys)])
+
+
+def canonical_only(model):
+    """Filtre « une ligne par groupe » : canoniques et lignes pas encore rattachées."""
+    return (model.cluster_id.is_(None)) | (model.cluster_id == model.id)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Export en flux des tables humdata (NDJSON, CSV, Parquet, gzip en option).
+
+Les lignes sont lues par lots via `yield_per` (curseur serveur sous
+PostgreSQL) et sérialisées lot par lot : la mémoire reste constante quelle que
+soit la taille de l'export. Le générateur ouvre sa propre session, qui vit le
+temps du flux.
+"""
+import csv
+import io
+import json
+import uuid
+import zlib
+from datetime import date, datetime
+from typing import Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+
+# pyarrow en option : seul le format Parquet en dépend
+HAS_PYARROW = False
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+BATCH_SIZE = 5000
+
+
+def _converters(columns: tuple) -> list:
+    """(index, fonction) des colonnes à rendre sérialisables (dates, UUID); les autres passent telles quelles."""
+    out = []
+    for i, c in enumerate(columns):
+        try:
+            python_type = c.type.python_type
+        except NotImplementedError:
+            python_type = None
+        if python_type in (datetime, date):
+            out.append((i, lambda v: v.isoformat()))
+        elif python_type is uuid.UUID:
+            out.append((i, str))
+    return out
+
+
+def _serializable(batch: list, converters: list) -> list:
+    if not converters:
+        return batch
+    rows = []
+    for row in batch:
+        row = list(row)
+        for i, f in converters:
+            if row[i] is not None:
+                row[i] = f(row[i])
+        rows.append(row)
+    return rows
+
+
+def batches(build_query: Callable[[Session], object]) -> Iterator[list]:
+    db = SessionLocal()
+    try:
+        # requête Core (pas d'objets ORM) lue par paquets sur un curseur serveur
+        result = db.connection().execute(build_query(db).statement, execution_options={"yield_per": BATCH_SIZE})
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def _ndjson(columns: list, batches: Iterator[list]) -> Iterator[bytes]:
+    for batch in batches:
+        lines = [json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _csv(columns: list, batches: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    """Fichier en écriture seule dont on vide le contenu après chaque groupe de lignes."""
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_type(column):
+    python_type = None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        pass
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is datetime:
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def _parquet(batches: Iterator[list], schema) -> Iterator[bytes]:
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    strings = [i for i, f in enumerate(schema) if f.type == pa.string()]
+    for batch in batches:
+        data = [list(col) for col in zip(*batch)]
+        for i in strings:
+            data[i] = [None if v is None else str(v) for v in data[i]]
+        writer.write_table(pa.Table.from_arrays([pa.array(d, type=f.type) for d, f in zip(data, schema)], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 : en-tête et CRC gzip
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def stream(fmt: str, columns: tuple, build_query: Callable[[Session], object], gzip: bool = False) -> Iterator[bytes]:
+    """Flux d'octets de l'export; `build_query(db)` renvoie la requête sur `columns` (attributs ORM)."""
+    names = [c.key for c in columns]
+    if fmt == "parquet":
+        schema = pa.schema([(c.key, _arrow_type(c)) for c in columns])
+        chunks = _parquet(batches(build_query), schema)
+    else:
+        converters = _converters(columns)
+        rows = (_serializable(b, converters) for b in batches(build_query))
+        chunks = (_ndjson if fmt == "ndjson" else _csv)(names, rows)
+    chunks = (c for c in chunks if c)
+    return _gzip(chunks) if gzip else chunks
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Compteurs de facettes des listes humdata (source, pays, organisation, échéance).
+
+Les comptes vivent dans `facet_counts` et sont maintenus à l'ingestion, comme
+les agrégats de financement : chaque ligne insérée ou modifiée produit un
+delta (-ancien état, +nouvel état) appliqué dans la même transaction.
+
+Pour rester cohérents avec un filtre actif, on stocke aussi les comptes
+croisés : (dimension, valeur) sachant (autre dimension, valeur filtrée). Une
+liste filtrée sur un seul critère obtient donc ses facettes par une lecture
+indexée, quelle que soit la taille de la table. Seules les lignes canoniques
+(voir app.services.dedup) sont comptées, comme dans les listes par défaut.
+"""
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, update, delete, insert
+from sqlalchemy.orm import Session, selectinload
+
+from app.models import Crisis, JobPosting, CrisisCountry, JobCountry, FacetCount
+from app.services import dedup
+from app.services.http_cache import bump_version
+
+DIMENSIONS = {
+    "crises": ("source", "country"),
+    "job_postings": ("source", "country", "org", "deadline"),
+}
+MODELS = {"crises": Crisis, "job_postings": JobPosting}
+
+
+def _key(value) -> str:
+    return "" if value is None else str(value)[:255]
+
+
+def snapshot(table: str, row) -> Optional[Dict[str, tuple]]:
+    """Valeurs de facettes d'une ligne, ou None si elle n'est pas comptée (doublon)."""
+    if row.cluster_id is not None and row.cluster_id != row.id:
+        return None
+    values = {
+        "source": (_key(row.source),),
+        "country": tuple(sorted({link.iso3 for link in row.country_links})) or ("",),
+    }
+    if table == "job_postings":
+        values["org"] = (_key(row.org),)
+        values["deadline"] = (row.deadline.strftime("%Y-%m") if row.deadline else "",)
+    return values
+
+
+class FacetDelta:
+    """Accumulateur de deltas de facettes appliqué en fin de lot."""
+
+    def __init__(self, table: str):
+        self.table = table
+        self._acc: Counter = Counter()
+
+    def add(self, snap: Optional[Dict[str, tuple]], sign: int = 1) -> None:
+        if snap is None:
+            return
+        for dim, values in snap.items():
+            for value in values:
+                self._acc[(dim, value, "", "")] += sign
+                for given, given_values in snap.items():
+                    if given == dim:
+                        continue
+                    for given_value in given_values:
+                        self._acc[(dim, value, given, given_value)] += sign
+
+    def remove(self, snap: Optional[Dict[str, tuple]]) -> None:
+        self.add(snap, -1)
+
+    def apply(self, db: Session) -> None:
+        """Répercute les deltas dans facet_counts (sans commit)."""
+        touched = False
+        for (dim, value, given, given_value), count in self._acc.items():
+            if not count:
+                continue
+            touched = True
+            where = (
+                FacetCount.table_name == self.table, FacetCount.dimension == dim, FacetCount.value == value,
+                FacetCount.given_dimension == given, FacetCount.given_value == given_value,
+            )
+            res = db.execute(update(FacetCount).where(*where).values(count=FacetCount.count + count))
+            if res.rowcount == 0:
+                db.execute(insert(FacetCount).values(
+                    table_name=self.table, dimension=dim, value=value,
+                    given_dimension=given, given_value=given_value, count=count,
+                ))
+        if touched:
+            db.execute(delete(FacetCount).where(FacetCount.table_name == self.table, FacetCount.count <= 0))
+        self._acc.clear()
+
+
+def rebuild(db: Session, table: str, chunk: int = 1000) -> None:
+    """Recalcule entièrement les facettes d'une table (rattrapage, après migration)."""
+    model = MODELS[table]
+    db.execute(delete(FacetCount).where(FacetCount.table_name == table))
+    delta = FacetDelta(table)
+    ids = [r.id for r in db.query(model.id)]
+    for start in range(0, len(ids), chunk):
+        rows = (
+            db.query(model).options(selectinload(model.country_links))
+            .filter(model.id.in_(ids[start:start + chunk])).all()
+        )
+        for row in rows:
+            delta.add(snapshot(table, row))
+        db.expunge_all()
+    delta.apply(db)
+    bump_version(db, table)
+    db.commit()
+
+
+def counts(db: Session, table: str, given: Optional[Tuple[str, str]] = None, top: int = 20) -> Dict[str, list]:
+    """Top-N valeurs par dimension, globalement ou sachant un filtre (dimension, valeur)."""
+    given_dim, given_value = given or ("", "")
+    out: Dict[str, list] = {}
+    for dim in DIMENSIONS[table]:
+        if dim == given_dim:
+            continue
+        rows = (
+            db.query(FacetCount.value, FacetCount.count)
+            .filter(
+                FacetCount.table_name == table,
+                FacetCount.given_dimension == given_dim,
+                FacetCount.given_value == given_value,
+                FacetCount.dimension == dim,
+            )
+            .order_by(FacetCount.count.desc(), FacetCount.value)
+            .limit(top)
+            .all()
+        )
+        out[dim] = [{"value": r.value or None, "count": int(r.count)} for r in rows]
+    return out
+
+
+def _month(db: Session, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def live_counts(db: Session, table: str, filters: Dict[str, str], q: Optional[str] = None,
+                top: int = 20) -> Dict[str, list]:
+    """Facettes calculées à la volée (GROUP BY) pour les combinaisons de filtres non précalculées."""
+    model = MODELS[table]
+    link = CrisisCountry if table == "crises" else JobCountry
+    link_fk = link.crisis_id if table == "crises" else link.job_id
+    columns = {"source": model.source, "org": getattr(model, "org", None)}
+    if table == "job_postings":
+        columns["deadline"] = _month(db, model.deadline)
+
+    ids = select(model.id).where(dedup.canonical_only(model))
+    for dim, value in filters.items():
+        if dim == "country":
+            ids = ids.where(model.id.in_(select(link_fk).where(link.iso3 == value)))
+        elif value:
+            ids = ids.where(columns[dim] == value)
+        else:
+            ids = ids.where(columns[dim].is_(None))
+    if q:
+        ids = ids.where(model.title.ilike(f"%{q}%"))
+
+    out: Dict[str, list] = {}
+    for dim in DIMENSIONS[table]:
+        if dim in filters:
+            continue
+        if dim == "country":
+            col, base = link.iso3, db.query(link.iso3, func.count()).filter(link_fk.in_(ids))
+        else:
+            col = columns[dim]
+            base = db.query(col, func.count()).filter(model.id.in_(ids))
+        rows = base.group_by(col).order_by(func.count().desc(), col).limit(top).all()
+        out[dim] = [{"value": value or None, "count": int(count)} for value, count in rows]
+    return out
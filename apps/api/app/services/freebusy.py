@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Occupation de l'agenda : index d'intervalles, conflits et créneaux libres.
+
+Les occurrences planifiées (séries développées, voir app.services.recurrence)
+sur l'horizon [hier, aujourd'hui + FREEBUSY_HORIZON_DAYS] sont rangées dans un
+arbre d'intervalles statique : tableau trié par début, chaque nœud de l'arbre
+implicite portant la fin maximale de son sous-arbre. Une recherche de
+recouvrement coûte O(log n + k).
+
+L'index est construit une fois par calendrier (catégorie, ou tout l'agenda) et
+par version de la table `agenda_events` (compteur de app.services.http_cache) :
+toute écriture de l'agenda le rend obsolète, sans invalidation explicite. Une
+fenêtre hors horizon est servie par un index construit à la demande.
+
+L'arbre ne sert qu'aux lectures de /freebusy. La détection de conflits, appelée
+à chaque écriture, ne le reconstruit pas : chaque occurrence de l'événement est
+confrontée à une lecture bornée à sa fenêtre (index sur `start_datetime`,
+`recurrence_until` et `agenda_occurrences.occurrence_start`).
+"""
+import threading
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import AgendaEvent
+from app.services import recurrence
+from app.services.http_cache import current_versions
+
+AGENDA_VERSION = "agenda_events"  # compteur incrémenté par app.routers.agenda
+DEFAULT_DURATION = timedelta(minutes=30)  # événement sans heure de fin
+MAX_SPAN = timedelta(days=7)              # durée max. d'un événement débutant avant la fenêtre
+MAX_INDEXES = 16
+
+Interval = Tuple[datetime, datetime, uuid.UUID, str]  # (début, fin, event_id, titre)
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[tuple, IntervalIndex]" = OrderedDict()
+
+
+class IntervalIndex:
+    """Arbre d'intervalles statique [début, fin[ (tableau trié + fin max. par sous-arbre)."""
+
+    def __init__(self, items: List[Interval], window: Tuple[datetime, datetime]):
+        self.window = window
+        self._items = sorted(items, key=lambda i: (i[0], i[1]))
+        self._starts = [i[0] for i in self._items]
+        self._max_end: List[Optional[datetime]] = [None] * len(self._items)
+        self._build(0, len(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _build(self, lo: int, hi: int) -> Optional[datetime]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        top = self._items[mid][1]
+        for sub in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if sub is not None and sub > top:
+                top = sub
+        self._max_end[mid] = top
+        return top
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        """Intervalles qui recouvrent [start, end[, triés par début."""
+        out: List[Interval] = []
+        self._collect(0, len(self._items), bisect_left(self._starts, end), start, out)
+        return out
+
+    def _collect(self, lo: int, hi: int, limit: int, start: datetime, out: list) -> None:
+        # seuls les indices < limit commencent avant la fin de la fenêtre
+        if lo >= hi or lo >= limit:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._collect(lo, mid, limit, start, out)
+        if mid < limit:
+            if self._items[mid][1] > start:
+                out.append(self._items[mid])
+            self._collect(mid + 1, hi, limit, start, out)
+
+
+def span(event: AgendaEvent, start: datetime) -> Tuple[datetime, datetime]:
+    """Intervalle occupé par l'occurrence qui débute à `start`."""
+    if event.is_all_day:
+        day = datetime.combine(start.date(), datetime.min.time())
+        return day, day + timedelta(days=1)
+    end = recurrence.occurrence_end(event, start)
+    return start, end if end and end > start else start + DEFAULT_DURATION
+
+
+def _intervals(db: Session, category: Optional[str], window_start: datetime,
+               window_end: datetime) -> List[Interval]:
+    query = db.query(AgendaEvent).filter(AgendaEvent.status == "scheduled")
+    if category:
+        query = query.filter(AgendaEvent.category == category)
+    items = []
+    for event, start in recurrence.occurrences(db, query, window_start - MAX_SPAN, window_end):
+        begin, end = span(event, start)
+        if end > window_start:
+            items.append((begin, end, event.id, event.title))
+    return items
+
+
+def _horizon() -> Tuple[datetime, datetime]:
+    today = datetime.combine(date.today(), datetime.min.time())
+    return today - timedelta(days=1), today + timedelta(days=settings.FREEBUSY_HORIZON_DAYS)
+
+
+def get_index(db: Session, category: Optional[str] = None, window: Optional[Tuple[datetime, datetime]] = None
+              ) -> IntervalIndex:
+    """Index couvrant `window` (par défaut l'horizon), en cache tant que l'agenda ne change pas."""
+    horizon = _horizon()
+    if window is not None and not (horizon[0] <= window[0] and window[1] <= horizon[1]):
+        return IntervalIndex(_intervals(db, category, *window), window)
+    key = (category or "", current_versions(db, (AGENDA_VERSION,)), horizon)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = IntervalIndex(_intervals(db, category, *horizon), horizon)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _overlapping(db: Session, begin: datetime, end: datetime) -> List[Interval]:
+    """Occurrences planifiées qui recouvrent [begin, end[, lues en base sur cette seule fenêtre."""
+    # un événement « journée entière » occupe sa journée dès minuit, même s'il débute plus tard
+    items = _intervals(db, None, begin, end + timedelta(days=1))
+    return sorted((i for i in items if i[0] < end), key=lambda i: (i[0], i[1]))
+
+
+def conflicts(db: Session, event: AgendaEvent, limit: int = 20) -> List[dict]:
+    """Occurrences planifiées qui chevauchent `event` (toutes ses occurrences sur l'horizon)."""
+    if event.status not in (None, "scheduled"):
+        return []
+    start = event.start_datetime.replace(tzinfo=None)
+    if event.is_recurring:
+        starts: Iterator[datetime] = recurrence.expand(event, *_horizon())
+    else:
+        starts = iter([start])
+    found, seen = [], set()
+    for occurrence in starts:
+        begin, end = span(event, occurrence)
+        for other_start, other_end, other_id, title in _overlapping(db, begin, end):
+            if other_id == event.id or (other_id, other_start) in seen:
+                continue
+            seen.add((other_id, other_start))
+            found.append({
+                "event_id": other_id, "title": title,
+                "start_datetime": other_start, "end_datetime": other_end,
+                "occurrence_start": occurrence,
+            })
+            if len(found) >= limit:
+                return found
+    return found
+
+
+def busy_blocks(index: IntervalIndex, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Plages occupées fusionnées, bornées à [start, end[."""
+    blocks: List[list] = []
+    for begin, finish, _, _ in index.overlapping(start, end):
+        begin, finish = max(begin, start), min(finish, end)
+        if blocks and begin <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], finish)
+        else:
+            blocks.append([begin, finish])
+    return [(b, e) for b, e in blocks]
+
+
+def free_slots(blocks: List[Tuple[datetime, datetime]], start: datetime, end: datetime,
+               duration: timedelta, limit: int) -> List[Tuple[datetime, datetime]]:
+    """Premiers créneaux libres d'au moins `duration` entre les plages occupées."""
+    slots = []
+    cursor = start
+    for begin, finish in blocks + [(end, end)]:
+        if begin - cursor >= duration:
+            slots.append((cursor, begin))
+            if len(slots) >= limit:
+                break
+        cursor = max(cursor, finish)
+    return slots
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Agrégats de financement (FTS) par année / pays / cluster / donateur.
+
+Les totaux vivent dans `funding_rollups` et sont maintenus de façon
+incrémentale à l'ingestion : chaque insertion ou modification d'un
+FundingRecord produit un delta (-ancienne valeur, +nouvelle valeur) appliqué
+dans la même transaction. Les lectures ne touchent donc jamais la table des flux.
+"""
+from collections import defaultdict
+from typing import List, Optional
+
+from sqlalchemy import func, update, delete, insert
+from sqlalchemy.orm import Session
+
+from app.models import FundingRecord, FundingRollup
+from app.services.http_cache import bump_version
+
+DIMENSIONS = ("year", "country", "cluster", "donor")
+
+
+def _key(value) -> str:
+    return "" if value is None else str(value)[:255]
+
+
+class RollupDelta:
+    """Accumulateur de deltas appliqué en fin de lot."""
+
+    def __init__(self):
+        self._acc = defaultdict(lambda: [0.0, 0])
+
+    @staticmethod
+    def snapshot(row: FundingRecord) -> tuple:
+        return (row.year, row.country, row.cluster, row.donor, row.amount)
+
+    def add(self, snap: tuple, sign: int = 1) -> None:
+        year, country, cluster, donor, amount = snap
+        values = {"year": year, "country": country, "cluster": cluster, "donor": donor}
+        for dim in DIMENSIONS:
+            acc = self._acc[(dim, _key(values[dim]), year or 0)]
+            acc[0] += sign * (amount or 0.0)
+            acc[1] += sign
+
+    def remove(self, snap: tuple) -> None:
+        self.add(snap, -1)
+
+    def apply(self, db: Session) -> None:
+        """Répercute les deltas dans funding_rollups (sans commit)."""
+        touched = False
+        for (dim, key, year), (amount, count) in self._acc.items():
+            if not count and not amount:
+                continue
+            touched = True
+            res = db.execute(
+                update(FundingRollup)
+                .where(FundingRollup.dimension == dim, FundingRollup.key == key, FundingRollup.year == year)
+                .values(
+                    total_amount=FundingRollup.total_amount + amount,
+                    flow_count=FundingRollup.flow_count + count,
+                )
+            )
+            if res.rowcount == 0:
+                db.execute(insert(FundingRollup).values(
+                    dimension=dim, key=key, year=year, total_amount=amount, flow_count=count,
+                ))
+        if touched:
+            db.execute(delete(FundingRollup).where(FundingRollup.flow_count <= 0))
+        self._acc.clear()
+
+
+def rebuild(db: Session) -> None:
+    """Recalcule entièrement les agrégats depuis funding_records (rattrapage)."""
+    db.execute(delete(FundingRollup))
+    year = func.coalesce(FundingRecord.year, 0)
+    for dim in DIMENSIONS:
+        # clé brute (année NULL -> ""), comme les deltas de RollupDelta; `year` coalescé ne sert qu'à la colonne year
+        col = getattr(FundingRecord, dim)
+        rows = db.query(
+            col, year, func.coalesce(func.sum(FundingRecord.amount), 0.0), func.count()
+        ).group_by(col, year).all()
+        for value, y, total, count in rows:
+            db.add(FundingRollup(dimension=dim, key=_key(value), year=y, total_amount=total, flow_count=count))
+    bump_version(db, "funding_records")
+    db.commit()
+
+
+def aggregate(db: Session, group_by: str, year: Optional[int] = None, top: int = 20) -> List[dict]:
+    """Top-N des totaux pour une dimension, sur une année ou toutes années confondues."""
+    total = func.sum(FundingRollup.total_amount).label("total_amount")
+    count = func.sum(FundingRollup.flow_count).label("flow_count")
+    q = db.query(FundingRollup.key, total, count).filter(FundingRollup.dimension == group_by)
+    if year is not None:
+        q = q.filter(FundingRollup.year == year)
+    rows = q.group_by(FundingRollup.key).order_by(total.desc()).limit(top).all()
+    def label(key: str):
+        if not key:
+            return None
+        return int(key) if group_by == "year" else key
+
+    return [
+        {group_by: label(r.key), "total_amount": r.total_amount, "flow_count": int(r.flow_count)}
+        for r in rows
+    ]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Cache HTTP des lectures : ETag fort + 304 + cache de réponses en mémoire.
+
+Chaque table lue a un compteur dans `data_versions`, incrémenté par les
+écritures (ingestion, routeur agenda) via `bump_version`. L'ETag d'une réponse
+dérive des versions des tables lues, du chemin et des paramètres de requête :
+tant qu'aucune écriture n'a eu lieu, un client qui renvoie If-None-Match reçoit
+un 304, et les autres reçoivent le corps déjà sérialisé depuis le cache.
+
+Les versions sont elles-mêmes mémorisées HTTP_CACHE_VERSION_TTL secondes pour
+que le polling ne touche pas la base; une écriture locale les invalide dès le
+commit.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy import event, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DataVersion
+
+_lock = threading.Lock()
+_versions: dict = {}  # name -> (version, fetched_at)
+_responses: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def bump_version(db: Session, *names: str) -> None:
+    """Incrémente le compteur des tables modifiées, dans la transaction courante."""
+    for name in names:
+        stmt = update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+        if db.execute(stmt).rowcount == 0:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(DataVersion).values(name=name, version=1))
+            except IntegrityError:
+                db.execute(stmt)
+    db.info.setdefault("bumped_versions", set()).update(names)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_bumped_versions(session: Session) -> None:
+    names = session.info.pop("bumped_versions", None)
+    if names:
+        with _lock:
+            for name in names:
+                _versions.pop(name, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumped_versions(session: Session) -> None:
+    session.info.pop("bumped_versions", None)
+
+
+def current_versions(db: Session, names: Iterable[str]) -> tuple:
+    names = tuple(names)
+    now = time.monotonic()
+    ttl = settings.HTTP_CACHE_VERSION_TTL
+    with _lock:
+        known = {n: v for n, (v, at) in _versions.items() if n in names and now - at < ttl}
+    missing = [n for n in names if n not in known]
+    if missing:
+        rows = db.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(missing)).all()
+        fetched = {n: 0 for n in missing}
+        fetched.update({r.name: r.version for r in rows})
+        with _lock:
+            for n, v in fetched.items():
+                _versions[n] = (v, now)
+        known.update(fetched)
+    return tuple(known[n] for n in names)
+
+
+def _etag(request: Request, tables: tuple, versions: tuple, extra: str) -> str:
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{params}|{list(zip(tables, versions))}|{extra}"
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+
+def conditional_response(
+    request: Request,
+    db: Session,
+    tables: Iterable[str],
+    build: Callable[[], object],
+    extra: Optional[str] = "",
+) -> Response:
+    """Répond 304 / depuis le cache / en appelant `build`, selon la version des tables lues.
+
+    `extra` complète la clé pour les réponses qui dépendent aussi de l'heure
+    (ex. événements du jour).
+    """
+    tables = tuple(tables)
+    etag = _etag(request, tables, current_versions(db, tables), extra or "")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    with _lock:
+        body = _responses.get(etag)
+        if body is not None:
+            _responses.move_to_end(etag)
+    if body is None:
+        body = json.dumps(jsonable_encoder(build()), ensure_ascii=False).encode("utf-8")
+        with _lock:
+            _responses[etag] = body
+            while len(_responses) > max(1, settings.HTTP_CACHE_MAX_ENTRIES):
+                _responses.popitem(last=False)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+Import / export iCalendar (RFC 5545) de l'agenda, en flux.
+
+Import : le fichier est lu ligne à ligne (dépliage des lignes de continuation)
+et chaque VEVENT devient un dictionnaire de colonnes; les événements sont
+écrits par lots de IMPORT_BATCH_SIZE, un INSERT / UPDATE groupé et un commit
+par lot. L'UID iCalendar est conservé dans `ical_uid` : réimporter le même
+calendrier met à jour les événements au lieu de les dupliquer.
+
+Non pris en charge : les exceptions de série (RECURRENCE-ID, ignorées et
+comptées), EXDATE / RDATE, et les TZID non IANA (heure murale conservée).
+
+Export : lecture par lots sur curseur serveur (app.services.export.batches),
+un VEVENT par ligne, texte généré au fil de l'eau.
+"""
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from zoneinfo import ZoneInfo
+
+from app.models import AgendaEvent, AgendaOccurrence, uuid7
+from app.services import recurrence
+from app.services.http_cache import bump_version
+
+AGENDA_VERSION = "agenda_events"  # compteur incrémenté par app.routers.agenda
+IMPORT_BATCH_SIZE = 500
+MAX_ERRORS = 20
+PRODID = "-//romain//agenda//FR"
+
+_FREQ = {"DAILY": "daily", "WEEKLY": "weekly", "MONTHLY": "monthly", "YEARLY": "yearly"}
+_DURATION = re.compile(r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+# --- lecture ---
+
+def unfold(lines: Iterable[bytes]) -> Iterator[str]:
+    """Lignes logiques : les lignes commençant par un espace ou une tabulation prolongent la précédente."""
+    current = None
+    for raw in lines:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split(line: str) -> Tuple[str, dict, str]:
+    """'DTSTART;TZID=Europe/Paris:2026...' -> ('DTSTART', {'TZID': 'Europe/Paris'}, '2026...')."""
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            quoted = not quoted
+        elif ch == ":" and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+    name, *params = head.split(";")
+    return name.upper(), {k.upper(): v.strip('"') for k, _, v in (p.partition("=") for p in params)}, value
+
+
+def parse_events(lines: Iterable[bytes]) -> Iterator[dict]:
+    """Propriétés de chaque VEVENT ({nom: (paramètres, valeur)}); le TRIGGER du premier VALARM est conservé."""
+    props = None
+    depth = 0  # composants imbriqués dans le VEVENT (VALARM)
+    for line in unfold(lines):
+        name, params, value = _split(line)
+        if name == "BEGIN":
+            if value.upper() == "VEVENT":
+                props, depth = {}, 0
+            elif props is not None:
+                depth += 1
+            continue
+        if name == "END":
+            if value.upper() == "VEVENT" and props is not None:
+                yield props
+                props = None
+            elif props is not None:
+                depth -= 1
+            continue
+        if props is None:
+            continue
+        if depth:
+            if name == "TRIGGER":
+                props.setdefault("X-ALARM-TRIGGER", (params, value))
+        else:
+            props.setdefault(name, (params, value))
+
+
+def _text(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _datetime(params: dict, value: str) -> Tuple[datetime, bool]:
+    """(heure murale locale sans fuseau, journée entière)."""
+    value = value.strip()
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d"), True
+    dt = datetime.strptime(value.rstrip("Zz")[:15], "%Y%m%dT%H%M%S")
+    if value[-1:] in ("Z", "z"):
+        return dt.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None), False
+    tzid = params.get("TZID")
+    if tzid:
+        try:
+            dt = dt.replace(tzinfo=ZoneInfo(tzid)).astimezone().replace(tzinfo=None)
+        except (KeyError, ValueError):
+            pass  # TZID Windows / propriétaire : heure murale
+    return dt, False
+
+
+def _duration(value: str) -> timedelta:
+    m = _DURATION.match(value.strip().upper())
+    if not m:
+        raise ValueError(f"DURATION invalide : {value}")
+    sign, weeks, days, hours, minutes, seconds = m.groups()
+    delta = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                      minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == "-" else delta
+
+
+def _recurrence(value: str, start: datetime) -> Tuple[str, Optional[datetime]]:
+    """(motif, fin de série) : une règle simple devient 'daily'...'yearly', le reste reste une RRULE."""
+    parts = dict(p.partition("=")[::2] for p in value.strip().upper().split(";") if p)
+    until = _datetime({}, parts["UNTIL"])[0] if "UNTIL" in parts else None
+    if set(parts) <= {"FREQ", "UNTIL", "INTERVAL"} and parts.get("INTERVAL", "1") == "1" and parts.get("FREQ") in _FREQ:
+        return _FREQ[parts["FREQ"]], until
+    pattern = value.strip()
+    if len(pattern) > 255:
+        raise ValueError("RRULE trop longue")
+    try:
+        recurrence.validate(start, pattern)
+    except recurrence.InvalidPattern as e:
+        raise ValueError(str(e))
+    return pattern, until
+
+
+def _priority(value: Optional[str]) -> str:
+    try:
+        level = int(value or 0)
+    except ValueError:
+        return "medium"
+    if level == 1:
+        return "urgent"
+    if 2 <= level <= 4:
+        return "high"
+    if level >= 6:
+        return "low"
+    return "medium"
+
+
+def event_values(props: dict) -> Optional[dict]:
+    """Colonnes agenda_events d'un VEVENT; None pour une exception de série. ValueError si invalide."""
+    if "RECURRENCE-ID" in props:
+        return None
+    if "DTSTART" not in props:
+        raise ValueError("DTSTART manquant")
+    start, all_day = _datetime(*props["DTSTART"])
+    end = None
+    if "DTEND" in props:
+        end = _datetime(*props["DTEND"])[0]
+    elif "DURATION" in props:
+        end = start + _duration(props["DURATION"][1])
+    if end is not None and end <= start:
+        end = None
+    pattern, until = None, None
+    if "RRULE" in props:
+        pattern, until = _recurrence(props["RRULE"][1], start)
+    reminder = 15
+    if "X-ALARM-TRIGGER" in props:
+        try:
+            reminder = max(0, int(-_duration(props["X-ALARM-TRIGGER"][1]).total_seconds() // 60))
+        except ValueError:
+            pass  # TRIGGER absolu (VALUE=DATE-TIME) : rappel par défaut
+    uid = props.get("UID", ({}, ""))[1].strip()
+    if not uid:
+        # pas d'UID : empreinte stable pour rester idempotent à la réimportation
+        uid = hashlib.sha1(repr(sorted((k, v[1]) for k, v in props.items())).encode("utf-8")).hexdigest()
+    category = _text(props["CATEGORIES"][1]).split(",")[0].strip() if "CATEGORIES" in props else None
+    status = "cancelled" if props.get("STATUS", ({}, ""))[1].strip().upper() == "CANCELLED" else "scheduled"
+    return {
+        "ical_uid": uid[:255],
+        "title": (_text(props.get("SUMMARY", ({}, ""))[1]).strip() or "(sans titre)")[:255],
+        "description": _text(props["DESCRIPTION"][1]) if "DESCRIPTION" in props else None,
+        "start_datetime": start,
+        "end_datetime": end,
+        "is_all_day": all_day,
+        "location": _text(props["LOCATION"][1])[:255] if "LOCATION" in props else None,
+        "reminder_minutes": reminder,
+        "is_recurring": pattern is not None,
+        "recurrence_pattern": pattern,
+        "recurrence_end_date": until,
+        "priority": _priority(props.get("PRIORITY", ({}, None))[1]),
+        "category": category[:100] if category else None,
+        "status": status,
+    }
+
+
+def _flush(db: Session, batch: dict, stats: dict) -> None:
+    existing = {
+        r.ical_uid: r for r in db.query(AgendaEvent.ical_uid, AgendaEvent.id, AgendaEvent.start_datetime)
+        .filter(AgendaEvent.ical_uid.in_(list(batch)))
+    }
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for uid, values in batch.items():
+        values.update(
+            recurrence_until=recurrence.series_until(AgendaEvent(**values)),
+            occurrences_from=None, occurrences_until=None, updated_at=now,
+        )
+        row = existing.get(uid)
+        if row is None:
+            inserts.append({**values, "id": uuid7(), "created_at": now,
+                            "is_reminder_sent": False, "reminder_sent_until": None})
+            continue
+        item = {**values, "id": row.id}
+        if row.start_datetime != values["start_datetime"]:
+            # événement déplacé : le rappel repart, sauf pour les occurrences déjà commencées
+            item.update(is_reminder_sent=False, reminder_sent_until=datetime.now())
+        updates.append(item)
+    if inserts:
+        db.execute(insert(AgendaEvent), inserts)
+    if updates:
+        # séries réimportées : les occurrences matérialisées seront recalculées à la volée
+        db.execute(delete(AgendaOccurrence).where(AgendaOccurrence.event_id.in_([u["id"] for u in updates])))
+        db.execute(update(AgendaEvent), updates)
+    bump_version(db, AGENDA_VERSION)
+    db.commit()
+    stats["created"] += len(inserts)
+    stats["updated"] += len(updates)
+
+
+def import_events(db: Session, lines: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Importe les VEVENT d'un flux .ics par lots; retourne les compteurs et les premières erreurs."""
+    stats = {"created": 0, "updated": 0, "skipped": 0, "errors": []}
+    batch: dict = {}  # ical_uid -> colonnes (un UID répété dans le lot : la dernière version l'emporte)
+    for n, props in enumerate(parse_events(lines), 1):
+        try:
+            values = event_values(props)
+        except (ValueError, KeyError) as e:
+            stats["skipped"] += 1
+            if len(stats["errors"]) < MAX_ERRORS:
+                stats["errors"].append(f"VEVENT {n} : {e}")
+            continue
+        if values is None:
+            stats["skipped"] += 1
+            continue
+        batch[values["ical_uid"]] = values
+        if len(batch) >= batch_size:
+            _flush(db, batch, stats)
+            batch = {}
+    if batch:
+        _flush(db, batch, stats)
+    return stats
+
+
+# --- écriture ---
+
+EXPORT_COLUMNS = (
+    AgendaEvent.id, AgendaEvent.ical_uid, AgendaEvent.title, AgendaEvent.description,
+    AgendaEvent.start_datetime, AgendaEvent.end_datetime, AgendaEvent.is_all_day, AgendaEvent.location,
+    AgendaEvent.reminder_minutes, AgendaEvent.is_recurring, AgendaEvent.recurrence_pattern,
+    AgendaEvent.recurrence_end_date, AgendaEvent.priority, AgendaEvent.category, AgendaEvent.status,
+    AgendaEvent.updated_at,
+)
+_PRIORITY = {"urgent": 1, "high": 3, "medium": 5, "low": 9}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Plie une ligne à 75 octets (RFC 5545 §3.1) sans couper un caractère UTF-8."""
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    chunks, current, size = [], "", 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > 75:
+            chunks.append(current)
+            current, size = " ", 1
+        current += ch
+        size += n
+    chunks.append(current)
+    return "\r\n".join(chunks) + "\r\n"
+
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _rrule(row) -> Optional[str]:
+    pattern = row.recurrence_pattern
+    if not row.is_recurring or not pattern:
+        return None
+    simple = {v: k for k, v in _FREQ.items()}.get(pattern.lower())
+    if simple is None:
+        # RRULE stockée telle quelle (éventuellement précédée de DTSTART / RRULE:)
+        rule = next((l for l in pattern.splitlines() if not l.upper().startswith("DTSTART")), pattern)
+        return rule.split(":", 1)[1] if rule.upper().startswith("RRULE:") else rule
+    rule = f"FREQ={simple}"
+    if row.recurrence_end_date:
+        rule += f";UNTIL={_fmt(row.recurrence_end_date)}"
+    return rule
+
+
+def vevent(row) -> str:
+    lines = ["BEGIN:VEVENT", f"UID:{row.ical_uid or f'{row.id}@agenda'}"]
+    if row.updated_at:
+        lines.append(f"DTSTAMP:{_fmt(row.updated_at)}Z")
+    if row.is_all_day:
+        end = row.end_datetime if row.end_datetime and row.end_datetime.date() > row.start_datetime.date() \
+            else row.start_datetime + timedelta(days=1)
+        lines += [f"DTSTART;VALUE=DATE:{row.start_datetime:%Y%m%d}", f"DTEND;VALUE=DATE:{end:%Y%m%d}"]
+    else:
+        # heure murale sans fuseau (« floating »), comme en base
+        lines.append(f"DTSTART:{_fmt(row.start_datetime)}")
+        if row.end_datetime:
+            lines.append(f"DTEND:{_fmt(row.end_datetime)}")
+    lines.append(f"SUMMARY:{_escape(row.title or '')}")
+    if row.description:
+        lines.append(f"DESCRIPTION:{_escape(row.description)}")
+    if row.location:
+        lines.append(f"LOCATION:{_escape(row.location)}")
+    if row.category:
+        lines.append(f"CATEGORIES:{_escape(row.category)}")
+    lines.append(f"PRIORITY:{_PRIORITY.get(row.priority, 5)}")
+    lines.append("STATUS:CANCELLED" if row.status == "cancelled" else "STATUS:CONFIRMED")
+    rule = _rrule(row)
+    if rule:
+        lines.append(f"RRULE:{rule}")
+    if row.reminder_minutes:
+        lines += ["BEGIN:VALARM", "ACTION:DISPLAY", f"DESCRIPTION:{_escape(row.title or '')}",
+                  f"TRIGGER:-PT{int(row.reminder_minutes)}M", "END:VALARM"]
+    lines.append("END:VEVENT")
+    return "".join(_fold(l) for l in lines)
+
+
+def stream(batches: Iterable[list]) -> Iterator[bytes]:
+    """Flux .ics : en-tête, un bloc de VEVENT par lot de lignes, pied."""
+    yield f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n".encode("utf-8")
+    for batch in batches:
+        yield "".join(vevent(row) for row in batch).encode("utf-8")
+    yield b"END:VCALENDAR\r\n"
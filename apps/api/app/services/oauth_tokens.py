@@ -2,7 +2,7 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from cryptography.fernet import Fernet, InvalidToken
 import json
 
@@ -83,7 +83,7 @@ def save_oauth_token(db: Session, provider: str, subject: str | None, token: dic
 
 
 def get_oauth_token(db: Session, provider: str, user_id=None) -> dict | None:
-    q = db.query(OAuthToken).filter(OAuthToken.provider == provider)
+    q = db.query(OAuthToken).options(undefer(OAuthToken.raw)).filter(OAuthToken.provider == provider)
     if user_id:
         q = q.filter(OAuthToken.user_id == user_id)
     row = q.order_by(OAuthToken.created_at.desc()).first()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Télémétrie des pools de connexions (moteur sync et moteur async).
+
+Pour chaque pool :
+- jauges lues à la demande : connexions prises, au repos, en débordement;
+- histogramme de l'attente d'une connexion (temps passé dans `_do_get`,
+  classe de pool dérivée par `timed_pool`) et nombre de timeouts
+  (« QueuePool limit ... reached »);
+- histogramme de la durée de détention d'une connexion (checkout -> checkin)
+  par route (« module.fonction » du endpoint); hors requête (jobs, flux
+  d'export terminé), la route est « background ».
+
+La route est connue via une variable de contexte positionnée par le
+middleware de app.main (`bind_request`) : elle suit la requête dans le pool de
+threads comme dans les greenlets de `run_sync`.
+
+Exposé par GET /api/metrics/db-pool.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # secondes
+MAX_ROUTES = 200  # au-delà, les routes supplémentaires sont agrégées sous « other »
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("pool_metrics_scope", default=None)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (même forme qu'un histogramme Prometheus)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            cumulative += n
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6), "buckets": buckets}
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self._lock = threading.Lock()
+        self.wait = Histogram()
+        self.timeouts = 0
+        self.checkout: Dict[str, Histogram] = {}
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait.observe(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def observe_checkout(self, route: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.checkout.get(route)
+            if hist is None:
+                if len(self.checkout) >= MAX_ROUTES:
+                    route = "other"
+                hist = self.checkout.setdefault(route, Histogram())
+            hist.observe(seconds)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        out = {"pool": type(pool).__name__}
+        # jauges des pools à file (QueuePool); absentes pour StaticPool / NullPool
+        for key, attr in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"),
+                          ("overflow", "overflow")):
+            fn = getattr(pool, attr, None)
+            if fn is not None:
+                out[key] = fn()
+        if "overflow" in out:
+            out["overflow"] = max(0, out["overflow"])  # QueuePool compte négativement les places libres du socle
+        for key, attr in (("max_overflow", "_max_overflow"), ("timeout", "_timeout"), ("recycle", "_recycle"),
+                          ("pre_ping", "_pre_ping")):
+            if hasattr(pool, attr):
+                out[key] = getattr(pool, attr)
+        with self._lock:
+            out["wait"] = self.wait.to_dict()
+            out["timeouts"] = self.timeouts
+            out["checkout_by_route"] = {route: h.to_dict() for route, h in sorted(self.checkout.items())}
+        return out
+
+
+_registry: Dict[str, PoolMetrics] = {}
+
+
+def timed_pool(pool_class, metrics: PoolMetrics):
+    """Sous-classe de `pool_class` qui mesure l'attente d'une connexion.
+
+    La sous-classe survit aux `dispose()` (le pool est recréé via sa classe).
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = pool_class._do_get(self)
+        except PoolTimeoutError:
+            metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.observe_wait(time.perf_counter() - start)
+        return conn
+
+    return type(f"Timed{pool_class.__name__}", (pool_class,), {"_do_get": _do_get})
+
+
+def _current_route() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    # point d'entrée plutôt que gabarit de chemin : stable quel que soit le préfixe de montage
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    return f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}"
+
+
+def metrics_for(name: str) -> PoolMetrics:
+    return _registry.setdefault(name, PoolMetrics(name))
+
+
+def instrument(engine, metrics: PoolMetrics) -> None:
+    """Branche le suivi checkout/checkin sur le pool de `engine` (sync, ou `.sync_engine` d'un AsyncEngine)."""
+    metrics.engine = engine
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, record, proxy):
+        record.info["pool_checkout"] = (time.perf_counter(), _current_route())
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, record):
+        started = record.info.pop("pool_checkout", None)
+        if started is not None:
+            metrics.observe_checkout(started[1], time.perf_counter() - started[0])
+
+
+def bind_request(scope: dict):
+    """Associe les connexions prises ensuite à la requête `scope`; renvoie le jeton de `unbind_request`."""
+    return _request_scope.set(scope)
+
+
+def unbind_request(token) -> None:
+    _request_scope.reset(token)
+
+
+def snapshot() -> dict:
+    return {name: m.snapshot() for name, m in _registry.items() if m.engine is not None}
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Développement des événements récurrents de l'agenda.
+
+Un événement récurrent est une série : `start_datetime` est la première
+occurrence, `recurrence_pattern` la règle ('daily', 'weekly', 'monthly',
+'yearly' ou une RRULE RFC 5545, ex. 'FREQ=WEEKLY;BYDAY=MO,WE') et
+`recurrence_end_date` la borne optionnelle.
+
+Les occurrences ne sont jamais toutes générées : pour une fenêtre donnée on
+saute directement à la première occurrence utile (arithmétique sur les
+jours / mois pour les règles simples, `xafter` de dateutil pour les RRULE) et
+on s'arrête à la fin de la fenêtre. La colonne `recurrence_until` (dernière
+occurrence possible, NULL pour une série infinie) est calculée à l'écriture et
+indexée : seules les séries qui recouvrent la fenêtre sont lues.
+
+Option : avec AGENDA_MATERIALIZE_DAYS > 0, les occurrences des prochains jours
+sont aussi matérialisées dans `agenda_occurrences` (rafraîchies à chaque
+écriture et par `python -m app.jobs.materialize_occurrences`); une lecture
+couverte par cet horizon n'a plus rien à développer.
+"""
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_
+from sqlalchemy.orm import Query, Session
+
+from app.config import settings
+from app.models import AgendaEvent, AgendaOccurrence
+
+# dateutil en option : seules les règles RRULE en dépendent
+HAS_DATEUTIL = False
+try:
+    from dateutil.rrule import rrulestr  # type: ignore
+    HAS_DATEUTIL = True
+except Exception:
+    HAS_DATEUTIL = False
+
+SIMPLE_PATTERNS = {"daily": (1, 0), "weekly": (7, 0), "monthly": (0, 1), "yearly": (0, 12)}
+SERIES_HORIZON_DAYS = 366  # fenêtre sans fin : les séries ne sont pas développées au-delà
+
+
+class InvalidPattern(ValueError):
+    pass
+
+
+def _naive(dt: Optional[datetime]) -> Optional[datetime]:
+    # les colonnes sont sans fuseau : on compare en heure « murale »
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo else dt
+
+
+def _rrule(start: datetime, pattern: str):
+    if not HAS_DATEUTIL:
+        raise InvalidPattern("RRULE non supportée (python-dateutil non installé)")
+    text = pattern.strip()
+    if not text.upper().startswith(("RRULE:", "DTSTART", "FREQ=")):
+        raise InvalidPattern(f"Motif de récurrence inconnu : {pattern}")
+    try:
+        return rrulestr(text, dtstart=start, ignoretz=True)
+    except (ValueError, TypeError) as e:
+        raise InvalidPattern(f"RRULE invalide : {e}")
+
+
+def validate(start: datetime, pattern: Optional[str]) -> None:
+    """Lève InvalidPattern si le motif n'est ni un motif simple ni une RRULE valide."""
+    if not pattern:
+        raise InvalidPattern("Motif de récurrence manquant")
+    if pattern.lower() not in SIMPLE_PATTERNS:
+        _rrule(start, pattern)
+
+
+def series_until(event: AgendaEvent) -> Optional[datetime]:
+    """Dernier début d'occurrence possible de la série (None = série infinie)."""
+    start = _naive(event.start_datetime)
+    if not event.is_recurring or not event.recurrence_pattern:
+        return start
+    until = _naive(event.recurrence_end_date)
+    pattern = event.recurrence_pattern
+    if pattern.lower() not in SIMPLE_PATTERNS:
+        rule = _rrule(start, pattern)
+        if getattr(rule, "_until", None) or getattr(rule, "_count", None):
+            last = rule.before(until, inc=True) if until else rule[-1]
+            return last or start
+    return until
+
+
+def _add_months(start: datetime, months: int) -> Optional[datetime]:
+    """start + N mois, ou None si le jour n'existe pas (31 avril, 29 février...) : RFC 5545 saute ces mois."""
+    y, m = divmod(start.month - 1 + months, 12)
+    try:
+        return start.replace(year=start.year + y, month=m + 1)
+    except ValueError:
+        return None
+
+
+def expand(event: AgendaEvent, window_start: datetime, window_end: datetime) -> Iterator[datetime]:
+    """Débuts d'occurrence de `event` compris dans [window_start, window_end], dans l'ordre."""
+    start = _naive(event.start_datetime)
+    if not event.is_recurring or not event.recurrence_pattern:
+        if window_start <= start <= window_end:
+            yield start
+        return
+    until = _naive(event.recurrence_end_date)
+    end = min(window_end, until) if until else window_end
+    if end < start:
+        return
+    pattern = event.recurrence_pattern
+    simple = SIMPLE_PATTERNS.get(pattern.lower())
+
+    if simple is None:
+        try:
+            rule = _rrule(start, pattern)
+        except InvalidPattern:
+            return
+        for t in rule.xafter(max(window_start, start), inc=True):
+            if t > end:
+                return
+            yield t
+        return
+
+    days, months = simple
+    if days:
+        step = timedelta(days=days)
+        k = 0
+        if window_start > start:
+            k = -(-(window_start - start) // step)  # arrondi supérieur
+        t = start + k * step
+        while t <= end:
+            yield t
+            t += step
+        return
+
+    k = 0
+    if window_start > start:
+        k = max(0, ((window_start.year - start.year) * 12 + window_start.month - start.month) // months - 1)
+    while True:
+        t = _add_months(start, k * months)
+        k += 1
+        if t is None:
+            continue
+        if t > end:
+            return
+        if t >= window_start:
+            yield t
+
+
+def _duration(event: AgendaEvent) -> Optional[timedelta]:
+    if not event.end_datetime:
+        return None
+    return _naive(event.end_datetime) - _naive(event.start_datetime)
+
+
+def series_in_window(query: Query, window_start: datetime, window_end: datetime) -> Query:
+    """Séries récurrentes susceptibles d'avoir une occurrence dans la fenêtre (index recurrence_until)."""
+    return query.filter(
+        AgendaEvent.is_recurring.is_(True),
+        AgendaEvent.start_datetime <= window_end,
+        or_(AgendaEvent.recurrence_until.is_(None), AgendaEvent.recurrence_until >= window_start),
+    )
+
+
+def _tagged(event: AgendaEvent, starts: Iterator[datetime]) -> Iterator[tuple]:
+    for t in starts:
+        yield t, event
+
+
+def occurrences(
+    db: Session,
+    query: Query,
+    window_start: Optional[datetime],
+    window_end: Optional[datetime],
+    limit: Optional[int] = None,
+) -> List[Tuple[AgendaEvent, datetime]]:
+    """(événement, début d'occurrence) de `query` dans la fenêtre, triés par début.
+
+    `query` porte les filtres métier (statut, catégorie...). Une borne absente
+    ne filtre pas les événements simples; les séries sont alors développées à
+    partir d'aujourd'hui et sur SERIES_HORIZON_DAYS au plus.
+    """
+    single = query.filter(or_(AgendaEvent.is_recurring.is_(False), AgendaEvent.is_recurring.is_(None)))
+    if window_start is not None:
+        single = single.filter(AgendaEvent.start_datetime >= window_start)
+    if window_end is not None:
+        single = single.filter(AgendaEvent.start_datetime <= window_end)
+    single = single.order_by(AgendaEvent.start_datetime)
+    if limit:
+        single = single.limit(limit)
+    streams = [((e.start_datetime, e) for e in single)]
+
+    series_start = window_start or datetime.combine(date.today(), datetime.min.time())
+    series_end = window_end or series_start + timedelta(days=SERIES_HORIZON_DAYS)
+    series = series_in_window(query, series_start, series_end).all()
+    materialized = {
+        e.id: e for e in series
+        if e.occurrences_from is not None and e.occurrences_from <= series_start
+        and e.occurrences_until is not None and e.occurrences_until >= series_end
+    }
+    if materialized:
+        rows = (
+            db.query(AgendaOccurrence.event_id, AgendaOccurrence.occurrence_start)
+            .filter(
+                AgendaOccurrence.event_id.in_(list(materialized)),
+                AgendaOccurrence.occurrence_start >= series_start,
+                AgendaOccurrence.occurrence_start <= series_end,
+            )
+            .order_by(AgendaOccurrence.occurrence_start)
+        )
+        streams.append(((r.occurrence_start, materialized[r.event_id]) for r in rows))
+    for e in series:
+        if e.id not in materialized:
+            streams.append(_tagged(e, expand(e, series_start, series_end)))
+
+    merged = heapq.merge(*streams, key=lambda pair: pair[0])
+    return [(e, t) for t, e in islice(merged, limit)]
+
+
+def occurrence_end(event: AgendaEvent, occurrence_start: datetime) -> Optional[datetime]:
+    duration = _duration(event)
+    return occurrence_start + duration if duration is not None else None
+
+
+def refresh_series(db: Session, event: AgendaEvent) -> None:
+    """À appeler après chaque écriture : recalcule recurrence_until et, si activé, les occurrences matérialisées."""
+    event.recurrence_until = series_until(event)
+    days = settings.AGENDA_MATERIALIZE_DAYS
+    if event.id is None or days <= 0:
+        return
+    if event in db.new:
+        # sessions sans autoflush : la série doit exister en base avant ses occurrences (clé étrangère)
+        db.flush()
+    db.execute(delete(AgendaOccurrence).where(AgendaOccurrence.event_id == event.id))
+    event.occurrences_from = event.occurrences_until = None
+    if not event.is_recurring or event.status != "scheduled":
+        return
+    # horizon [aujourd'hui, aujourd'hui + N jours] : les fenêtres passées restent développées à la volée
+    today = datetime.combine(date.today(), datetime.min.time())
+    horizon = today + timedelta(days=days)
+    rows = [
+        {"event_id": event.id, "occurrence_start": t, "occurrence_end": occurrence_end(event, t)}
+        for t in expand(event, today, horizon)
+    ]
+    if rows:
+        db.execute(insert(AgendaOccurrence), rows)
+    event.occurrences_from, event.occurrences_until = today, horizon
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Profil SQLite pour les déploiements mono-nœud.
+
+À chaque nouvelle connexion (moteur sync comme async) :
+- journal WAL : les lectures ne bloquent plus derrière une écriture;
+- synchronous=NORMAL (sûr en WAL, un fsync par checkpoint et non par commit);
+- cache_size / mmap_size : pages chaudes en mémoire;
+- busy_timeout : une écriture concurrente attend au lieu d'échouer sur
+  « database is locked »;
+- foreign_keys : contraintes et ON DELETE CASCADE / SET NULL appliqués
+  (désactivés par défaut dans SQLite).
+
+Les transactions d'écriture démarrent en BEGIN IMMEDIATE (isolation_level du
+module sqlite3, émis avant le premier INSERT/UPDATE/DELETE) : le verrou
+d'écriture est pris d'emblée, sans promotion lecture -> écriture qui
+échouerait sur un instantané périmé.
+
+Écritures sérialisées (SQLITE_SERIALIZE_WRITES) : un seul écrivain par moteur
+dans le processus. Le verrou est pris avant la première instruction
+d'écriture d'une transaction et rendu au commit / rollback (ou au retour de la
+connexion au pool). Côté async c'est un asyncio.Lock attendu dans le greenlet
+de `run_sync` : la boucle d'événements n'est jamais bloquée. Les autres
+processus (jobs, scripts) restent arbitrés par busy_timeout.
+"""
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+
+from app.config import settings
+
+logger = logging.getLogger("app")
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+WRITER_KEY = "sqlite_writer"
+
+
+def connect_args() -> dict:
+    """Arguments de connexion sqlite3 du profil (à fusionner avec ceux du moteur)."""
+    return {"check_same_thread": False, "isolation_level": "IMMEDIATE",
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+
+
+def _set_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")  # négatif : en Kio
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    finally:
+        cursor.close()
+
+
+class _Writer:
+    """Verrou d'écrivain unique; `is_async` : asyncio.Lock attendu via le greenlet de run_sync."""
+
+    def __init__(self, is_async: bool):
+        self.is_async = is_async
+        self._lock = asyncio.Lock() if is_async else threading.Lock()
+
+    def acquire(self) -> bool:
+        timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        if not self.is_async:
+            return self._lock.acquire(timeout=timeout)
+        try:
+            await_only(asyncio.wait_for(self._lock.acquire(), timeout))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self) -> None:
+        self._lock.release()
+
+
+def apply(engine, is_async: bool = False) -> None:
+    """Installe le profil sur `engine` (sync, ou `.sync_engine` d'un AsyncEngine)."""
+    event.listen(engine, "connect", _set_pragmas)
+    if not settings.SQLITE_SERIALIZE_WRITES:
+        return
+    writer = _Writer(is_async)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _take_writer(conn, cursor, statement, parameters, context, executemany):
+        if WRITER_KEY in conn.info or not statement.lstrip()[:7].upper().startswith(WRITE_PREFIXES):
+            return
+        if writer.acquire():
+            conn.info[WRITER_KEY] = writer
+        else:
+            # écrivain bloqué (transaction oubliée ?) : on laisse SQLite arbitrer via busy_timeout
+            logger.warning({"event": "sqlite_writer_timeout", "statement": statement[:80]})
+            conn.info[WRITER_KEY] = None
+
+    def _release(info) -> None:
+        held = info.pop(WRITER_KEY, None)
+        if held is not None:
+            held.release()
+
+    # "commit" précède le COMMIT effectif : l'écrivain suivant attend ces quelques µs via busy_timeout
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        _release(connection_record.info)
@@ -1,9 +1,20 @@
 # -*- coding: utf-8 -*-
+"""
+Runner of the plain SQL migrations in apps/api/migrations (Docker entrypoint).
+
+Each file runs in one transaction, together with its schema_migrations row.
+A file whose first line is `-- sql_migrate: no-transaction` runs statement by
+statement in autocommit instead: required for CREATE INDEX CONCURRENTLY. Such
+files must be idempotent (IF NOT EXISTS): on failure they are replayed from
+the start. Statements on tables that do not exist yet are skipped, since those
+tables (and their indexes) are created by init_db() at startup.
+"""
 import os
+import re
 import sys
 import time
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 from urllib.parse import urlparse
 
 import psycopg
@@ -14,6 +25,11 @@ HERE = os.path.abspath(os.path.dirname(__file__))
 API_ROOT = os.path.abspath(os.path.join(HERE, '..'))  # /app/apps/api
 MIGRATIONS_DIR = os.path.join(API_ROOT, 'migrations')
 
+NO_TRANSACTION_MARKER = '-- sql_migrate: no-transaction'
+CONCURRENT_INDEX_RE = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+("?[\w.]+"?)', re.IGNORECASE
+)
+
 SCHEMA_MIGRATIONS_SQL = (
     """
     CREATE TABLE IF NOT EXISTS schema_migrations (
@@ -38,16 +54,63 @@ def _load_applied_versions(conn) -> set:
         return {row[0] for row in cur.fetchall()}
 
 
-def _apply_sql_file(conn, path: str) -> None:
+def _read_sql_file(path: str) -> Tuple[bool, List[str]]:
+    """(transactional, statements) of a migration file."""
     with open(path, 'r', encoding='utf-8') as f:
         sql = f.read().strip()
-    if not sql:
-        return
+    transactional = not sql.lower().startswith(NO_TRANSACTION_MARKER)
     # Naive splitter: works for simple statements
-    statements = [s.strip() for s in sql.split(';') if s.strip()]
+    statements = []
+    for chunk in sql.split(';'):
+        lines = [l for l in chunk.splitlines() if not l.strip().startswith('--')]
+        stmt = '\n'.join(lines).strip()
+        if stmt:
+            statements.append(stmt)
+    return transactional, statements
+
+
+def _drop_invalid_index(cur, stmt: str) -> None:
+    """Drop the leftover INVALID index of an interrupted CREATE INDEX CONCURRENTLY (IF NOT EXISTS would keep it)."""
+    match = CONCURRENT_INDEX_RE.search(stmt)
+    if not match:
+        return
+    name = match.group(1).strip('"')
+    cur.execute(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = %s AND NOT i.indisvalid",
+        (name.split('.')[-1],),
+    )
+    if cur.fetchone():
+        print(f"[sql_migrate] Dropping invalid index {name}")
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def _record_version(cur, version: str) -> None:
+    cur.execute(
+        "INSERT INTO schema_migrations(version, applied_at) VALUES (%s, %s)",
+        (version, datetime.utcnow()),
+    )
+
+
+def _apply_sql_file(conn, path: str) -> None:
+    version = os.path.basename(path)
+    transactional, statements = _read_sql_file(path)
+    if transactional:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                for stmt in statements:
+                    cur.execute(stmt)
+                _record_version(cur, version)
+        return
+    # autocommit: one implicit transaction per statement
     with conn.cursor() as cur:
         for stmt in statements:
-            cur.execute(stmt)
+            _drop_invalid_index(cur, stmt)
+            try:
+                cur.execute(stmt)
+            except psycopg.errors.UndefinedTable:
+                print(f"[sql_migrate] Skipping (table not created yet): {stmt.splitlines()[0]}")
+        _record_version(cur, version)
 
 
 def main() -> int:
@@ -79,11 +142,6 @@ def main() -> int:
                     continue
                 print(f"[sql_migrate] Applying {version} ...")
                 _apply_sql_file(conn, path)
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "INSERT INTO schema_migrations(version, applied_at) VALUES (%s, %s)",
-                        (version, datetime.utcnow()),
-                    )
                 print(f"[sql_migrate] Applied {version}")
         print('[sql_migrate] All migrations up to date.')
         return 0
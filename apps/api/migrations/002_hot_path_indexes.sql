@@ -0,0 +1,18 @@
+-- sql_migrate: no-transaction
+-- Indexes for hot query paths (same as alembic revision 20261019_1190 and 20261019_1180).
+-- Built CONCURRENTLY: writes are not blocked while the index is built.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_created
+    ON messages (conversation_id, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_archived_updated
+    ON conversations (is_archived, updated_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_memories_category_importance_accessed
+    ON memories (category, importance, last_accessed);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_oauth_tokens_provider_user_created
+    ON oauth_tokens (provider, user_id, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_agenda_events_category_priority
+    ON agenda_events (category, priority);
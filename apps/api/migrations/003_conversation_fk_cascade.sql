@@ -0,0 +1,19 @@
+-- sql_migrate: no-transaction
+-- Deleting a conversation is done by the database (same as alembic revision 20261019_1200):
+-- messages cascade, memories.related_conversation_id is set to NULL.
+-- Each constraint is swapped in one statement as NOT VALID (no table scan under lock),
+-- then validated without blocking writes.
+
+ALTER TABLE messages
+    DROP CONSTRAINT IF EXISTS messages_conversation_id_fkey,
+    ADD CONSTRAINT messages_conversation_id_fkey FOREIGN KEY (conversation_id)
+        REFERENCES conversations (id) ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE messages VALIDATE CONSTRAINT messages_conversation_id_fkey;
+
+ALTER TABLE memories
+    DROP CONSTRAINT IF EXISTS memories_related_conversation_id_fkey,
+    ADD CONSTRAINT memories_related_conversation_id_fkey FOREIGN KEY (related_conversation_id)
+        REFERENCES conversations (id) ON DELETE SET NULL NOT VALID;
+
+ALTER TABLE memories VALIDATE CONSTRAINT memories_related_conversation_id_fkey;